@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+from datetime import datetime, timedelta
 import sys
 import os
 
@@ -7,7 +8,11 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Importar utilitários de banco de dados
-from db_utils import load_stores, delete_store_by_id
+from db_utils import (
+    load_stores, delete_store_by_id, get_pool_stats, verify_indexes,
+    get_query_cache_stats, clear_query_cache
+)
+from refresh_utils import refresh_stores, rebuild_stores_from_archive, REFRESH_SHOPIFY_WORKERS, REFRESH_DROPI_WORKERS
 
 # Verificar se o usuário tem permissão de administrador
 if st.session_state.get("cargo") != "Administrador":
@@ -65,4 +70,148 @@ else:
             
             with confirm_col2:
                 if st.button("Não, cancelar"):
-                    st.rerun()  # Recarregar a página
\ No newline at end of file
+                    st.rerun()  # Recarregar a página
+
+# Seção de atualização de várias lojas de uma vez
+st.header("Atualização das Lojas")
+
+if stores:
+    st.write(
+        "Atualiza Shopify e Dropi das lojas selecionadas em paralelo "
+        f"(até {REFRESH_SHOPIFY_WORKERS} lojas Shopify e {REFRESH_DROPI_WORKERS} navegador(es) Dropi ao mesmo tempo)."
+    )
+    
+    store_names = {store_id: store_name for store_id, store_name in stores}
+    refresh_store_ids = st.multiselect(
+        "Lojas:",
+        options=list(store_names.keys()),
+        default=list(store_names.keys()),
+        format_func=lambda store_id: store_names[store_id]
+    )
+    
+    refresh_col1, refresh_col2, refresh_col3, refresh_col4 = st.columns(4)
+    with refresh_col1:
+        refresh_start_date = st.date_input("Data inicial", datetime.today() - timedelta(days=7), key="refresh_start_date")
+    with refresh_col2:
+        refresh_end_date = st.date_input("Data final", datetime.today(), key="refresh_end_date")
+    with refresh_col3:
+        refresh_sources = st.multiselect("Fontes:", ["Shopify", "Dropi"], default=["Shopify", "Dropi"])
+    with refresh_col4:
+        refresh_mode = st.selectbox("Modo Shopify", ["Incremental", "Completo"], key="refresh_shopify_mode")
+    
+    if st.button("Atualizar Lojas Selecionadas"):
+        if not refresh_store_ids or not refresh_sources:
+            st.warning("Selecione ao menos uma loja e uma fonte.")
+        else:
+            progress_bar = st.progress(0.0)
+            progress_text = st.empty()
+            
+            def show_refresh_progress(done, total, result):
+                progress_bar.progress(done / total)
+                progress_text.caption(f"{done}/{total} concluídas (última: {result['store']} - {result['source']}, {result['status']})")
+            
+            with st.spinner("Atualizando lojas..."):
+                report = refresh_stores(
+                    refresh_start_date,
+                    refresh_end_date,
+                    store_ids=refresh_store_ids,
+                    sources=[source.lower() for source in refresh_sources],
+                    shopify_mode=refresh_mode.lower(),
+                    progress=show_refresh_progress
+                )
+            progress_text.empty()
+            
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Concluídas", report["ok"])
+            with col2:
+                st.metric("Com erro", report["failed"])
+            with col3:
+                st.metric("Ignoradas", report["skipped"])
+            with col4:
+                st.metric("Duração total (s)", f"{report['duration']:.1f}")
+            
+            report_df = pd.DataFrame(report["results"], columns=["store", "source", "status", "duration", "detail"])
+            report_df["duration"] = report_df["duration"].round(1)
+            st.dataframe(
+                report_df.rename(columns={
+                    "store": "Loja", "source": "Fonte", "status": "Status",
+                    "duration": "Duração (s)", "detail": "Detalhe"
+                }),
+                hide_index=True,
+                use_container_width=True
+            )
+            
+            if report["failed"]:
+                st.error(f"{report['failed']} atualização(ões) falharam; as demais lojas foram atualizadas normalmente.")
+            else:
+                st.success("Atualização das lojas concluída.")
+    
+    # Reprocessamento local: regrava os itens de pedido Shopify a partir dos pedidos já arquivados
+    if st.button("Reprocessar Shopify do Arquivo de Pedidos"):
+        with st.spinner("Reprocessando pedidos arquivados..."):
+            rebuild_results = rebuild_stores_from_archive(
+                refresh_start_date.strftime("%Y-%m-%d"),
+                refresh_end_date.strftime("%Y-%m-%d"),
+                store_ids=refresh_store_ids
+            )
+        
+        rebuild_df = pd.DataFrame(rebuild_results, columns=["store_id", "status", "days", "duration"])
+        rebuild_df["store_id"] = rebuild_df["store_id"].map(store_names)
+        rebuild_df["duration"] = rebuild_df["duration"].round(2)
+        st.dataframe(
+            rebuild_df.rename(columns={
+                "store_id": "Loja", "status": "Status", "days": "Dias reprocessados", "duration": "Duração (s)"
+            }),
+            hide_index=True,
+            use_container_width=True
+        )
+        st.caption("Lojas ignoradas não têm dias completos no arquivo de pedidos para o período.")
+else:
+    st.info("Não há lojas cadastradas para atualizar.")
+
+# Seção de diagnóstico do banco de dados
+st.header("Banco de Dados")
+
+with st.expander("Estatísticas do Pool de Conexões", expanded=False):
+    pool_stats = get_pool_stats()
+    if not pool_stats:
+        st.info("O pool de conexões ainda não foi inicializado neste processo.")
+    else:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Checkouts", pool_stats["checkouts"])
+        with col2:
+            st.metric("Espera média (ms)", f"{pool_stats['avg_wait_ms']:.2f}")
+        with col3:
+            st.metric("Espera máxima (ms)", f"{pool_stats['max_wait_ms']:.2f}")
+        
+        st.dataframe(
+            pd.DataFrame(list(pool_stats.items()), columns=["Métrica", "Valor"]).astype(str),
+            hide_index=True,
+            use_container_width=True
+        )
+
+with st.expander("Cache de Consultas", expanded=False):
+    cache_stats = get_query_cache_stats()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Acertos", cache_stats["hits"])
+    with col2:
+        st.metric("Faltas", cache_stats["misses"])
+    with col3:
+        st.metric("Entradas", f"{cache_stats['entries']}/{cache_stats['max_entries']}")
+    
+    if st.button("Limpar Cache"):
+        clear_query_cache()
+        st.success("Cache de consultas limpo.")
+
+with st.expander("Verificação de Índices", expanded=False):
+    st.write("Executa EXPLAIN nas consultas principais do dashboard e confirma o uso dos índices.")
+    if st.button("Verificar Índices"):
+        for result in verify_indexes():
+            if result["used"]:
+                st.success(f"{result['description']}: usa {result['index']}")
+            else:
+                st.error(f"{result['description']}: NÃO usa {result['index']}")
+            st.code(result["plan"])
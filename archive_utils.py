@@ -0,0 +1,192 @@
+from datetime import datetime, timezone
+import threading
+import logging
+import gzip
+import json
+import os
+
+from timezone_utils import DEFAULT_TIMEZONE, is_utc, local_day
+
+# Configuração do logger
+logger = logging.getLogger("archive_utils")
+
+# Diretório do arquivo de pedidos. O sistema de arquivos do container do Railway
+# é descartado a cada deploy: lá SHOPIFY_ARCHIVE_DIR precisa apontar para o ponto
+# de montagem de um volume persistente (ex.: /data/order_archive), senão o
+# arquivo some e reprocessar_pedidos.py não tem o que reprocessar.
+SHOPIFY_ARCHIVE_DIR = os.getenv("SHOPIFY_ARCHIVE_DIR", "order_archive")
+
+if os.getenv("RAILWAY_ENVIRONMENT") and not os.getenv("SHOPIFY_ARCHIVE_DIR"):
+    logger.warning("SHOPIFY_ARCHIVE_DIR não definido no Railway: o arquivo de pedidos será perdido no próximo deploy")
+
+# "0" desliga a gravação do arquivo de pedidos
+SHOPIFY_ARCHIVE_ENABLED = os.getenv("SHOPIFY_ARCHIVE_ENABLED", "1") != "0"
+
+_archive_lock = threading.Lock()
+
+def archive_path(store_id, day):
+    """Arquivo dos pedidos da loja criados no dia (YYYY-MM-DD, no fuso da loja)."""
+    return os.path.join(SHOPIFY_ARCHIVE_DIR, str(store_id), f"{day}.jsonl.gz")
+
+def archive_timestamp():
+    """Horário atual (UTC, com microssegundos) no formato de fetched_at."""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+def _parse_timestamp(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+def archive_orders(store_id, orders, timezone_name=DEFAULT_TIMEZONE):
+    """
+    Acrescenta pedidos da API (edges ou nós) ao arquivo da loja, um arquivo por dia de criação.
+
+    Os arquivos são JSON Lines comprimidos com gzip: cada chamada grava um novo
+    membro gzip no fim do arquivo do dia, com um registro {"fetched_at", "order"}
+    por pedido. Pedidos buscados de novo aparecem mais de uma vez até o dia ser
+    reescrito por mark_archive_complete; a leitura fica com o registro mais
+    recente. Uma falha de gravação é registrada no log e não interrompe a atualização.
+
+    Returns:
+        True se todos os pedidos foram gravados
+    """
+    if not SHOPIFY_ARCHIVE_ENABLED:
+        return False
+
+    fetched_at = archive_timestamp()
+    by_day = {}
+    for order in orders:
+        order_node = order.get("node", order)
+        if not order_node.get("id"):
+            continue
+        day = local_day(order_node.get("createdAt"), timezone_name) or "sem-data"
+        by_day.setdefault(day, []).append(
+            json.dumps({"fetched_at": fetched_at, "order": order_node}, ensure_ascii=False, separators=(",", ":"))
+        )
+
+    try:
+        with _archive_lock:
+            for day, records in by_day.items():
+                path = archive_path(store_id, day)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with gzip.open(path, "at", encoding="utf-8") as archive_file:
+                    archive_file.write("\n".join(records) + "\n")
+        return True
+    except Exception as e:
+        logger.warning(f"Erro ao gravar o arquivo de pedidos da loja {store_id}: {str(e)}")
+        return False
+
+def _complete_days_path(store_id):
+    return os.path.join(SHOPIFY_ARCHIVE_DIR, str(store_id), "complete_days.txt")
+
+def _compact_day(store_id, day, fetched_since):
+    """
+    Reescreve o arquivo do dia com um registro por pedido (o mais recente).
+
+    Pedidos cujo último registro é anterior a fetched_since (início da busca
+    completa do dia) não vieram na busca: foram excluídos na Shopify e viram uma
+    marca de exclusão {"fetched_at", "deleted"}.
+    """
+    path = archive_path(store_id, day)
+    if not os.path.exists(path):
+        return
+    cutoff = _parse_timestamp(fetched_since)
+    deleted_at = archive_timestamp()
+    lines = []
+    for order_id, record in _read_latest_records(path).items():
+        if "order" in record and _parse_timestamp(record["fetched_at"]) < cutoff:
+            record = {"fetched_at": deleted_at, "deleted": order_id}
+        lines.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+
+    temp_path = f"{path}.tmp"
+    with gzip.open(temp_path, "wt", encoding="utf-8") as archive_file:
+        if lines:
+            archive_file.write("\n".join(lines) + "\n")
+    os.replace(temp_path, path)
+
+def mark_archive_complete(store_id, days, fetched_since=None):
+    """
+    Registra dias cujos pedidos foram todos arquivados (busca completa do dia sem erro).
+
+    Só esses dias podem ser reprocessados: um dia com apenas parte dos pedidos
+    no arquivo substituiria as métricas completas do banco por totais parciais.
+    Com fetched_since (início da busca), os arquivos dos dias são reescritos
+    antes (ver _compact_day).
+    """
+    if not SHOPIFY_ARCHIVE_ENABLED or not days:
+        return
+    try:
+        with _archive_lock:
+            if fetched_since:
+                for day in days:
+                    _compact_day(store_id, day, fetched_since)
+            path = _complete_days_path(store_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as complete_file:
+                complete_file.write("\n".join(days) + "\n")
+    except Exception as e:
+        logger.warning(f"Erro ao registrar os dias arquivados da loja {store_id}: {str(e)}")
+
+def reset_archive_complete(store_id, timezone_name):
+    """
+    Separa o arquivo da loja gravado com dias UTC quando ela passa a usar outro fuso.
+
+    Os arquivos antigos continuam em disco (pasta <loja>.utc), mas deixam de ser
+    lidos: seus dias não coincidem com os dias locais das métricas.
+    """
+    if is_utc(timezone_name):
+        return
+    store_dir = os.path.join(SHOPIFY_ARCHIVE_DIR, str(store_id))
+    try:
+        with _archive_lock:
+            if not os.path.isdir(store_dir):
+                return
+            target = f"{store_dir}.utc"
+            if os.path.exists(target):
+                target = f"{target}-{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}"
+            os.rename(store_dir, target)
+        logger.info(f"Arquivo de pedidos UTC da loja {store_id} movido para {target}")
+    except Exception as e:
+        logger.warning(f"Erro ao separar o arquivo de pedidos da loja {store_id}: {str(e)}")
+
+def archived_days(store_id, start_date, end_date):
+    """Dias completos do arquivo da loja no período (YYYY-MM-DD, em ordem)."""
+    path = _complete_days_path(store_id)
+    if not os.path.exists(path):
+        return []
+
+    with open(path, encoding="utf-8") as complete_file:
+        days = {line.strip() for line in complete_file if line.strip()}
+    return sorted(day for day in days if start_date <= day <= end_date)
+
+def _read_latest_records(path):
+    """Último registro de cada pedido do arquivo (pedido ou marca de exclusão), por id."""
+    records = {}
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as archive_file:
+            for line in archive_file:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                order_id = record["order"]["id"] if "order" in record else record["deleted"]
+                # Registros são acrescentados em ordem de busca: o último vence
+                records.pop(order_id, None)
+                records[order_id] = record
+    except (EOFError, gzip.BadGzipFile, json.JSONDecodeError) as e:
+        # Gravação interrompida no meio: os registros completos anteriores continuam válidos
+        logger.warning(f"Arquivo de pedidos {path} truncado: {str(e)}")
+    return records
+
+def read_archived_orders(store_id, day):
+    """
+    Lê os pedidos arquivados de um dia, mantendo só o registro mais recente de cada pedido.
+
+    Returns:
+        Lista de edges ({"node": pedido}), no formato das páginas da API
+    """
+    path = archive_path(store_id, day)
+    if not os.path.exists(path):
+        # Dia completo sem nenhum pedido
+        return []
+    return [
+        {"node": record["order"]} for record in _read_latest_records(path).values()
+        if "order" in record
+    ]
@@ -0,0 +1,153 @@
+"""
+Compara a agregação por produto dos itens de pedidos Shopify: o laço Python
+original de process_shopify_products com a soma em SQL sobre order_line_items
+(consulta order_line_items_totals_range, usada hoje pelo dashboard).
+
+Uso:
+    python benchmarks/agregacao_itens.py [--itens 10000 100000 1000000] [--produtos 500]
+
+Os pedidos sintéticos têm dois itens cada, distribuídos em 30 dias. O tempo do
+laço Python conta só a agregação dos pedidos já em memória; o tempo do SQL
+conta só a consulta (a carga em order_line_items é feita antes, no banco SQLite
+de um diretório temporário, e não entra na medição).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_utils
+from shopify_utils import orders_to_line_rows
+
+STORE_ID = "loja"
+LINES_PER_ORDER = 2
+DAYS = 30
+LOAD_BATCH_ORDERS = 50000
+
+def build_orders(items, products):
+    """Gera pedidos sintéticos no formato da API (os nós dos itens são compartilhados)."""
+    edges = [
+        {"node": {
+            "title": f"Produto {product}",
+            "quantity": quantity,
+            "originalTotalSet": {"shopMoney": {"amount": f"{quantity * 19.9:.2f}"}},
+        }}
+        for product in range(products)
+        for quantity in (1, 2, 3)
+    ]
+    orders = []
+    for index in range(items // LINES_PER_ORDER):
+        day = index % DAYS + 1
+        orders.append({"node": {
+            "id": f"gid://shopify/Order/{index + 1}",
+            "createdAt": f"2025-01-{day:02d}T15:00:00Z",
+            "lineItems": {"edges": [edges[(index * 7 + line) % len(edges)] for line in range(LINES_PER_ORDER)]},
+        }})
+    return orders
+
+def legacy_aggregate(orders, product_urls, product_images):
+    """Reproduz o laço de process_shopify_products antes da tabela order_line_items."""
+    product_total = {}
+    product_processed = {}
+    product_delivered = {}
+    product_url_map = {}
+    product_image_map = {}
+    product_value = {}
+    
+    for order_edge in orders:
+        order_node = order_edge.get("node", {})
+        for line_item_edge in order_node.get("lineItems", {}).get("edges", []):
+            line_item = line_item_edge.get("node", {})
+            product_title = line_item.get("title", "Unknown")
+            quantity = line_item.get("quantity", 0)
+            try:
+                item_value = float(line_item.get("originalTotalSet", {}).get("shopMoney", {}).get("amount", "0"))
+            except (ValueError, TypeError):
+                item_value = 0
+            
+            product_url_map[product_title] = product_urls.get(product_title, "")
+            product_image_map[product_title] = product_images.get(product_title, "")
+            
+            for totals, value in ((product_total, quantity), (product_value, item_value),
+                                  (product_processed, quantity), (product_delivered, quantity)):
+                if product_title in totals:
+                    totals[product_title] += value
+                else:
+                    totals[product_title] = value
+    
+    return product_total, product_processed, product_delivered, product_url_map, product_value, product_image_map
+
+def load_line_items(orders, products):
+    """Grava os pedidos em order_line_items e o catálogo em shopify_products."""
+    for start in range(0, len(orders), LOAD_BATCH_ORDERS):
+        _, rows = orders_to_line_rows(STORE_ID, orders[start:start + LOAD_BATCH_ORDERS], "UTC")
+        db_utils.execute_upsert_many("order_line_items", rows, ["store_id", "order_id", "line_index"])
+    
+    db_utils.execute_upsert_many(
+        "shopify_products",
+        [
+            {"store_id": STORE_ID, "product_id": str(product), "title": f"Produto {product}",
+             "url": f"https://loja/products/p{product}", "image_url": f"https://cdn/p{product}.jpg"}
+            for product in range(products)
+        ],
+        ["store_id", "product_id"]
+    )
+
+def run_size(items, products):
+    """Mede as duas agregações para a quantidade de itens informada e retorna (segundos Python, segundos SQL)."""
+    orders = build_orders(items, products)
+    product_urls = {f"Produto {product}": f"https://loja/products/p{product}" for product in range(products)}
+    product_images = {f"Produto {product}": f"https://cdn/p{product}.jpg" for product in range(products)}
+    
+    started = time.perf_counter()
+    legacy_totals = legacy_aggregate(orders, product_urls, product_images)[0]
+    python_seconds = time.perf_counter() - started
+    
+    with tempfile.TemporaryDirectory() as directory:
+        db_utils.SQLITE_DB_PATH = os.path.join(directory, "dashboard.db")
+        db_utils._pool = None
+        db_utils._migrations_applied = False
+        db_utils.init_db()
+        
+        try:
+            load_line_items(orders, products)
+            del orders
+            
+            started = time.perf_counter()
+            rows = db_utils.execute_statement(
+                "order_line_items_totals_range",
+                (STORE_ID, "2025-01-01", f"2025-01-{DAYS:02d}", STORE_ID),
+                cached=False
+            )
+            sql_seconds = time.perf_counter() - started
+        finally:
+            db_utils._pool.close_all()
+    
+    sql_totals = {row[0]: row[3] for row in rows}
+    if sql_totals != legacy_totals:
+        raise RuntimeError("As duas agregações divergem")
+    return python_seconds, sql_seconds
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara o laço Python original com a agregação em SQL dos itens de pedido")
+    parser.add_argument("--itens", type=int, nargs="+", default=[10000, 100000, 1000000], help="Quantidades de itens de pedido medidas")
+    parser.add_argument("--produtos", type=int, default=500, help="Produtos distintos no catálogo")
+    args = parser.parse_args()
+    
+    if db_utils.is_railway_environment():
+        print("DATABASE_URL/RAILWAY_ENVIRONMENT definidos: o benchmark mede apenas o SQLite local")
+        return 1
+    
+    for items in args.itens:
+        python_seconds, sql_seconds = run_size(items, args.produtos)
+        print(
+            f"{items:>9,} itens: laço Python {python_seconds * 1000:,.1f} ms, "
+            f"SQL {sql_seconds * 1000:,.1f} ms ({python_seconds / sql_seconds:,.1f}x)"
+        )
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
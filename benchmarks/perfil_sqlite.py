@@ -0,0 +1,78 @@
+"""
+Mede a vazão de escrita e leitura do SQLite local com o perfil padrão do sqlite3
+e com o perfil ajustado de db_utils (WAL, synchronous=NORMAL, mmap, cache).
+
+Uso:
+    python benchmarks/perfil_sqlite.py [--linhas 2000]
+
+Cada perfil usa um banco novo em um diretório temporário. As escritas são
+execute_upsert de uma linha (um commit por linha, como as telas do dashboard);
+as leituras são consultas por chave primária sem o cache de consultas.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_utils
+
+PROFILES = {
+    "padrão (DELETE/FULL)": {"SQLITE_JOURNAL_MODE": "DELETE", "SQLITE_SYNCHRONOUS": "FULL", "SQLITE_MMAP_SIZE": 0, "SQLITE_CACHE_SIZE": -2000},
+    "ajustado (WAL/NORMAL)": {},
+}
+
+def run_profile(settings, rows):
+    """Executa as escritas e leituras com o perfil informado e retorna (escritas/s, leituras/s)."""
+    defaults = {name: getattr(db_utils, name) for name in settings}
+    for name, value in settings.items():
+        setattr(db_utils, name, value)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        db_utils.SQLITE_DB_PATH = os.path.join(directory, "dashboard.db")
+        db_utils._pool = None
+        db_utils._migrations_applied = False
+        db_utils.init_db()
+        
+        try:
+            started = time.perf_counter()
+            for index in range(rows):
+                db_utils.execute_upsert(
+                    "product_effectiveness",
+                    {"store_id": "loja", "product": f"Produto {index}", "general_effectiveness": 0.5, "last_updated": "2025-01-01"},
+                    ["store_id", "product"]
+                )
+            write_rate = rows / (time.perf_counter() - started)
+            
+            started = time.perf_counter()
+            for index in range(rows):
+                db_utils.execute_query(
+                    "SELECT general_effectiveness FROM product_effectiveness WHERE store_id = ? AND product = ?",
+                    ("loja", f"Produto {index}"), fetch_type='one'
+                )
+            read_rate = rows / (time.perf_counter() - started)
+        finally:
+            db_utils._pool.close_all()
+            for name, value in defaults.items():
+                setattr(db_utils, name, value)
+    
+    return write_rate, read_rate
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara o perfil padrão e o ajustado do SQLite local")
+    parser.add_argument("--linhas", type=int, default=2000, help="Linhas gravadas e lidas por perfil")
+    args = parser.parse_args()
+    
+    if db_utils.is_railway_environment():
+        print("DATABASE_URL/RAILWAY_ENVIRONMENT definidos: o benchmark mede apenas o SQLite local")
+        return 1
+    
+    for name, settings in PROFILES.items():
+        write_rate, read_rate = run_profile(settings, args.linhas)
+        print(f"{name}: {write_rate:,.0f} escritas/s, {read_rate:,.0f} leituras/s")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,41 +1,750 @@
 import os
+import csv
+import io
 import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+import psycopg2.extras
+import psycopg2.errors
 import sqlite3
+import queue
+import re
+import threading
+import time
 import streamlit as st
-from datetime import datetime
+from collections import OrderedDict
+from datetime import datetime, timedelta
 import logging
 
+from timezone_utils import local_datetime, is_utc
+
 # Configuração de logger
 logger = logging.getLogger("db_utils")
 
+# Configuração do pool de conexões (pode ser ajustada por variáveis de ambiente)
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30"))
+
+# Quantidade de linhas enviadas por lote nas gravações em massa
+DB_UPSERT_CHUNK_SIZE = int(os.getenv("DB_UPSERT_CHUNK_SIZE", "500"))
+
+SQLITE_DB_PATH = "dashboard.db"
+
+# Perfil de desempenho do SQLite aplicado a cada nova conexão (modo local)
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # negativo = KiB (64 MB)
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))  # milissegundos
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
+
 def is_railway_environment():
     """Verifica se estamos rodando no Railway."""
     return os.getenv("RAILWAY_ENVIRONMENT") is not None or os.getenv("DATABASE_URL") is not None
 
+class PooledPGConnection(psycopg2.extensions.connection):
+    """
+    Conexão PostgreSQL emprestada do pool.
+    
+    close() devolve a conexão ao pool em vez de encerrá-la, de modo que o código
+    existente (get_db_connection() ... conn.close()) continua funcionando sem mudanças.
+    """
+    _pool = None
+    _checked_out = False
+    _last_used = 0.0
+    
+    def close(self):
+        if self._checked_out and self._pool is not None:
+            self._checked_out = False
+            self._pool.release(self)
+        elif self._pool is None:
+            super().close()
+    
+    def real_close(self):
+        """Encerra de fato a conexão com o servidor."""
+        self._pool = None
+        self._checked_out = False
+        if not self.closed:
+            super().close()
+    
+    def __del__(self):
+        # Conexão emprestada e nunca devolvida: libera a vaga no pool
+        if self._checked_out and self._pool is not None:
+            self._pool.reclaim()
+
+class PGConnectionPool:
+    """Pool de conexões PostgreSQL thread-safe com tamanho mínimo/máximo e health check."""
+    
+    def __init__(self, dsn, min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE,
+                 timeout=DB_POOL_TIMEOUT, health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL):
+        self.dsn = dsn
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        
+        self._idle = []
+        self._size = 0
+        self._cond = threading.Condition()
+        # Fila usada por __del__ (seguro em contexto de coleta de lixo)
+        self._reclaimed = queue.SimpleQueue()
+        self._stats = {
+            "connections_created": 0,
+            "connections_discarded": 0,
+            "connections_reclaimed": 0,
+            "health_check_failures": 0,
+            "checkouts": 0,
+            "checkout_timeouts": 0,
+            "max_in_use": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+        
+        for _ in range(self.min_size):
+            conn = self._create()
+            with self._cond:
+                self._size += 1
+                self._idle.append(conn)
+    
+    def _create(self):
+        conn = psycopg2.connect(self.dsn, connection_factory=PooledPGConnection)
+        conn._last_used = time.monotonic()
+        with self._cond:
+            self._stats["connections_created"] += 1
+        return conn
+    
+    def _drain_reclaimed(self):
+        """Recupera vagas de conexões que foram coletadas sem serem devolvidas."""
+        while True:
+            try:
+                self._reclaimed.get_nowait()
+            except queue.Empty:
+                break
+            self._size -= 1
+            self._stats["connections_reclaimed"] += 1
+    
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        if time.monotonic() - conn._last_used < self.health_check_interval:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Conexão do pool falhou no health check: {str(e)}")
+            with self._cond:
+                self._stats["health_check_failures"] += 1
+            return False
+    
+    def acquire(self):
+        """Empresta uma conexão do pool, aguardando até `timeout` segundos se estiver cheio."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        
+        while True:
+            conn = None
+            create = False
+            with self._cond:
+                self._drain_reclaimed()
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["checkout_timeouts"] += 1
+                        raise psycopg2.pool.PoolError(
+                            f"Tempo esgotado aguardando conexão do pool ({self.max_size} em uso)"
+                        )
+                    self._cond.wait(min(remaining, 0.5))
+                    self._drain_reclaimed()
+                
+                if self._idle:
+                    conn = self._idle.pop()
+                else:
+                    self._size += 1
+                    create = True
+            
+            if create:
+                try:
+                    conn = self._create()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_healthy(conn):
+                self._discard(conn)
+                continue
+            
+            break
+        
+        waited = time.monotonic() - started
+        conn._pool = self
+        conn._checked_out = True
+        with self._cond:
+            self._stats["checkouts"] += 1
+            self._stats["total_wait_seconds"] += waited
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+            self._stats["max_in_use"] = max(self._stats["max_in_use"], self._size - len(self._idle))
+        return conn
+    
+    def release(self, conn):
+        """Devolve uma conexão ao pool, descartando-a se estiver quebrada."""
+        try:
+            if conn.closed or conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                self._discard(conn)
+                return
+            # Descarta qualquer transação pendente que o chamador não confirmou
+            conn.rollback()
+        except Exception as e:
+            logger.warning(f"Descartando conexão com erro ao ser devolvida: {str(e)}")
+            self._discard(conn)
+            return
+        
+        conn._last_used = time.monotonic()
+        with self._cond:
+            if len(self._idle) >= self.max_size:
+                self._size -= 1
+                conn.real_close()
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+    
+    def reclaim(self):
+        self._reclaimed.put(1)
+    
+    def _discard(self, conn):
+        try:
+            conn.real_close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._stats["connections_discarded"] += 1
+            self._cond.notify()
+    
+    def close_all(self):
+        """Fecha todas as conexões ociosas do pool."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn in idle:
+            conn.real_close()
+    
+    def stats(self):
+        with self._cond:
+            self._drain_reclaimed()
+            stats = dict(self._stats)
+            stats["backend"] = "postgresql"
+            stats["size"] = self._size
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._size - len(self._idle)
+            stats["min_size"] = self.min_size
+            stats["max_size"] = self.max_size
+        stats["avg_wait_ms"] = (stats["total_wait_seconds"] / stats["checkouts"] * 1000) if stats["checkouts"] else 0.0
+        stats["max_wait_ms"] = stats["max_wait_seconds"] * 1000
+        return stats
+
+class PooledSQLiteConnection(sqlite3.Connection):
+    """
+    Conexão SQLite reutilizada por thread.
+    
+    close() apenas descarta a transação pendente; a conexão real é fechada quando a thread termina.
+    """
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+    
+    def real_close(self):
+        super().close()
+
+def apply_sqlite_profile(conn):
+    """
+    Aplica o perfil de desempenho à conexão SQLite: WAL (leitores não bloqueiam
+    o escritor), synchronous=NORMAL, mmap, cache maior, busy_timeout e tabelas
+    temporárias em memória. Os valores vêm das variáveis de ambiente SQLITE_*.
+    """
+    pragmas = [
+        f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}",
+        f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size = {SQLITE_CACHE_SIZE}",
+        f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT}",
+        f"PRAGMA temp_store = {SQLITE_TEMP_STORE}",
+    ]
+    for pragma in pragmas:
+        try:
+            conn.execute(pragma)
+        except sqlite3.Error as e:
+            logger.warning(f"Não foi possível aplicar '{pragma}': {str(e)}")
+
+class SQLiteConnectionManager:
+    """Mantém uma conexão SQLite por thread (sqlite3 não permite compartilhar entre threads)."""
+    
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {
+            "connections_created": 0,
+            "connections_discarded": 0,
+            "health_check_failures": 0,
+            "checkouts": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+    
+    def acquire(self):
+        started = time.monotonic()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            try:
+                conn.execute("SELECT 1")
+            except sqlite3.ProgrammingError:
+                # Conexão fechada por fora do gerenciador
+                with self._lock:
+                    self._stats["health_check_failures"] += 1
+                    self._stats["connections_discarded"] += 1
+                conn = None
+        
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path,
+                timeout=SQLITE_BUSY_TIMEOUT / 1000,
+                factory=PooledSQLiteConnection
+            )
+            apply_sqlite_profile(conn)
+            self._local.conn = conn
+            with self._lock:
+                self._stats["connections_created"] += 1
+        
+        waited = time.monotonic() - started
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["total_wait_seconds"] += waited
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+        return conn
+    
+    def close_all(self):
+        """Fecha a conexão da thread atual."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.real_close()
+            self._local.conn = None
+    
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["backend"] = "sqlite"
+        stats["journal_mode"] = SQLITE_JOURNAL_MODE
+        stats["synchronous"] = SQLITE_SYNCHRONOUS
+        stats["avg_wait_ms"] = (stats["total_wait_seconds"] / stats["checkouts"] * 1000) if stats["checkouts"] else 0.0
+        stats["max_wait_ms"] = stats["max_wait_seconds"] * 1000
+        return stats
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_connection_pool():
+    """Retorna o pool de conexões do processo, criando-o na primeira chamada."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                if is_railway_environment():
+                    database_url = os.getenv("DATABASE_URL")
+                    if not database_url:
+                        raise ValueError("DATABASE_URL não encontrada")
+                    _pool = PGConnectionPool(database_url)
+                else:
+                    _pool = SQLiteConnectionManager(SQLITE_DB_PATH)
+    return _pool
+
+def get_pool_stats():
+    """Retorna estatísticas do pool de conexões (tamanho, uso e latência de checkout)."""
+    if _pool is None:
+        return {}
+    return _pool.stats()
+
 def get_db_connection():
-    """Retorna uma conexão com o banco de dados."""
+    """
+    Retorna uma conexão emprestada do pool do processo.
+    
+    A conexão deve ser devolvida com conn.close(), como antes.
+    """
     if is_railway_environment():
         # Ambiente Railway - PostgreSQL
         try:
-            database_url = os.getenv("DATABASE_URL")
-            if not database_url:
+            if not os.getenv("DATABASE_URL"):
                 st.error("DATABASE_URL não encontrada no ambiente Railway")
                 raise ValueError("DATABASE_URL não encontrada")
                 
-            conn = psycopg2.connect(database_url)
-            return conn
+            return get_connection_pool().acquire()
         except Exception as e:
             st.error(f"Erro ao conectar ao PostgreSQL: {str(e)}")
             raise e
     else:
         # Ambiente local - SQLite
         try:
-            conn = sqlite3.connect("dashboard.db")
-            return conn
+            return get_connection_pool().acquire()
         except Exception as e:
             st.error(f"Erro ao conectar ao SQLite: {str(e)}")
             raise e
 
+# === CACHE DE CONSULTAS ===
+#
+# Cache read-through das leituras repetidas a cada rerun do Streamlit. Cada
+# entrada guarda as tabelas lidas e a loja (store_id) da consulta; escritas
+# feitas por execute_query/execute_upsert/execute_upsert_many/
+# replace_period/delete_store_by_id invalidam as entradas da tabela e
+# loja afetadas. O cache é por processo: escritas feitas por outro processo só
+# aparecem depois do TTL.
+
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "300"))
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "512"))
+
+_READ_TABLES_RE = re.compile(r"\b(?:FROM|JOIN)\s+([A-Za-z_][A-Za-z0-9_]*)", re.IGNORECASE)
+_WRITE_TABLE_RE = re.compile(r"^\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM)\s+([A-Za-z_][A-Za-z0-9_]*)", re.IGNORECASE)
+
+def _normalize_sql(query):
+    """Normaliza espaços da consulta para uso como chave de cache."""
+    return " ".join(query.split())
+
+def _store_column(table):
+    """Coluna que identifica a loja em cada tabela."""
+    return "id" if table == "stores" else "store_id"
+
+def _extract_store_id(query, params, table):
+    """Obtém o valor do filtro de loja (store_id = ? ou id = ? em stores) a partir dos parâmetros."""
+    if not params:
+        return None
+    match = re.search(rf"\b{_store_column(table)}\s*=\s*\?", query, re.IGNORECASE)
+    if not match:
+        return None
+    index = query[:match.start()].count("?")
+    return params[index] if index < len(params) else None
+
+class QueryCache:
+    """Cache LRU com TTL indexado por tabela e loja."""
+    
+    def __init__(self, max_entries=QUERY_CACHE_MAX_ENTRIES, ttl=QUERY_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "stale_skips": 0}
+        # Gerações incrementadas a cada invalidação: uma leitura que começou antes
+        # de uma escrita na mesma tabela/loja não é gravada no cache
+        self._epoch = 0
+        self._table_generations = {}
+        self._all_stores_generations = {}
+        self._store_generations = {}
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return False, None
+            expires_at, _, _, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._stats["misses"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return True, value
+    
+    def generation(self, tables, store_id):
+        """Geração atual das tabelas para a loja (ou para todas as lojas, se store_id=None)."""
+        with self._lock:
+            return self._generation(tables, store_id)
+    
+    def _generation(self, tables, store_id):
+        if store_id is None:
+            return (self._epoch, tuple(self._table_generations.get(t, 0) for t in tables))
+        return (self._epoch, tuple(
+            (self._all_stores_generations.get(t, 0), self._store_generations.get((t, store_id), 0)) for t in tables
+        ))
+    
+    def set(self, key, value, tables, store_id, ttl=None, generation=None):
+        """Grava a entrada; com generation, descarta-a se houve invalidação desde a leitura."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if generation is not None and generation != self._generation(tables, store_id):
+                self._stats["stale_skips"] += 1
+                return
+            self._entries[key] = (expires_at, frozenset(tables), store_id, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+    
+    def invalidate(self, table=None, store_id=None):
+        """
+        Remove entradas da tabela (ou de todas, se table=None). Com store_id,
+        remove apenas as entradas dessa loja e as que não são de uma loja específica.
+        """
+        with self._lock:
+            if table is None:
+                self._epoch += 1
+            else:
+                self._table_generations[table] = self._table_generations.get(table, 0) + 1
+                if store_id is None:
+                    self._all_stores_generations[table] = self._all_stores_generations.get(table, 0) + 1
+                else:
+                    self._store_generations[(table, store_id)] = self._store_generations.get((table, store_id), 0) + 1
+            stale = [
+                key for key, (_, tables, entry_store, _) in self._entries.items()
+                if (table is None or table in tables)
+                and (store_id is None or entry_store is None or entry_store == store_id)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self._stats["invalidations"] += len(stale)
+    
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+    
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        stats["max_entries"] = self.max_entries
+        stats["ttl"] = self.ttl
+        return stats
+
+_query_cache = QueryCache()
+
+def _cached_read(query, params, fetch_type, ttl, with_columns, run):
+    """Leitura read-through: consulta o cache e, na falta, executa run(cursor, params)."""
+    params = tuple(params) if params else ()
+    key = (_normalize_sql(query), params, fetch_type, with_columns)
+    
+    found, value = _query_cache.get(key)
+    if found:
+        return _copy_result(value, fetch_type, with_columns)
+    
+    tables = [t.lower() for t in _READ_TABLES_RE.findall(query)]
+    store_id = _extract_store_id(query, params, tables[0]) if tables else None
+    generation = _query_cache.generation(tables, store_id)
+    
+    result = _execute_read(params, fetch_type, with_columns, run)
+    _query_cache.set(key, result, tables, store_id, ttl, generation)
+    return _copy_result(result, fetch_type, with_columns)
+
+def _execute_read(params, fetch_type, with_columns, run):
+    """Executa uma leitura com uma conexão do pool e retorna o resultado imutável."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        run(cursor, params)
+        
+        if fetch_type == 'one':
+            result = cursor.fetchone()
+        else:
+            result = tuple(cursor.fetchall())
+        
+        if with_columns:
+            result = (tuple(desc[0] for desc in cursor.description), result)
+        return result
+    except Exception as e:
+        logger.error(f"Erro ao executar query: {str(e)}")
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+def _copy_result(result, fetch_type, with_columns):
+    """Devolve listas novas a cada chamada para que o chamador não altere o valor em cache."""
+    if with_columns:
+        columns, rows = result
+        return list(columns), (rows if fetch_type == 'one' else list(rows))
+    return result if fetch_type == 'one' else list(result)
+
+def _invalidate_after_write(query, params):
+    """Invalida o cache a partir de um comando de escrita executado por execute_query."""
+    match = _WRITE_TABLE_RE.match(query)
+    if not match:
+        # DDL ou comando não reconhecido: descarta o cache inteiro
+        _query_cache.clear()
+        return
+    table = match.group(1).lower()
+    _query_cache.invalidate(table, _extract_store_id(query, params, table))
+
+def clear_query_cache():
+    """Descarta todo o cache de consultas."""
+    _query_cache.clear()
+
+def get_query_cache_stats():
+    """Retorna estatísticas do cache de consultas (acertos, faltas, entradas)."""
+    return _query_cache.stats()
+
+# === REGISTRO DE CONSULTAS PREPARADAS ===
+#
+# Consultas frequentes do dashboard ficam registradas com um nome e
+# placeholders '?'. Cada uma é compilada uma vez por dialeto: no PostgreSQL
+# vira um PREPARE no servidor (uma vez por conexão do pool), evitando
+# re-parse e re-planejamento; no SQLite o texto fixo aproveita o cache de
+# statements do próprio módulo sqlite3.
+
+STATEMENTS = {
+    "stores_list": "SELECT id, name FROM stores",
+    "store_details": (
+        "SELECT name, shop_name, access_token, dropi_url, dropi_username, dropi_password, "
+        "currency_from, currency_to, is_custom FROM stores WHERE id = ?"
+    ),
+    "store_currency": "SELECT currency_from, currency_to FROM stores WHERE id = ?",
+    "store_timezone": "SELECT shop_timezone FROM stores WHERE id = ?",
+    "custom_product_data": (
+        "SELECT product, custom_id, custom_provider FROM custom_product_data WHERE store_id = ?"
+    ),
+    "dropi_metrics_range": (
+        "SELECT * FROM dropi_metrics WHERE store_id = ? AND date_start = ? AND date_end = ?"
+    ),
+    "dropi_effectiveness_range": (
+        "SELECT product, product_instance_id, orders_count, delivered_count, image_url, provider, stock "
+        "FROM dropi_metrics WHERE store_id = ? AND date_start = ? AND date_end = ?"
+    ),
+    "product_effectiveness_by_store": (
+        "SELECT product, general_effectiveness, last_updated FROM product_effectiveness WHERE store_id = ?"
+    ),
+    "sync_state_by_store": (
+        "SELECT last_updated_at, covered_start, last_sync_at FROM sync_state WHERE store_id = ?"
+    ),
+    "shopify_products_watermark": "SELECT MAX(updated_at) FROM shopify_products WHERE store_id = ?",
+    # Totais por produto dos itens de pedido do período, com URL e imagem do catálogo.
+    # Os itens são somados antes do JOIN para que títulos repetidos no catálogo não
+    # multipliquem as somas; todos os pedidos contam como processados e entregues.
+    "order_line_items_totals_range": (
+        "SELECT t.product, c.url AS product_url, c.image_url AS product_image_url, "
+        "t.quantity AS total_orders, t.quantity AS processed_orders, t.quantity AS delivered_orders, "
+        "t.amount AS total_value FROM ("
+        "SELECT product, SUM(quantity) AS quantity, CAST(SUM(amount) AS FLOAT) AS amount FROM order_line_items "
+        "WHERE store_id = ? AND created_day BETWEEN ? AND ? GROUP BY product"
+        ") t LEFT JOIN ("
+        "SELECT title, MAX(url) AS url, MAX(image_url) AS image_url FROM shopify_products "
+        "WHERE store_id = ? GROUP BY title"
+        ") c ON c.title = t.product"
+    ),
+    "order_line_items_urls_range": (
+        "SELECT DISTINCT p.url AS product_url FROM order_line_items l "
+        "JOIN shopify_products p ON p.store_id = l.store_id AND p.title = l.product "
+        "WHERE l.store_id = ? AND l.created_day BETWEEN ? AND ?"
+    ),
+    "metric_days_range": (
+        "SELECT date FROM shopify_metric_days WHERE store_id = ? AND date BETWEEN ? AND ?"
+    ),
+    "crawl_checkpoint_by_key": (
+        "SELECT end_cursor, state, pages, orders, completed, updated_at FROM shopify_crawl_checkpoints "
+        "WHERE store_id = ? AND crawl_key = ?"
+    ),
+}
+
+_compiled_statements = {}
+_compiled_statements_lock = threading.Lock()
+
+def _compile_statement(name, dialect):
+    """
+    Compila uma consulta registrada para o dialeto, uma única vez por processo.
+    
+    Returns:
+        Para 'postgresql': (nome do PREPARE, comando PREPARE, comando EXECUTE)
+        Para 'sqlite': (None, None, consulta)
+    """
+    key = (name, dialect)
+    compiled = _compiled_statements.get(key)
+    if compiled is not None:
+        return compiled
+    
+    query = STATEMENTS[name]
+    if dialect == "postgresql":
+        parts = query.split("?")
+        numbered = parts[0] + "".join(f"${i}{part}" for i, part in enumerate(parts[1:], start=1))
+        prepared_name = f"ps_{name}"
+        param_count = len(parts) - 1
+        execute_sql = f"EXECUTE {prepared_name}"
+        if param_count:
+            execute_sql += f" ({', '.join(['%s'] * param_count)})"
+        compiled = (prepared_name, f"PREPARE {prepared_name} AS {numbered}", execute_sql)
+    else:
+        compiled = (None, None, query)
+    
+    with _compiled_statements_lock:
+        _compiled_statements[key] = compiled
+    return compiled
+
+def run_statement(cursor, name, params=None):
+    """Executa uma consulta registrada no cursor, preparando-a no servidor se necessário."""
+    params = tuple(params) if params else ()
+    
+    if not is_railway_environment():
+        _, _, query = _compile_statement(name, "sqlite")
+        cursor.execute(query, params)
+        return
+    
+    prepared_name, prepare_sql, execute_sql = _compile_statement(name, "postgresql")
+    conn = cursor.connection
+    prepared = getattr(conn, "_prepared_statements", None)
+    if prepared is None:
+        prepared = set()
+        conn._prepared_statements = prepared
+    
+    if prepared_name not in prepared:
+        try:
+            cursor.execute(prepare_sql)
+        except psycopg2.errors.DuplicatePreparedStatement:
+            # Já preparada nesta sessão (ex.: estado perdido); a transação falhou e precisa ser desfeita
+            conn.rollback()
+        prepared.add(prepared_name)
+    
+    try:
+        cursor.execute(execute_sql, params)
+    except psycopg2.errors.InvalidSqlStatementName:
+        # A sessão perdeu os statements preparados: prepara de novo e repete
+        conn.rollback()
+        prepared.clear()
+        cursor.execute(prepare_sql)
+        prepared.add(prepared_name)
+        cursor.execute(execute_sql, params)
+    except psycopg2.errors.FeatureNotSupported:
+        # "cached plan must not change result type": a tabela mudou depois do PREPARE
+        conn.rollback()
+        cursor.execute(f"DEALLOCATE {prepared_name}")
+        cursor.execute(prepare_sql)
+        cursor.execute(execute_sql, params)
+
+def execute_statement(name, params=None, fetch_type='all', with_columns=False, cached=True, ttl=None):
+    """
+    Executa uma consulta de leitura registrada em STATEMENTS.
+    
+    Args:
+        name: Nome da consulta registrada
+        params: Tupla de parâmetros para a consulta
+        fetch_type: 'one' ou 'all'
+        with_columns: Se True, retorna (colunas, resultado)
+        cached: Se True, usa o cache de consultas do processo
+        ttl: Tempo de vida da entrada no cache em segundos
+        
+    Returns:
+        Resultado da consulta (ou tupla (colunas, resultado))
+    """
+    def run(cursor, params):
+        run_statement(cursor, name, params)
+    
+    if cached:
+        return _cached_read(STATEMENTS[name], params, fetch_type, ttl, with_columns, run)
+    
+    result = _execute_read(tuple(params) if params else (), fetch_type, with_columns, run)
+    return _copy_result(result, fetch_type, with_columns)
+
 def execute_query(query, params=None, fetch_type=None):
     """
     Executa uma query adaptando-a ao banco de dados correto.
@@ -74,6 +783,7 @@ def execute_query(query, params=None, fetch_type=None):
         else:
             result = None
             conn.commit()
+            _invalidate_after_write(query, params)
         
         return result
     except Exception as e:
@@ -83,6 +793,38 @@ def execute_query(query, params=None, fetch_type=None):
     finally:
         conn.close()
 
+def _build_upsert_query(table, columns, keys, values_clause=None):
+    """
+    Monta a consulta INSERT ... ON CONFLICT adaptada ao banco de dados.
+    
+    Args:
+        table: Nome da tabela
+        columns: Lista de colunas inseridas
+        keys: Lista de colunas que formam a chave primária
+        values_clause: Cláusula VALUES a usar; por padrão uma linha de placeholders
+    """
+    is_pg = is_railway_environment()
+    
+    if values_clause is None:
+        placeholder = "%s" if is_pg else "?"
+        values_clause = f"VALUES ({', '.join([placeholder] * len(columns))})"
+    
+    # Construir a consulta base
+    query = f"INSERT INTO {table} ({', '.join(columns)}) {values_clause}"
+    
+    # Adaptar para UPSERT conforme o banco
+    conflict_cols = ", ".join(keys)
+    update_cols = [c for c in columns if c not in keys]
+    excluded = "EXCLUDED" if is_pg else "excluded"
+    update_clause = ", ".join([f"{c} = {excluded}.{c}" for c in update_cols])
+    
+    if update_clause:
+        query += f" ON CONFLICT ({conflict_cols}) DO UPDATE SET {update_clause}"
+    else:
+        query += f" ON CONFLICT ({conflict_cols}) DO NOTHING"
+    
+    return query
+
 def execute_upsert(table, data, keys):
     """
     Executa uma operação UPSERT (INSERT or UPDATE) adaptada ao banco de dados.
@@ -95,221 +837,950 @@ def execute_upsert(table, data, keys):
     columns = list(data.keys())
     values = list(data.values())
     
-    placeholders = ["?"] * len(columns)
+    query = _build_upsert_query(table, columns, keys)
     
-    # Construir a consulta base
-    query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(placeholders)})"
+    # Executar
+    conn = get_db_connection()
+    cursor = conn.cursor()
     
-    # Adaptar para UPSERT conforme o banco
+    try:
+        cursor.execute(query, values)
+        conn.commit()
+        _query_cache.invalidate(table, data.get(_store_column(table)))
+    except Exception as e:
+        logger.error(f"Erro no UPSERT: {str(e)}")
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+def _write_upsert_rows(cursor, table, columns, keys, rows, chunk_size):
+    """Grava linhas já normalizadas em lotes usando o cursor informado (sem commit)."""
     if is_railway_environment():
-        # PostgreSQL
-        conflict_cols = ", ".join(keys)
-        update_cols = [c for c in columns if c not in keys]
-        update_clause = ", ".join([f"{c} = EXCLUDED.{c}" for c in update_cols])
+        # PostgreSQL: INSERT com múltiplas linhas por comando
+        query = _build_upsert_query(table, columns, keys, values_clause="VALUES %s")
+        psycopg2.extras.execute_values(cursor, query, rows, page_size=chunk_size)
+    else:
+        # SQLite: executemany em lotes
+        query = _build_upsert_query(table, columns, keys)
+        for start in range(0, len(rows), chunk_size):
+            cursor.executemany(query, rows[start:start + chunk_size])
+
+def _invalidate_rows(table, rows):
+    """Invalida o cache para cada loja presente nas linhas gravadas."""
+    column = _store_column(table)
+    for store_id in {row.get(column) for row in rows}:
+        _query_cache.invalidate(table, store_id)
+
+def _normalize_upsert_rows(rows, keys):
+    """
+    Converte uma lista de dicionários em (colunas, tuplas), mantendo apenas a
+    última linha de cada chave (um mesmo comando não pode atualizar a linha duas vezes).
+    """
+    columns = list(rows[0].keys())
+    key_indexes = [columns.index(k) for k in keys]
+    
+    unique_rows = {}
+    for row in rows:
+        values = tuple(row.get(c) for c in columns)
+        unique_rows[tuple(values[i] for i in key_indexes)] = values
+    
+    return columns, list(unique_rows.values())
+
+def execute_upsert_many(table, rows, keys, chunk_size=DB_UPSERT_CHUNK_SIZE):
+    """
+    Executa UPSERT de várias linhas em uma única transação.
+    
+    Usa execute_values (INSERT com várias linhas) no PostgreSQL e executemany
+    no SQLite, enviando as linhas em lotes de chunk_size.
+    
+    Args:
+        table: Nome da tabela
+        rows: Lista de dicionários com as mesmas colunas
+        keys: Lista de colunas que formam a chave primária
+        chunk_size: Quantidade de linhas por lote
         
-        query = query.replace("?", "%s")
-        query += f" ON CONFLICT ({conflict_cols}) DO UPDATE SET {update_clause}"
+    Returns:
+        Número de linhas gravadas
+    """
+    if not rows:
+        return 0
+    
+    columns, values = _normalize_upsert_rows(rows, keys)
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        _write_upsert_rows(cursor, table, columns, keys, values, chunk_size)
+        conn.commit()
+        _invalidate_rows(table, rows)
+        return len(values)
+    except Exception as e:
+        logger.error(f"Erro no UPSERT em lote: {str(e)}")
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+def _copy_rows(cursor, table, columns, rows, keys=None):
+    """
+    Grava linhas via COPY ... FROM STDIN em uma tabela temporária e as mescla
+    na tabela final com um único INSERT ... SELECT (somente PostgreSQL, sem commit).
+    """
+    staging = f"tmp_copy_{table}"
+    column_list = ", ".join(columns)
+    
+    # A tabela temporária some no fim da transação, mesmo com a conexão reaproveitada pelo pool
+    cursor.execute(f"CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+    
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["\\N" if value is None else value for value in row])
+    buffer.seek(0)
+    
+    cursor.copy_expert(
+        f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+        buffer
+    )
+    
+    if keys:
+        merge_query = _build_upsert_query(table, columns, keys, values_clause=f"SELECT {column_list} FROM {staging}")
     else:
-        # SQLite
-        conflict_cols = ", ".join(keys)
-        update_cols = [c for c in columns if c not in keys]
-        update_clause = ", ".join([f"{c} = excluded.{c}" for c in update_cols])
+        merge_query = f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {staging}"
+    cursor.execute(merge_query)
+
+# Filtro de período de cada tabela usado por replace_period
+PERIOD_FILTERS = {
+    "order_line_items": "created_day BETWEEN ? AND ?",
+    "dropi_metrics": "date_start = ? AND date_end = ?",
+}
+
+def replace_period(table, store_id, date_range, rows, keys=None, chunk_size=DB_UPSERT_CHUNK_SIZE):
+    """
+    Substitui os dados de uma loja em um período em uma única transação.
+    
+    Faz um único DELETE do período e uma inserção em lote (COPY no
+    PostgreSQL, executemany no SQLite). Leitores veem os dados antigos até o
+    commit e os novos depois dele, nunca uma janela vazia.
+    
+    Args:
+        table: Nome da tabela (precisa ter um filtro em PERIOD_FILTERS)
+        store_id: ID da loja
+        date_range: Tupla (data_inicial, data_final) no formato YYYY-MM-DD
+        rows: Lista de dicionários com as mesmas colunas
+        keys: Colunas da chave primária, para atualizar em caso de conflito
+        chunk_size: Quantidade de linhas por lote no SQLite
         
-        query += f" ON CONFLICT({conflict_cols}) DO UPDATE SET {update_clause}"
+    Returns:
+        Dicionário com deleted, inserted e seconds
+    """
+    started = time.perf_counter()
+    is_pg = is_railway_environment()
+    
+    delete_query = f"DELETE FROM {table} WHERE store_id = ? AND {PERIOD_FILTERS[table]}"
+    if is_pg:
+        delete_query = delete_query.replace("?", "%s")
+    
+    if rows and keys:
+        columns, values = _normalize_upsert_rows(rows, keys)
+    elif rows:
+        columns = list(rows[0].keys())
+        values = [tuple(row.get(c) for c in columns) for row in rows]
+    else:
+        columns, values = [], []
     
-    # Executar
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
-        cursor.execute(query, values)
+        cursor.execute(delete_query, (store_id, date_range[0], date_range[1]))
+        deleted = cursor.rowcount
+        
+        if values:
+            if is_pg:
+                _copy_rows(cursor, table, columns, values, keys)
+            elif keys:
+                _write_upsert_rows(cursor, table, columns, keys, values, chunk_size)
+            else:
+                insert_query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})"
+                for start in range(0, len(values), chunk_size):
+                    cursor.executemany(insert_query, values[start:start + chunk_size])
+        
         conn.commit()
     except Exception as e:
-        logger.error(f"Erro no UPSERT: {str(e)}")
+        logger.error(f"Erro ao substituir período em {table}: {str(e)}")
         conn.rollback()
         raise e
     finally:
         conn.close()
+    
+    _query_cache.invalidate(table, store_id)
+    
+    result = {
+        "deleted": deleted,
+        "inserted": len(values),
+        "seconds": time.perf_counter() - started,
+    }
+    logger.info(
+        f"Período {date_range[0]} a {date_range[1]} substituído em {table}: "
+        f"{result['deleted']} removidos, {result['inserted']} inseridos em {result['seconds']:.3f}s"
+    )
+    return result
 
-def init_db():
-    """Inicializa as tabelas no banco de dados."""
+ORDER_LINE_COLUMNS = [
+    "store_id", "order_id", "line_index", "created_at", "created_day", "created_hour",
+    "updated_at", "product", "quantity", "amount",
+]
+
+def _replace_order_rows(table, store_id, order_ids, rows, chunk_size, crawl_key=None):
+    """Troca, em uma transação, as linhas dos pedidos informados em order_line_items ou na área de preparação."""
+    is_pg = is_railway_environment()
+    placeholder = "%s" if is_pg else "?"
+    order_ids = list(dict.fromkeys(order_ids))
+    key_filter = f" AND crawl_key = {placeholder}" if crawl_key is not None else ""
+    key_params = (crawl_key,) if crawl_key is not None else ()
+    
     conn = get_db_connection()
     cursor = conn.cursor()
+    deleted = 0
     
     try:
-        # Tabela para armazenar as lojas
-        if is_railway_environment():
-            # PostgreSQL
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS stores (
-                    id TEXT PRIMARY KEY,
-                    name TEXT,
-                    shop_name TEXT,
-                    access_token TEXT,
-                    dropi_url TEXT,
-                    dropi_username TEXT,
-                    dropi_password TEXT,
-                    currency_from TEXT DEFAULT 'MXN',
-                    currency_to TEXT DEFAULT 'BRL',
-                    is_custom BOOLEAN DEFAULT FALSE
-                )
-            """)
-            
-            # Verificar se a coluna is_custom existe
-            try:
-                cursor.execute("""
-                    SELECT column_name FROM information_schema.columns 
-                    WHERE table_name = 'stores' AND column_name = 'is_custom'
-                """)
-                if not cursor.fetchone():
-                    cursor.execute("ALTER TABLE stores ADD COLUMN is_custom BOOLEAN DEFAULT FALSE")
-            except Exception as e:
-                logger.error(f"Erro ao verificar coluna is_custom: {str(e)}")
-            
-            # Tabela para métricas de produtos
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS product_metrics (
-                    store_id TEXT,
-                    date TEXT,
-                    product TEXT,
-                    total_orders INTEGER,
-                    processed_orders INTEGER,
-                    delivered_orders INTEGER,
-                    total_value FLOAT DEFAULT 0,
-                    product_url TEXT,
-                    PRIMARY KEY (store_id, date, product)
-                )
-            """)
-            
-            # Tabela para métricas da DroPi
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS dropi_metrics (
-                    store_id TEXT,
-                    date TEXT,
-                    product TEXT,
-                    provider TEXT,
-                    stock INTEGER,
-                    orders_count INTEGER,
-                    orders_value FLOAT,
-                    transit_count INTEGER, 
-                    transit_value FLOAT,
-                    delivered_count INTEGER,
-                    delivered_value FLOAT,
-                    profits FLOAT,
-                    PRIMARY KEY (store_id, date, product)
-                )
-            """)
-            
-            # Tabela para métricas de efetividade
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS product_effectiveness (
-                    store_id TEXT,
-                    product TEXT,
-                    general_effectiveness FLOAT,
-                    last_updated TEXT,
-                    PRIMARY KEY (store_id, product)
-                )
-            """)
-            
-            # Tabela para valores personalizados
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS custom_product_data (
-                    store_id TEXT,
-                    product TEXT,
-                    custom_id TEXT,
-                    custom_provider TEXT,
-                    last_updated TEXT,
-                    PRIMARY KEY (store_id, product)
-                )
-            """)
+        for start in range(0, len(order_ids), chunk_size):
+            chunk = order_ids[start:start + chunk_size]
+            cursor.execute(
+                f"DELETE FROM {table} WHERE store_id = {placeholder}{key_filter} "
+                f"AND order_id IN ({', '.join([placeholder] * len(chunk))})",
+                (store_id, *key_params, *chunk)
+            )
+            deleted += cursor.rowcount
+        
+        if rows:
+            row_columns = list(rows[0].keys())
+            columns = row_columns + (["crawl_key"] if crawl_key is not None else [])
+            values = [tuple(row.get(c) for c in row_columns) + key_params for row in rows]
+            if is_pg:
+                _copy_rows(cursor, table, columns, values)
+            else:
+                insert_query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})"
+                for start in range(0, len(values), chunk_size):
+                    cursor.executemany(insert_query, values[start:start + chunk_size])
+        
+        conn.commit()
+    except Exception as e:
+        logger.error(f"Erro ao substituir linhas de pedidos em {table}: {str(e)}")
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+    
+    _query_cache.invalidate(table, store_id)
+    return {"deleted": deleted, "inserted": len(rows)}
+
+def replace_order_lines(store_id, order_ids, rows, chunk_size=DB_UPSERT_CHUNK_SIZE):
+    """
+    Substitui as linhas de itens dos pedidos informados em uma única transação.
+    
+    Usada pela sincronização incremental: cada pedido alterado na Shopify tem
+    suas linhas antigas removidas e as atuais inseridas, de modo que o efeito
+    do pedido nas métricas é trocado pelo novo (delta), sem tocar nos demais.
+    
+    Args:
+        store_id: ID da loja
+        order_ids: IDs numéricos dos pedidos recebidos
+        rows: Lista de dicionários com as linhas de order_line_items
+        chunk_size: Quantidade de pedidos/linhas por lote
+        
+    Returns:
+        Dicionário com deleted e inserted
+    """
+    return _replace_order_rows("order_line_items", store_id, order_ids, rows, chunk_size)
+
+def stage_order_lines(store_id, crawl_key, order_ids, rows, chunk_size=DB_UPSERT_CHUNK_SIZE):
+    """Grava as linhas dos pedidos de uma página na área de preparação da busca crawl_key (sem aparecer no dashboard)."""
+    return _replace_order_rows("order_line_items_staging", store_id, order_ids, rows, chunk_size, crawl_key=crawl_key)
+
+def publish_staged_order_lines(store_id, crawl_keys, date_range, days):
+    """
+    Troca os itens de pedido do período pelos preparados nas buscas crawl_keys, em uma única transação.
+    
+    Na mesma transação os dias são registrados em shopify_metric_days e os
+    pontos de retomada das buscas são removidos. Leitores veem os itens antigos
+    até o commit e os novos depois dele; em caso de erro nada muda.
+    
+    Returns:
+        Dicionário com deleted e inserted
+    """
+    is_pg = is_railway_environment()
+    placeholder = "%s" if is_pg else "?"
+    crawl_keys = list(crawl_keys)
+    key_list = ", ".join([placeholder] * len(crawl_keys))
+    staged = f"SELECT {{}} FROM order_line_items_staging WHERE store_id = {placeholder} AND crawl_key IN ({key_list})"
+    columns = ", ".join(ORDER_LINE_COLUMNS)
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute(
+            f"DELETE FROM order_line_items WHERE store_id = {placeholder} "
+            f"AND (created_day BETWEEN {placeholder} AND {placeholder} OR order_id IN ({staged.format('order_id')}))",
+            (store_id, date_range[0], date_range[1], store_id, *crawl_keys)
+        )
+        deleted = cursor.rowcount
+        cursor.execute(
+            f"INSERT INTO order_line_items ({columns}) {staged.format(columns)}",
+            (store_id, *crawl_keys)
+        )
+        inserted = cursor.rowcount
+        for table in ("order_line_items_staging", "shopify_crawl_checkpoints"):
+            cursor.execute(
+                f"DELETE FROM {table} WHERE store_id = {placeholder} AND crawl_key IN ({key_list})",
+                (store_id, *crawl_keys)
+            )
+        if days:
+            refreshed_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            cursor.executemany(
+                _build_upsert_query("shopify_metric_days", ["store_id", "date", "refreshed_at"], ["store_id", "date"]),
+                [(store_id, day, refreshed_at) for day in days]
+            )
+        conn.commit()
+    except Exception as e:
+        logger.error(f"Erro ao publicar itens de pedidos preparados: {str(e)}")
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+    
+    for table in ("order_line_items", "order_line_items_staging", "shopify_crawl_checkpoints", "shopify_metric_days"):
+        _query_cache.invalidate(table, store_id)
+    return {"deleted": deleted, "inserted": inserted}
+
+def clear_staged_order_lines(store_id, crawl_keys):
+    """Remove da área de preparação as linhas das buscas crawl_keys (busca recomeçada ou abandonada)."""
+    crawl_keys = list(crawl_keys)
+    if not crawl_keys:
+        return
+    execute_query(
+        f"DELETE FROM order_line_items_staging WHERE store_id = ? AND crawl_key IN ({', '.join(['?'] * len(crawl_keys))})",
+        (store_id, *crawl_keys)
+    )
+
+# === MIGRAÇÕES DE ESQUEMA ===
+#
+# Cada migração é numerada e aplicada uma única vez, ficando registrada na
+# tabela schema_migrations. Todas são idempotentes para que bancos criados
+# pelas versões antigas de init_db (em qualquer estado) sejam atualizados
+# sem erro. Novas alterações de esquema devem entrar como uma nova migração
+# no fim de MIGRATIONS, nunca alterando as já existentes.
+
+MIGRATIONS_LOCK_ID = 7300142
+
+def _table_columns(cursor, table, is_pg):
+    """Retorna a lista de colunas de uma tabela."""
+    if is_pg:
+        cursor.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = %s",
+            (table,)
+        )
+        return [row[0] for row in cursor.fetchall()]
+    cursor.execute(f"PRAGMA table_info({table})")
+    return [row[1] for row in cursor.fetchall()]
+
+def _primary_key_columns(cursor, table, is_pg):
+    """Retorna as colunas da chave primária de uma tabela."""
+    if is_pg:
+        cursor.execute("""
+            SELECT a.attname FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            WHERE i.indrelid = %s::regclass AND i.indisprimary
+        """, (table,))
+        return [row[0] for row in cursor.fetchall()]
+    cursor.execute(f"PRAGMA table_info({table})")
+    return [row[1] for row in sorted(cursor.fetchall(), key=lambda r: r[5]) if row[5] > 0]
+
+def _add_column_if_missing(cursor, table, column, definition, is_pg):
+    """Adiciona uma coluna caso ela ainda não exista."""
+    if column not in _table_columns(cursor, table, is_pg):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def _migration_001_create_base_tables(cursor, is_pg):
+    """Cria as tabelas principais."""
+    real = "FLOAT" if is_pg else "REAL"
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stores (
+            id TEXT PRIMARY KEY,
+            name TEXT,
+            shop_name TEXT,
+            access_token TEXT
+        )
+    """)
+    
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS product_metrics (
+            store_id TEXT,
+            date TEXT,
+            product TEXT,
+            total_orders INTEGER,
+            processed_orders INTEGER,
+            delivered_orders INTEGER,
+            total_value {real} DEFAULT 0,
+            PRIMARY KEY (store_id, date, product)
+        )
+    """)
+    
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS dropi_metrics (
+            store_id TEXT,
+            date TEXT,
+            product TEXT,
+            provider TEXT,
+            stock INTEGER,
+            orders_count INTEGER,
+            orders_value {real},
+            transit_count INTEGER, 
+            transit_value {real},
+            delivered_count INTEGER,
+            delivered_value {real},
+            profits {real},
+            PRIMARY KEY (store_id, date, product)
+        )
+    """)
+    
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS product_effectiveness (
+            store_id TEXT,
+            product TEXT,
+            general_effectiveness {real},
+            last_updated TEXT,
+            PRIMARY KEY (store_id, product)
+        )
+    """)
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS custom_product_data (
+            store_id TEXT,
+            product TEXT,
+            custom_id TEXT,
+            custom_provider TEXT,
+            last_updated TEXT,
+            PRIMARY KEY (store_id, product)
+        )
+    """)
+
+def _migration_002_stores_dropi_currency_custom(cursor, is_pg):
+    """Adiciona à tabela stores os campos da Dropi, de moeda e de personalização."""
+    _add_column_if_missing(cursor, "stores", "dropi_url", "TEXT", is_pg)
+    _add_column_if_missing(cursor, "stores", "dropi_username", "TEXT", is_pg)
+    _add_column_if_missing(cursor, "stores", "dropi_password", "TEXT", is_pg)
+    _add_column_if_missing(cursor, "stores", "currency_from", "TEXT DEFAULT 'MXN'", is_pg)
+    _add_column_if_missing(cursor, "stores", "currency_to", "TEXT DEFAULT 'BRL'", is_pg)
+    _add_column_if_missing(cursor, "stores", "is_custom", "BOOLEAN DEFAULT FALSE" if is_pg else "INTEGER DEFAULT 0", is_pg)
+
+def _migration_003_product_metrics_url_image(cursor, is_pg):
+    """Adiciona URL e imagem do produto à tabela product_metrics."""
+    _add_column_if_missing(cursor, "product_metrics", "product_url", "TEXT", is_pg)
+    _add_column_if_missing(cursor, "product_metrics", "product_image_url", "TEXT", is_pg)
+
+def _migration_004_dropi_metrics_date_range(cursor, is_pg):
+    """Adiciona intervalo de datas e imagem à tabela dropi_metrics."""
+    _add_column_if_missing(cursor, "dropi_metrics", "date_start", "TEXT", is_pg)
+    _add_column_if_missing(cursor, "dropi_metrics", "date_end", "TEXT", is_pg)
+    _add_column_if_missing(cursor, "dropi_metrics", "image_url", "TEXT", is_pg)
+    cursor.execute("UPDATE dropi_metrics SET date_start = date WHERE date_start IS NULL")
+    cursor.execute("UPDATE dropi_metrics SET date_end = date WHERE date_end IS NULL")
+
+def _migration_005_dropi_metrics_product_instances(cursor, is_pg):
+    """Inclui product_instance_id na chave de dropi_metrics para permitir produtos com mesmo nome."""
+    if "product_instance_id" in _primary_key_columns(cursor, "dropi_metrics", is_pg):
+        return
+    
+    if is_pg:
+        _add_column_if_missing(cursor, "dropi_metrics", "product_instance_id", "TEXT DEFAULT '1'", is_pg)
+        cursor.execute("UPDATE dropi_metrics SET product_instance_id = '1' WHERE product_instance_id IS NULL")
+        cursor.execute("ALTER TABLE dropi_metrics DROP CONSTRAINT IF EXISTS dropi_metrics_pkey")
+        cursor.execute("ALTER TABLE dropi_metrics ADD PRIMARY KEY (store_id, date, product, product_instance_id)")
+    else:
+        # SQLite não permite alterar a chave primária: recria a tabela. Bancos antigos
+        # podem ter uma dropi_metrics_new de uma recriação anterior que falhou no meio
+        cursor.execute("DROP TABLE IF EXISTS dropi_metrics_new")
+        cursor.execute("""
+            CREATE TABLE dropi_metrics_new (
+                store_id TEXT,
+                date TEXT,
+                date_start TEXT,
+                date_end TEXT,
+                product TEXT,
+                product_instance_id TEXT,
+                provider TEXT,
+                stock INTEGER,
+                orders_count INTEGER,
+                orders_value REAL,
+                transit_count INTEGER, 
+                transit_value REAL,
+                delivered_count INTEGER,
+                delivered_value REAL,
+                profits REAL,
+                image_url TEXT,
+                PRIMARY KEY (store_id, date, product, product_instance_id)
+            )
+        """)
+        
+        cursor.execute("""
+            INSERT INTO dropi_metrics_new 
+            SELECT 
+                store_id, date, 
+                COALESCE(date_start, date), 
+                COALESCE(date_end, date),
+                product,
+                CAST(ROWID AS TEXT),
+                provider, stock, orders_count, orders_value,
+                transit_count, transit_value, delivered_count, 
+                delivered_value, profits,
+                COALESCE(image_url, '')
+            FROM dropi_metrics
+        """)
+        
+        cursor.execute("DROP TABLE dropi_metrics")
+        cursor.execute("ALTER TABLE dropi_metrics_new RENAME TO dropi_metrics")
+
+# Índices secundários gerenciados para os caminhos de acesso do dashboard.
+# "include" são colunas extras para tornar o índice de cobertura (INCLUDE no
+# PostgreSQL; no SQLite entram no fim da chave do índice).
+# Lista lida pela migração 006: não altere; índices novos ganham migração própria.
+MANAGED_INDEXES = [
+    {
+        "name": "idx_dropi_metrics_store_range",
+        "table": "dropi_metrics",
+        "columns": ["store_id", "date_start", "date_end"],
+        "include": [],
+    },
+    {
+        "name": "idx_product_metrics_store_date_url",
+        "table": "product_metrics",
+        "columns": ["store_id", "date"],
+        "include": ["product_url"],
+    },
+]
+
+# Consultas do dashboard e o índice que cada uma deve usar (verificado com EXPLAIN)
+INDEX_ACCESS_PATHS = [
+    {
+        "description": "Métricas Dropi por loja e intervalo exato",
+        "query": "SELECT * FROM dropi_metrics WHERE store_id = ? AND date_start = ? AND date_end = ?",
+        "params": ("store", "2024-01-01", "2024-01-31"),
+        "index": "idx_dropi_metrics_store_range",
+    },
+    {
+        "description": "Itens de pedidos Shopify por loja e dia",
+        "query": (
+            "SELECT product, SUM(quantity), SUM(amount) FROM order_line_items "
+            "WHERE store_id = ? AND created_day BETWEEN ? AND ? GROUP BY product"
+        ),
+        "params": ("store", "2024-01-01", "2024-01-31"),
+        "index": "idx_order_line_items_store_day",
+    },
+    {
+        "description": "Totais por produto com URL e imagem do catálogo Shopify",
+        "query": STATEMENTS["order_line_items_totals_range"],
+        "params": ("store", "2024-01-01", "2024-01-31", "store"),
+        "index": "idx_shopify_products_store_title",
+    },
+    {
+        "description": "URLs dos produtos Shopify vendidos no período",
+        "query": STATEMENTS["order_line_items_urls_range"],
+        "params": ("store", "2024-01-01", "2024-01-31"),
+        "index": "idx_shopify_products_store_title",
+    },
+]
+
+def _create_index_statement(index, is_pg):
+    """Monta o CREATE INDEX de um índice gerenciado."""
+    columns = list(index["columns"])
+    include_clause = ""
+    if index["include"]:
+        if is_pg:
+            include_clause = f" INCLUDE ({', '.join(index['include'])})"
         else:
-            # SQLite
+            columns += index["include"]
+    return f"CREATE INDEX IF NOT EXISTS {index['name']} ON {index['table']} ({', '.join(columns)}){include_clause}"
+
+def _migration_006_dashboard_indexes(cursor, is_pg):
+    """Cria os índices secundários usados pelas consultas do dashboard."""
+    for index in MANAGED_INDEXES:
+        cursor.execute(_create_index_statement(index, is_pg))
+
+def explain_query(query, params=None):
+    """
+    Retorna o plano de execução de uma consulta como texto.
+    
+    No PostgreSQL a varredura sequencial é desabilitada durante o EXPLAIN para
+    que tabelas pequenas não escondam se o índice pode ser usado.
+    """
+    is_pg = is_railway_environment()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        if is_pg:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("EXPLAIN " + query.replace("?", "%s"), params or ())
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+        else:
+            cursor.execute("EXPLAIN QUERY PLAN " + query, params or ())
+            plan = "\n".join(row[-1] for row in cursor.fetchall())
+        return plan
+    finally:
+        conn.rollback()
+        conn.close()
+
+def verify_indexes():
+    """
+    Verifica com EXPLAIN se cada consulta do dashboard usa o índice esperado.
+    
+    Returns:
+        Lista de dicionários com descrição, índice esperado, se foi usado e o plano
+    """
+    results = []
+    for path in INDEX_ACCESS_PATHS:
+        try:
+            plan = explain_query(path["query"], path["params"])
+            used = path["index"] in plan
+        except Exception as e:
+            logger.error(f"Erro ao verificar índice {path['index']}: {str(e)}")
+            plan = str(e)
+            used = False
+        
+        if not used:
+            logger.warning(f"Consulta '{path['description']}' não usa o índice {path['index']}")
+        
+        results.append({
+            "description": path["description"],
+            "index": path["index"],
+            "used": used,
+            "plan": plan,
+        })
+    return results
+
+def _migration_007_shopify_sync_state(cursor, is_pg):
+    """Cria as tabelas da sincronização incremental da Shopify."""
+    real = "FLOAT" if is_pg else "REAL"
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sync_state (
+            store_id TEXT PRIMARY KEY,
+            last_updated_at TEXT,
+            covered_start TEXT,
+            last_sync_at TEXT
+        )
+    """)
+    
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS shopify_order_lines (
+            store_id TEXT,
+            order_id TEXT,
+            line_index INTEGER,
+            created_at TEXT,
+            created_day TEXT,
+            updated_at TEXT,
+            product TEXT,
+            quantity INTEGER,
+            amount {real} DEFAULT 0,
+            PRIMARY KEY (store_id, order_id, line_index)
+        )
+    """)
+    
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_shopify_order_lines_store_day "
+        "ON shopify_order_lines (store_id, created_day)"
+    )
+
+def _migration_008_shopify_products(cursor, is_pg):
+    """Cria o catálogo local de produtos da Shopify."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS shopify_products (
+            store_id TEXT,
+            product_id TEXT,
+            title TEXT,
+            handle TEXT,
+            url TEXT,
+            image_url TEXT,
+            updated_at TEXT,
+            PRIMARY KEY (store_id, product_id)
+        )
+    """)
+
+def _migration_009_shopify_metric_days(cursor, is_pg):
+    """
+    Cria o registro dos dias cujas métricas Shopify já estão completas em product_metrics.
+    
+    A partir desta versão product_metrics guarda uma linha por dia do pedido. As
+    linhas antigas (um período inteiro gravado no dia inicial) não são marcadas
+    como cobertas e são substituídas na primeira atualização de cada período.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS shopify_metric_days (
+            store_id TEXT,
+            date TEXT,
+            refreshed_at TEXT,
+            PRIMARY KEY (store_id, date)
+        )
+    """)
+
+def _migration_010_shopify_crawl_checkpoints(cursor, is_pg):
+    """Cria os pontos de retomada das paginações de pedidos da Shopify."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS shopify_crawl_checkpoints (
+            store_id TEXT,
+            crawl_key TEXT,
+            end_cursor TEXT,
+            state TEXT,
+            pages INTEGER DEFAULT 0,
+            orders INTEGER DEFAULT 0,
+            completed INTEGER DEFAULT 0,
+            updated_at TEXT,
+            PRIMARY KEY (store_id, crawl_key)
+        )
+    """)
+
+def _migration_011_order_line_items(cursor, is_pg):
+    """Cria a tabela fato order_line_items (um item de pedido Shopify por linha) no lugar de shopify_order_lines."""
+    if is_pg:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS order_line_items (
+                store_id TEXT NOT NULL,
+                order_id BIGINT NOT NULL,
+                line_index SMALLINT NOT NULL,
+                created_at TIMESTAMPTZ,
+                created_day DATE,
+                created_hour SMALLINT,
+                updated_at TIMESTAMPTZ,
+                product TEXT,
+                quantity INTEGER DEFAULT 0,
+                amount NUMERIC(12, 2) DEFAULT 0,
+                PRIMARY KEY (store_id, order_id, line_index)
+            )
+        """)
+        timestamp = "CAST(NULLIF({}, '') AS TIMESTAMPTZ)"
+        day = "CAST(NULLIF({}, '') AS DATE)"
+    else:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS order_line_items (
+                store_id TEXT NOT NULL,
+                order_id INTEGER NOT NULL,
+                line_index INTEGER NOT NULL,
+                created_at TEXT,
+                created_day TEXT,
+                created_hour INTEGER,
+                updated_at TEXT,
+                product TEXT,
+                quantity INTEGER DEFAULT 0,
+                amount REAL DEFAULT 0,
+                PRIMARY KEY (store_id, order_id, line_index)
+            )
+        """)
+        timestamp = "{}"
+        day = "{}"
+    
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_order_line_items_store_day "
+        "ON order_line_items (store_id, created_day)"
+    )
+    
+    cursor.execute(f"""
+        INSERT INTO order_line_items (
+            store_id, order_id, line_index, created_at, created_day, created_hour,
+            updated_at, product, quantity, amount
+        )
+        SELECT
+            store_id,
+            CAST(REPLACE(order_id, 'gid://shopify/Order/', '') AS BIGINT),
+            line_index,
+            {timestamp.format("created_at")},
+            {day.format("created_day")},
+            CAST(NULLIF(SUBSTR(created_at, 12, 2), '') AS INTEGER),
+            {timestamp.format("updated_at")},
+            product,
+            quantity,
+            amount
+        FROM shopify_order_lines
+        WHERE order_id LIKE 'gid://shopify/Order/%'
+    """)
+    cursor.execute("DROP TABLE shopify_order_lines")
+    
+    placeholder = "%s" if is_pg else "?"
+    cursor.execute("DELETE FROM shopify_metric_days")
+    cursor.execute(
+        "SELECT store_id, covered_start, last_sync_at FROM sync_state "
+        "WHERE covered_start IS NOT NULL AND last_sync_at IS NOT NULL"
+    )
+    refreshed_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for store_id, covered_start, last_sync_at in cursor.fetchall():
+        current = datetime.strptime(covered_start[:10], "%Y-%m-%d")
+        last_day = datetime.strptime(last_sync_at[:10], "%Y-%m-%d")
+        days = []
+        while current <= last_day:
+            days.append((store_id, current.strftime("%Y-%m-%d"), refreshed_at))
+            current += timedelta(days=1)
+        cursor.executemany(
+            f"INSERT INTO shopify_metric_days (store_id, date, refreshed_at) VALUES ({placeholder}, {placeholder}, {placeholder})",
+            days
+        )
+    
+    cursor.execute("DELETE FROM shopify_crawl_checkpoints WHERE crawl_key LIKE 'metrics:%'")
+
+def _migration_012_order_line_items_staging(cursor, is_pg):
+    """Cria a área de preparação dos itens de pedido das buscas completas e bulk, publicados por período."""
+    if is_pg:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS order_line_items_staging (
+                store_id TEXT NOT NULL,
+                crawl_key TEXT NOT NULL,
+                order_id BIGINT NOT NULL,
+                line_index SMALLINT NOT NULL,
+                created_at TIMESTAMPTZ,
+                created_day DATE,
+                created_hour SMALLINT,
+                updated_at TIMESTAMPTZ,
+                product TEXT,
+                quantity INTEGER DEFAULT 0,
+                amount NUMERIC(12, 2) DEFAULT 0,
+                PRIMARY KEY (store_id, crawl_key, order_id, line_index)
+            )
+        """)
+    else:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS order_line_items_staging (
+                store_id TEXT NOT NULL,
+                crawl_key TEXT NOT NULL,
+                order_id INTEGER NOT NULL,
+                line_index INTEGER NOT NULL,
+                created_at TEXT,
+                created_day TEXT,
+                created_hour INTEGER,
+                updated_at TEXT,
+                product TEXT,
+                quantity INTEGER DEFAULT 0,
+                amount REAL DEFAULT 0,
+                PRIMARY KEY (store_id, crawl_key, order_id, line_index)
+            )
+        """)
+
+def _migration_013_stores_shop_timezone(cursor, is_pg):
+    """Adiciona à tabela stores o fuso horário IANA da loja Shopify (dias dos pedidos no horário local)."""
+    _add_column_if_missing(cursor, "stores", "shop_timezone", "TEXT", is_pg)
+
+def _migration_014_drop_product_metrics_index(cursor, is_pg):
+    """Remove o índice de product_metrics, tabela que deixou de ser lida (itens em order_line_items)."""
+    cursor.execute("DROP INDEX IF EXISTS idx_product_metrics_store_date_url")
+
+# Índice do catálogo pelo título, usado na junção com order_line_items.product
+SHOPIFY_PRODUCTS_TITLE_INDEX = {
+    "name": "idx_shopify_products_store_title",
+    "table": "shopify_products",
+    "columns": ["store_id", "title"],
+    "include": ["url", "image_url"],
+}
+
+def _migration_015_shopify_products_title_index(cursor, is_pg):
+    """Cria o índice de shopify_products por (store_id, title), de cobertura para url e image_url."""
+    cursor.execute(_create_index_statement(SHOPIFY_PRODUCTS_TITLE_INDEX, is_pg))
+
+# Lista ordenada de migrações: (versão, nome, função)
+MIGRATIONS = [
+    (1, "create_base_tables", _migration_001_create_base_tables),
+    (2, "stores_dropi_currency_custom", _migration_002_stores_dropi_currency_custom),
+    (3, "product_metrics_url_image", _migration_003_product_metrics_url_image),
+    (4, "dropi_metrics_date_range", _migration_004_dropi_metrics_date_range),
+    (5, "dropi_metrics_product_instances", _migration_005_dropi_metrics_product_instances),
+    (6, "dashboard_indexes", _migration_006_dashboard_indexes),
+    (7, "shopify_sync_state", _migration_007_shopify_sync_state),
+    (8, "shopify_products", _migration_008_shopify_products),
+    (9, "shopify_metric_days", _migration_009_shopify_metric_days),
+    (10, "shopify_crawl_checkpoints", _migration_010_shopify_crawl_checkpoints),
+    (11, "order_line_items", _migration_011_order_line_items),
+    (12, "order_line_items_staging", _migration_012_order_line_items_staging),
+    (13, "stores_shop_timezone", _migration_013_stores_shop_timezone),
+    (14, "drop_product_metrics_index", _migration_014_drop_product_metrics_index),
+    (15, "shopify_products_title_index", _migration_015_shopify_products_title_index),
+]
+
+_migrations_applied = False
+_migrations_lock = threading.Lock()
+
+def run_migrations():
+    """
+    Aplica as migrações pendentes, uma única vez por processo.
+    
+    Depois da primeira execução bem-sucedida as chamadas seguintes retornam
+    imediatamente, sem nenhuma consulta ao banco.
+    """
+    global _migrations_applied
+    if _migrations_applied:
+        return
+    
+    with _migrations_lock:
+        if _migrations_applied:
+            return
+        
+        is_pg = is_railway_environment()
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        try:
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS stores (
-                    id TEXT PRIMARY KEY,
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
                     name TEXT,
-                    shop_name TEXT,
-                    access_token TEXT,
-                    dropi_url TEXT,
-                    dropi_username TEXT,
-                    dropi_password TEXT,
-                    currency_from TEXT DEFAULT 'MXN',
-                    currency_to TEXT DEFAULT 'BRL',
-                    is_custom INTEGER DEFAULT 0
-                )
-            """)
-            
-            # Verificar se a coluna is_custom existe
-            try:
-                cursor.execute("PRAGMA table_info(stores)")
-                columns = [column[1] for column in cursor.fetchall()]
-                if 'is_custom' not in columns:
-                    cursor.execute("ALTER TABLE stores ADD COLUMN is_custom INTEGER DEFAULT 0")
-            except Exception as e:
-                logger.error(f"Erro ao verificar coluna is_custom: {str(e)}")
-            
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS product_metrics (
-                    store_id TEXT,
-                    date TEXT,
-                    product TEXT,
-                    total_orders INTEGER,
-                    processed_orders INTEGER,
-                    delivered_orders INTEGER,
-                    total_value REAL DEFAULT 0,
-                    product_url TEXT,
-                    PRIMARY KEY (store_id, date, product)
+                    applied_at TEXT
                 )
             """)
+            conn.commit()
             
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS dropi_metrics (
-                    store_id TEXT,
-                    date TEXT,
-                    product TEXT,
-                    provider TEXT,
-                    stock INTEGER,
-                    orders_count INTEGER,
-                    orders_value REAL,
-                    transit_count INTEGER, 
-                    transit_value REAL,
-                    delivered_count INTEGER,
-                    delivered_value REAL,
-                    profits REAL,
-                    PRIMARY KEY (store_id, date, product)
-                )
-            """)
+            cursor.execute("SELECT version FROM schema_migrations")
+            applied = {row[0] for row in cursor.fetchall()}
+            conn.commit()
             
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS product_effectiveness (
-                    store_id TEXT,
-                    product TEXT,
-                    general_effectiveness REAL,
-                    last_updated TEXT,
-                    PRIMARY KEY (store_id, product)
-                )
-            """)
+            for version, name, migration in MIGRATIONS:
+                if version in applied:
+                    continue
+                
+                # Cada migração roda em sua própria transação, com lock para
+                # evitar que dois processos apliquem a mesma migração
+                if is_pg:
+                    cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATIONS_LOCK_ID,))
+                    cursor.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (version,))
+                else:
+                    cursor.execute("BEGIN IMMEDIATE")
+                    cursor.execute("SELECT 1 FROM schema_migrations WHERE version = ?", (version,))
+                
+                if cursor.fetchone():
+                    conn.commit()
+                    continue
+                
+                migration(cursor, is_pg)
+                
+                applied_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                insert_query = "INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)"
+                if is_pg:
+                    insert_query = insert_query.replace("?", "%s")
+                cursor.execute(insert_query, (version, name, applied_at))
+                
+                conn.commit()
+                logger.info(f"Migração {version:03d} ({name}) aplicada com sucesso")
             
-            # Tabela para valores personalizados
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS custom_product_data (
-                    store_id TEXT,
-                    product TEXT,
-                    custom_id TEXT,
-                    custom_provider TEXT,
-                    last_updated TEXT,
-                    PRIMARY KEY (store_id, product)
-                )
-            """)
-        
-        conn.commit()
-        logger.info("Banco de dados inicializado com sucesso")
-    except Exception as e:
-        logger.error(f"Erro ao inicializar banco: {str(e)}")
-        conn.rollback()
-        raise e
-    finally:
-        conn.close()
+            _migrations_applied = True
+            _query_cache.clear()
+        except Exception as e:
+            logger.error(f"Erro ao aplicar migrações: {str(e)}")
+            conn.rollback()
+            raise e
+        finally:
+            conn.close()
+
+def init_db():
+    """Inicializa as tabelas no banco de dados (aplica as migrações pendentes)."""
+    run_migrations()
 
 # Funções específicas para operações comuns
 def load_stores():
@@ -319,7 +1790,7 @@ def load_stores():
         init_db()
         
         # Consulta as lojas
-        result = execute_query("SELECT id, name FROM stores", fetch_type='all')
+        result = execute_statement("stores_list", fetch_type='all')
         return result or []
     except Exception as e:
         logger.error(f"Erro ao carregar lojas: {str(e)}")
@@ -328,8 +1799,8 @@ def load_stores():
 def get_store_details(store_id):
     """Obtém os detalhes de uma loja específica."""
     try:
-        result = execute_query(
-            "SELECT name, shop_name, access_token, dropi_url, dropi_username, dropi_password, currency_from, currency_to, is_custom FROM stores WHERE id = ?", 
+        result = execute_statement(
+            "store_details", 
             (store_id,), 
             fetch_type='one'
         )
@@ -381,8 +1852,8 @@ def save_store(name, shop_name, access_token, dropi_url="", dropi_username="", d
 def get_store_currency(store_id):
     """Obtém as configurações de moeda da loja."""
     try:
-        result = execute_query(
-            "SELECT currency_from, currency_to FROM stores WHERE id = ?", 
+        result = execute_statement(
+            "store_currency", 
             (store_id,), 
             fetch_type='one'
         )
@@ -415,162 +1886,221 @@ def save_effectiveness(store_id, product, value):
         logger.error(f"Erro ao salvar efetividade: {str(e)}")
         return False
     
-def update_dropi_metrics_schema():
-    """Atualiza o esquema da tabela dropi_metrics para suportar intervalos de data."""
+def get_store_timezone(store_id):
+    """Retorna o fuso horário IANA gravado para a loja, ou None se ainda não foi obtido."""
+    row = execute_statement("store_timezone", (store_id,), fetch_type='one', cached=False)
+    return row[0] if row else None
+
+def _relocalize_order_lines(cursor, store_id, timezone_name, is_pg):
+    """Recalcula dia e hora de criação dos itens da loja no fuso informado (até então em UTC)."""
+    if is_pg:
+        cursor.execute(
+            "UPDATE order_line_items SET created_day = (created_at AT TIME ZONE %s)::date, "
+            "created_hour = EXTRACT(HOUR FROM created_at AT TIME ZONE %s) "
+            "WHERE store_id = %s AND created_at IS NOT NULL",
+            (timezone_name, timezone_name, store_id)
+        )
+        return
+    
+    cursor.execute(
+        "SELECT order_id, line_index, created_at FROM order_line_items WHERE store_id = ? AND created_at IS NOT NULL",
+        (store_id,)
+    )
+    updates = []
+    for order_id, line_index, created_at in cursor.fetchall():
+        moment = local_datetime(created_at, timezone_name)
+        if moment:
+            updates.append((moment.strftime("%Y-%m-%d"), moment.hour, store_id, order_id, line_index))
+    cursor.executemany(
+        "UPDATE order_line_items SET created_day = ?, created_hour = ? "
+        "WHERE store_id = ? AND order_id = ? AND line_index = ?",
+        updates
+    )
+
+def save_store_timezone(store_id, timezone_name):
+    """
+    Grava o fuso horário da loja e converte para ele os dados Shopify gravados até então em dias UTC.
+    
+    Os itens de pedido recebem o novo dia e hora de criação; o primeiro e o
+    último dia de cada sequência de shopify_metric_days deixam de contar como
+    completos (parte dos seus pedidos ficou em um dia UTC não buscado), assim
+    como o primeiro dia da cobertura da sincronização. Pontos de retomada e
+    itens preparados, montados com os limites UTC, são descartados.
+    
+    Returns:
+        True se a loja existe e o fuso foi gravado
+    """
+    is_pg = is_railway_environment()
+    placeholder = "%s" if is_pg else "?"
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
-        # Verificar se as colunas já existem
-        if is_railway_environment():
-            # PostgreSQL
-            cursor.execute("""
-                SELECT column_name FROM information_schema.columns 
-                WHERE table_name = 'dropi_metrics' AND column_name = 'date_start'
-            """)
-        else:
-            # SQLite
-            cursor.execute("PRAGMA table_info(dropi_metrics)")
-            columns = [column[1] for column in cursor.fetchall()]
-            column_exists = 'date_start' in columns
-            
-            if column_exists:
-                conn.close()
-                return  # As colunas já existem, não faz nada
+        cursor.execute(f"UPDATE stores SET shop_timezone = {placeholder} WHERE id = {placeholder}", (timezone_name, store_id))
+        saved = cursor.rowcount > 0
         
-        # Criar nova tabela com as colunas adicionais
-        if is_railway_environment():
-            # PostgreSQL usa ALTER TABLE para adicionar colunas
-            cursor.execute("ALTER TABLE dropi_metrics ADD COLUMN IF NOT EXISTS date_start TEXT")
-            cursor.execute("ALTER TABLE dropi_metrics ADD COLUMN IF NOT EXISTS date_end TEXT")
+        if saved and not is_utc(timezone_name):
+            _relocalize_order_lines(cursor, store_id, timezone_name, is_pg)
             
-            # Atualizar os dados existentes
-            cursor.execute("UPDATE dropi_metrics SET date_start = date, date_end = date WHERE date_start IS NULL")
-        else:
-            # SQLite - Criar tabela temporária, migrar dados e renomear
-            cursor.execute("""
-                CREATE TABLE dropi_metrics_new (
-                    store_id TEXT,
-                    date TEXT,
-                    date_start TEXT,
-                    date_end TEXT,
-                    product TEXT,
-                    provider TEXT,
-                    stock INTEGER,
-                    orders_count INTEGER,
-                    orders_value REAL,
-                    transit_count INTEGER, 
-                    transit_value REAL,
-                    delivered_count INTEGER,
-                    delivered_value REAL,
-                    profits REAL,
-                    PRIMARY KEY (store_id, date, product)
-                )
-            """)
+            cursor.execute(f"SELECT date FROM shopify_metric_days WHERE store_id = {placeholder} ORDER BY date", (store_id,))
+            days = [datetime.strptime(row[0], "%Y-%m-%d") for row in cursor.fetchall()]
+            edges = {
+                day.strftime("%Y-%m-%d") for index, day in enumerate(days)
+                if index == 0 or index == len(days) - 1
+                or days[index - 1] != day - timedelta(days=1) or days[index + 1] != day + timedelta(days=1)
+            }
+            cursor.executemany(
+                f"DELETE FROM shopify_metric_days WHERE store_id = {placeholder} AND date = {placeholder}",
+                [(store_id, day) for day in edges]
+            )
             
-            # Copiar dados antigos para a nova tabela
-            cursor.execute("""
-                INSERT INTO dropi_metrics_new 
-                SELECT store_id, date, date, date, product, provider, stock, 
-                      orders_count, orders_value, transit_count, transit_value, 
-                      delivered_count, delivered_value, profits
-                FROM dropi_metrics
-            """)
+            cursor.execute(f"SELECT covered_start FROM sync_state WHERE store_id = {placeholder}", (store_id,))
+            row = cursor.fetchone()
+            if row and row[0]:
+                covered_start = (datetime.strptime(row[0], "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+                cursor.execute(
+                    f"UPDATE sync_state SET covered_start = {placeholder} WHERE store_id = {placeholder}",
+                    (covered_start, store_id)
+                )
             
-            # Substituir a tabela antiga pela nova
-            cursor.execute("DROP TABLE dropi_metrics")
-            cursor.execute("ALTER TABLE dropi_metrics_new RENAME TO dropi_metrics")
+            for table in ("order_line_items_staging", "shopify_crawl_checkpoints"):
+                cursor.execute(f"DELETE FROM {table} WHERE store_id = {placeholder}", (store_id,))
         
         conn.commit()
-        logger.info("Esquema da tabela dropi_metrics atualizado com sucesso")
     except Exception as e:
-        logger.error(f"Erro ao atualizar esquema: {str(e)}")
+        logger.error(f"Erro ao gravar o fuso horário da loja {store_id}: {str(e)}")
         conn.rollback()
+        raise e
     finally:
         conn.close()
+    
+    for table in ("stores", "order_line_items", "shopify_metric_days", "sync_state", "order_line_items_staging", "shopify_crawl_checkpoints"):
+        _query_cache.invalidate(table, store_id)
+    return saved
+
+def get_sync_state(store_id):
+    """
+    Retorna o estado da sincronização incremental da loja.
+    
+    Returns:
+        Dicionário com last_updated_at, covered_start e last_sync_at, ou None se a loja nunca foi sincronizada
+    """
+    row = execute_statement("sync_state_by_store", (store_id,), fetch_type='one', cached=False)
+    if not row:
+        return None
+    return {"last_updated_at": row[0], "covered_start": row[1], "last_sync_at": row[2]}
+
+def save_sync_state(store_id, last_updated_at, covered_start):
+    """Grava a marca d'água (updated_at) e o início do período coberto pela sincronização da loja."""
+    data = {
+        "store_id": store_id,
+        "last_updated_at": last_updated_at,
+        "covered_start": covered_start,
+        "last_sync_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+    execute_upsert("sync_state", data, ["store_id"])
 
-def update_dropi_metrics_schema_for_duplicates():
-    """Atualiza o esquema da tabela dropi_metrics para permitir produtos duplicados."""
+def get_covered_metric_days(store_id, start_date, end_date):
+    """Retorna o conjunto de dias (YYYY-MM-DD) do período com métricas Shopify completas."""
+    rows = execute_statement("metric_days_range", (store_id, start_date, end_date), cached=False)
+    return {row[0] for row in rows}
+
+def mark_metric_days(store_id, days):
+    """Registra os dias informados como completos em order_line_items (todos os pedidos do dia gravados)."""
+    refreshed_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows = [{"store_id": store_id, "date": day, "refreshed_at": refreshed_at} for day in days]
+    execute_upsert_many("shopify_metric_days", rows, ["store_id", "date"])
+
+def get_crawl_checkpoint(store_id, crawl_key):
+    """
+    Retorna o ponto de retomada de uma paginação de pedidos.
+    
+    Returns:
+        Dicionário com end_cursor, state (JSON), pages, orders, completed e updated_at, ou None
+    """
+    row = execute_statement("crawl_checkpoint_by_key", (store_id, crawl_key), fetch_type='one', cached=False)
+    if not row:
+        return None
+    return {
+        "end_cursor": row[0],
+        "state": row[1],
+        "pages": row[2] or 0,
+        "orders": row[3] or 0,
+        "completed": bool(row[4]),
+        "updated_at": row[5],
+    }
+
+def save_crawl_checkpoint(store_id, crawl_key, end_cursor, state, pages, orders, completed):
+    """Grava o cursor da última página lida (e os totais parciais) de uma paginação de pedidos."""
+    data = {
+        "store_id": store_id,
+        "crawl_key": crawl_key,
+        "end_cursor": end_cursor,
+        "state": state,
+        "pages": pages,
+        "orders": orders,
+        "completed": 1 if completed else 0,
+        "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+    execute_upsert("shopify_crawl_checkpoints", data, ["store_id", "crawl_key"])
+
+def delete_crawl_checkpoints(store_id, crawl_keys):
+    """Remove os pontos de retomada informados (paginações já gravadas por completo)."""
+    crawl_keys = list(crawl_keys)
+    if not crawl_keys:
+        return
+    placeholders = ", ".join("?" for _ in crawl_keys)
+    execute_query(
+        f"DELETE FROM shopify_crawl_checkpoints WHERE store_id = ? AND crawl_key IN ({placeholders})",
+        (store_id, *crawl_keys)
+    )
+
+def purge_crawl_checkpoints(store_id, expired_before, keep_keys=()):
+    """
+    Remove os pontos de retomada da loja gravados antes de expired_before e as
+    linhas preparadas que ficaram sem ponto de retomada, em uma única transação.
+    
+    As chaves dependem do período buscado: sem esta limpeza, o que sobra de uma
+    busca interrompida de um período que não volta a ser pedido ficaria para sempre.
+    
+    Args:
+        keep_keys: Buscas em andamento, nunca removidas
+    
+    Returns:
+        Dicionário com checkpoints e staged (linhas removidas de cada tabela)
+    """
+    is_pg = is_railway_environment()
+    placeholder = "%s" if is_pg else "?"
+    keep_keys = list(keep_keys)
+    keep_clause = f" AND crawl_key NOT IN ({', '.join([placeholder] * len(keep_keys))})" if keep_keys else ""
+    
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
-        # Para SQLite precisamos recriar a tabela com a nova estrutura
-        if not is_railway_environment():
-            # 1. Criar tabela temporária com nova estrutura
-            cursor.execute("""
-                CREATE TABLE dropi_metrics_new (
-                    store_id TEXT,
-                    date TEXT,
-                    date_start TEXT,
-                    date_end TEXT,
-                    product TEXT,
-                    product_instance_id TEXT,  -- Novo campo para distinguir produtos com mesmo nome
-                    provider TEXT,
-                    stock INTEGER,
-                    orders_count INTEGER,
-                    orders_value REAL,
-                    transit_count INTEGER, 
-                    transit_value REAL,
-                    delivered_count INTEGER,
-                    delivered_value REAL,
-                    profits REAL,
-                    image_url TEXT,
-                    PRIMARY KEY (store_id, date, product, product_instance_id)
-                )
-            """)
-            
-            # 2. Migrar dados com um ID único para cada linha
-            cursor.execute("""
-                INSERT INTO dropi_metrics_new 
-                SELECT 
-                    store_id, date, 
-                    COALESCE(date_start, date) as date_start, 
-                    COALESCE(date_end, date) as date_end,
-                    product,
-                    CAST(ROWID as TEXT) as product_instance_id,
-                    provider, stock, orders_count, orders_value,
-                    transit_count, transit_value, delivered_count, 
-                    delivered_value, profits,
-                    COALESCE(image_url, '') as image_url
-                FROM dropi_metrics
-            """)
-            
-            # 3. Substituir tabela antiga pela nova
-            cursor.execute("DROP TABLE dropi_metrics")
-            cursor.execute("ALTER TABLE dropi_metrics_new RENAME TO dropi_metrics")
-            
-        else:
-            # Para PostgreSQL precisaríamos remover a restrição existente e adicionar uma nova
-            # Isso é mais complexo e requer verificações adicionais
-            cursor.execute("""
-                ALTER TABLE dropi_metrics 
-                ADD COLUMN IF NOT EXISTS product_instance_id TEXT DEFAULT '1'
-            """)
-            
-            # Tentar remover a constraint antiga e criar uma nova
-            try:
-                cursor.execute("ALTER TABLE dropi_metrics DROP CONSTRAINT dropi_metrics_pkey")
-            except:
-                logger.warning("Não foi possível remover a constraint antiga, talvez ela já tenha sido modificada")
-                
-            try:
-                cursor.execute("""
-                    ALTER TABLE dropi_metrics 
-                    ADD PRIMARY KEY (store_id, date, product, product_instance_id)
-                """)
-            except:
-                logger.warning("Não foi possível adicionar a nova primary key, talvez ela já exista")
-        
+        cursor.execute(
+            f"DELETE FROM shopify_crawl_checkpoints WHERE store_id = {placeholder} "
+            f"AND (updated_at IS NULL OR updated_at < {placeholder}){keep_clause}",
+            (store_id, expired_before, *keep_keys)
+        )
+        checkpoints = cursor.rowcount
+        cursor.execute(
+            f"DELETE FROM order_line_items_staging WHERE store_id = {placeholder} AND crawl_key NOT IN "
+            f"(SELECT crawl_key FROM shopify_crawl_checkpoints WHERE store_id = {placeholder}){keep_clause}",
+            (store_id, store_id, *keep_keys)
+        )
+        staged = cursor.rowcount
         conn.commit()
-        logger.info("Esquema da tabela dropi_metrics atualizado para suportar produtos duplicados")
-        return True
     except Exception as e:
-        logger.error(f"Erro ao atualizar esquema: {str(e)}")
+        logger.error(f"Erro ao limpar pontos de retomada expirados: {str(e)}")
         conn.rollback()
-        return False
+        raise e
     finally:
         conn.close()
+    
+    for table in ("order_line_items_staging", "shopify_crawl_checkpoints"):
+        _query_cache.invalidate(table, store_id)
+    return {"checkpoints": checkpoints, "staged": staged}
 
 def delete_store_by_id(store_id):
     """
@@ -590,6 +2120,12 @@ def delete_store_by_id(store_id):
         "product_metrics": 0,
         "dropi_metrics": 0,
         "product_effectiveness": 0,
+        "order_line_items": 0,
+        "order_line_items_staging": 0,
+        "shopify_products": 0,
+        "shopify_metric_days": 0,
+        "shopify_crawl_checkpoints": 0,
+        "sync_state": 0,
         "stores": 0
     }
     
@@ -621,7 +2157,15 @@ def delete_store_by_id(store_id):
             cursor.execute("DELETE FROM product_effectiveness WHERE store_id = ?", (store_id,))
         deleted_counts["product_effectiveness"] = cursor.rowcount
         
-        # 4. Finalmente, excluir a loja
+        # 4. Excluir os pedidos sincronizados, o catálogo e o estado da sincronização
+        for table in ("order_line_items", "order_line_items_staging", "shopify_products", "shopify_metric_days", "shopify_crawl_checkpoints", "sync_state"):
+            if is_railway_environment():
+                cursor.execute(f"DELETE FROM {table} WHERE store_id = %s", (store_id,))
+            else:
+                cursor.execute(f"DELETE FROM {table} WHERE store_id = ?", (store_id,))
+            deleted_counts[table] = cursor.rowcount
+        
+        # 5. Finalmente, excluir a loja
         if is_railway_environment():
             cursor.execute("DELETE FROM stores WHERE id = %s", (store_id,))
         else:
@@ -630,6 +2174,9 @@ def delete_store_by_id(store_id):
         
         # Confirmar a transação
         conn.commit()
+        for table in deleted_counts:
+            _query_cache.invalidate(table, store_id)
+        _query_cache.invalidate("custom_product_data", store_id)
         
         # Verificar se a loja foi realmente excluída
         if deleted_counts["stores"] == 0:
@@ -0,0 +1,1223 @@
+import streamlit as st
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from webdriver_manager.chrome import ChromeDriverManager
+from datetime import datetime
+import logging
+import time
+import re
+
+from db_utils import execute_statement, execute_upsert, replace_period, is_railway_environment
+
+# Configuração do logger
+logger = logging.getLogger("dropi_utils")
+
+# Funções para manipular dados personalizados
+def get_custom_product_data(store_id):
+    """Obtém os dados personalizados dos produtos de uma loja."""
+    try:
+        result = execute_statement("custom_product_data", (store_id,), fetch_type='all')
+        
+        custom_data = {}
+        if result:
+            for row in result:
+                product = row[0]
+                custom_data[product] = {
+                    "custom_id": row[1],
+                    "custom_provider": row[2]
+                }
+        
+        return custom_data
+    except Exception as e:
+        logger.error(f"Erro ao obter dados personalizados: {str(e)}")
+        return {}
+
+def save_custom_product_data(store_id, product, custom_id, custom_provider):
+    """Salva dados personalizados para um produto."""
+    try:
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+        data = {
+            "store_id": store_id,
+            "product": product,
+            "custom_id": custom_id,
+            "custom_provider": custom_provider,
+            "last_updated": current_time
+        }
+        
+        execute_upsert("custom_product_data", data, ["store_id", "product"])
+        return True
+    except Exception as e:
+        logger.error(f"Erro ao salvar dados personalizados: {str(e)}")
+        return False
+
+# === FUNÇÕES PARA Dropi ===
+
+def setup_selenium(headless=True):
+    """Configure and initialize Selenium WebDriver for cloud environment."""
+    # Configure Chrome options for cloud environment
+    chrome_options = Options()
+    
+    # Sempre use headless mode no ambiente cloud
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    
+    # Configurações adicionais para melhorar a estabilidade
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_argument("--dns-prefetch-disable")
+    
+    try:
+        if is_railway_environment():
+            # No Railway, o ChromeDriver deve estar disponível no PATH
+            driver = webdriver.Chrome(options=chrome_options)
+            logger.info("Selenium WebDriver initialized in production mode")
+        else:
+            # Em desenvolvimento, usar ChromeDriverManager 
+            service = Service(ChromeDriverManager().install())
+            driver = webdriver.Chrome(service=service, options=chrome_options)
+            logger.info("Selenium WebDriver initialized in development mode")
+        
+        return driver
+        
+    except Exception as e:
+        logger.error(f"Failed to initialize WebDriver: {str(e)}")
+        st.error(f"Erro ao inicializar o navegador: {str(e)}")
+        return None
+
+def login(driver, email, password, logger, url="https://app.dropi.mx/"):
+    """Função de login super robusta."""
+    try:
+        # Abre o site em uma nova janela maximizada
+        driver.maximize_window()
+        
+        # Navega para a página de login usando a URL fornecida
+        logger.info(f"Navegando para a página de login: {url}")
+        driver.get(url)
+        time.sleep(5)  # Espera fixa de 5 segundos
+        
+        # Tira screenshot para análise
+        driver.save_screenshot("login_page.png")
+        logger.info("Screenshot da página salvo como login_page.png")
+        
+        # Inspeciona a página e loga a estrutura HTML para análise
+        logger.info("Analisando estrutura da página de login...")
+        html = driver.page_source
+        logger.info(f"Título da página: {driver.title}")
+        logger.info(f"URL atual: {driver.current_url}")
+        
+        # Tenta encontrar os campos usando diferentes métodos
+        
+        # MÉTODO 1: Tenta encontrar os campos por XPath direto
+        try:
+            logger.info("Tentando encontrar campos por XPath...")
+            
+            # Lista todos os inputs para depuração
+            inputs = driver.find_elements(By.TAG_NAME, 'input')
+            logger.info(f"Total de campos input encontrados: {len(inputs)}")
+            for i, inp in enumerate(inputs):
+                input_type = inp.get_attribute('type')
+                input_id = inp.get_attribute('id')
+                input_name = inp.get_attribute('name')
+                logger.info(f"Input #{i}: tipo={input_type}, id={input_id}, name={input_name}")
+            
+            # Tenta localizar o campo de email/usuário - tentando diferentes atributos
+            email_field = None
+            
+            # Tenta por tipo "email"
+            try:
+                email_field = driver.find_element(By.XPATH, "//input[@type='email']")
+                logger.info("Campo de email encontrado por type='email'")
+            except:
+                pass
+                
+            # Tenta por tipo "text"
+            if not email_field:
+                try:
+                    email_field = driver.find_element(By.XPATH, "//input[@type='text']")
+                    logger.info("Campo de email encontrado por type='text'")
+                except:
+                    pass
+            
+            # Tenta pelo primeiro input
+            if not email_field and len(inputs) > 0:
+                email_field = inputs[0]
+                logger.info("Usando primeiro campo input encontrado para email")
+            
+            # Se encontrou o campo de email, preenche
+            if email_field:
+                email_field.clear()
+                email_field.send_keys(email)
+                logger.info(f"Email preenchido: {email}")
+            else:
+                raise Exception("Não foi possível encontrar o campo de email")
+            
+            # Procura o campo de senha
+            password_field = None
+            
+            # Tenta por tipo "password"
+            try:
+                password_field = driver.find_element(By.XPATH, "//input[@type='password']")
+                logger.info("Campo de senha encontrado por type='password'")
+            except:
+                pass
+            
+            # Tenta usando o segundo input
+            if not password_field and len(inputs) > 1:
+                password_field = inputs[1]
+                logger.info("Usando segundo campo input encontrado para senha")
+            
+            # Se encontrou o campo de senha, preenche
+            if password_field:
+                password_field.clear()
+                password_field.send_keys(password)
+                logger.info("Senha preenchida")
+            else:
+                raise Exception("Não foi possível encontrar o campo de senha")
+            
+            # Lista todos os botões para depuração
+            buttons = driver.find_elements(By.TAG_NAME, 'button')
+            logger.info(f"Total de botões encontrados: {len(buttons)}")
+            for i, btn in enumerate(buttons):
+                btn_text = btn.text
+                btn_type = btn.get_attribute('type')
+                logger.info(f"Botão #{i}: texto='{btn_text}', tipo={btn_type}")
+            
+            # Procura o botão de login
+            login_button = None
+            
+            # Tenta por tipo "submit"
+            try:
+                login_button = driver.find_element(By.XPATH, "//button[@type='submit']")
+                logger.info("Botão de login encontrado por type='submit'")
+            except:
+                pass
+            
+            # Tenta por texto
+            if not login_button:
+                for btn in buttons:
+                    if "iniciar" in btn.text.lower() or "login" in btn.text.lower() or "entrar" in btn.text.lower():
+                        login_button = btn
+                        logger.info(f"Botão de login encontrado pelo texto: '{btn.text}'")
+                        break
+            
+            # Se não encontrou por texto específico, usa o primeiro botão
+            if not login_button and len(buttons) > 0:
+                login_button = buttons[0]
+                logger.info("Usando primeiro botão encontrado para login")
+            
+            # Se encontrou o botão, clica
+            if login_button:
+                login_button.click()
+                logger.info("Clicado no botão de login")
+            else:
+                raise Exception("Não foi possível encontrar o botão de login")
+            
+            # Aguarda a navegação
+            time.sleep(8)
+            
+            # Tira screenshot após o login
+            driver.save_screenshot("after_login.png")
+            logger.info("Screenshot após login salvo como after_login.png")
+            
+            # Verifica se o login foi bem-sucedido
+            current_url = driver.current_url
+            logger.info(f"URL após tentativa de login: {current_url}")
+            
+            # Tenta encontrar elementos que aparecem após login bem-sucedido
+            menu_items = driver.find_elements(By.TAG_NAME, 'a')
+            for item in menu_items:
+                logger.info(f"Item de menu encontrado: '{item.text}'")
+                if "dashboard" in item.text.lower() or "orders" in item.text.lower():
+                    logger.info(f"Item de menu confirmando login: '{item.text}'")
+                    return True
+            
+            # Se não encontrou elementos claros de login, verifica se estamos na URL de dashboard
+            if "dashboard" in current_url or "orders" in current_url:
+                logger.info("Login confirmado pela URL")
+                return True
+            
+            # Se chegou aqui, o login pode ter falhado
+            logger.warning("Não foi possível confirmar se o login foi bem-sucedido. Tentando continuar mesmo assim.")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Erro no método 1: {str(e)}")
+            # Continua para o próximo método
+            return False
+    
+    except Exception as e:
+        logger.error(f"Erro geral no login: {str(e)}")
+        return False
+
+def navigate_to_product_sold(driver, logger):
+    """Navigate to the Product Sold report in Dropi."""
+    try:
+        # Esperar que a página carregue completamente após o login
+        time.sleep(5)
+        
+        # Capturar screenshot para diagnóstico
+        driver.save_screenshot("post_login.png")
+        logger.info(f"URL atual: {driver.current_url}")
+        
+        # Primeiro, tentar encontrar o menu Reports/Reportes
+        reports_xpath_options = [
+            "//a[contains(text(), 'Reports')]",
+            "//a[contains(text(), 'Reportes')]",
+            "//span[contains(text(), 'Reports')]/parent::a",
+            "//span[contains(text(), 'Reportes')]/parent::a",
+            "//div[contains(@class, 'sidebar')]//a[contains(., 'Report')]"
+        ]
+        
+        for xpath in reports_xpath_options:
+            try:
+                logger.info(f"Tentando xpath: {xpath}")
+                WebDriverWait(driver, 5).until(EC.element_to_be_clickable((By.XPATH, xpath)))
+                reports_link = driver.find_element(By.XPATH, xpath)
+                logger.info(f"Menu Reports encontrado: {reports_link.text}")
+                reports_link.click()
+                logger.info("Clicou no menu Reports")
+                time.sleep(3)
+                break
+            except Exception as e:
+                logger.warning(f"Xpath {xpath} falhou: {str(e)}")
+        
+        # Agora tenta encontrar e clicar em Product Sold
+        product_sold_xpath_options = [
+            "//a[contains(text(), 'Product Sold')]",
+            "//a[contains(text(), 'Productos Vendidos')]",
+            "//span[contains(text(), 'Product Sold')]/parent::a",
+            "//span[contains(text(), 'Productos Vendidos')]/parent::a"
+        ]
+        
+        for xpath in product_sold_xpath_options:
+            try:
+                logger.info(f"Tentando xpath para Product Sold: {xpath}")
+                WebDriverWait(driver, 5).until(EC.element_to_be_clickable((By.XPATH, xpath)))
+                product_sold_link = driver.find_element(By.XPATH, xpath)
+                logger.info(f"Link Product Sold encontrado: {product_sold_link.text}")
+                product_sold_link.click()
+                logger.info("Clicou em Product Sold")
+                time.sleep(3)
+                break
+            except Exception as e:
+                logger.warning(f"Xpath {xpath} falhou: {str(e)}")
+        
+        # Confirmar que estamos na página correta
+        driver.save_screenshot("product_sold_page.png")
+        logger.info(f"URL após navegar: {driver.current_url}")
+        
+        # Verificar se há elementos que indicam sucesso
+        page_loaded = False
+        for check_elem in ["Rango de fecha", "Date Range", "producto", "Vendidos"]:
+            try:
+                driver.find_element(By.XPATH, f"//*[contains(text(), '{check_elem}')]")
+                page_loaded = True
+                logger.info(f"Página confirmada pelo elemento: {check_elem}")
+                break
+            except:
+                pass
+        
+        if page_loaded:
+            return True
+        else:
+            logger.error("Não foi possível confirmar se estamos na página correta")
+            return False
+            
+    except Exception as e:
+        logger.error(f"Erro ao navegar para Product Sold: {str(e)}")
+        return False
+
+def select_date_range(driver, start_date, end_date, logger):
+    """Select a specific date range in the Product Sold report with enhanced support for recent dates."""
+    try:
+        # Formatação das datas para exibição no formato esperado pelo Dropi (DD/MM/YYYY)
+        start_date_formatted = start_date.strftime("%d/%m/%Y")
+        end_date_formatted = end_date.strftime("%d/%m/%Y")
+        
+        logger.info(f"Tentando selecionar intervalo de datas: {start_date_formatted} a {end_date_formatted}")
+        
+        # Capturar screenshot para diagnóstico
+        driver.save_screenshot("before_date_select.png")
+        
+        # Função para verificar se o calendário está aberto
+        def is_calendar_open():
+            try:
+                calendar_elements = driver.find_elements(By.XPATH, 
+                    "//div[contains(@class, 'p-datepicker') or contains(@class, 'daterangepicker') or contains(@class, 'calendar')]")
+                return len(calendar_elements) > 0
+            except:
+                return False
+        
+        # Seletores específicos para o campo de data, baseado na captura de tela e no log
+        date_selectors = [
+            "//div[contains(@class, 'date-field') or contains(@class, 'date-picker')]",
+            "//div[@class='datepicker-toggle']",
+            "//div[contains(@class, 'datepicker')]//input",
+            "//div[contains(@class, 'daterangepicker')]",
+            "//input[contains(@class, 'form-control') and contains(@class, 'daterange')]",
+            "//button[contains(@class, 'date') or contains(@class, 'calendar')]",
+            "//div[contains(text(), '/') and (contains(@class, 'date') or contains(@class, 'calendar'))]",
+            "//*[contains(text(), 'Date Range') or contains(text(), 'Rango de fecha')]",
+            # Adicionar seletores mais genéricos para encontrar qualquer elemento de data
+            "//input[contains(@placeholder, 'fecha') or contains(@placeholder, 'date')]",
+            "//div[contains(@class, 'date')]",
+            "//div[contains(@class, 'calendar')]"
+        ]
+        
+        # Tentar clicar no seletor de data
+        clicked = False
+        for selector in date_selectors:
+            try:
+                logger.info(f"Tentando seletor de data: {selector}")
+                try:
+                    element = WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, selector)))
+                    driver.execute_script("arguments[0].style.border='3px solid red'", element)
+                    driver.save_screenshot("highlighted_date_field.png")
+                    logger.info(f"Elemento de data encontrado, HTML: {element.get_attribute('outerHTML')}")
+                    element.click()
+                    logger.info(f"Clicou no seletor de data: {selector}")
+                    
+                    # Verificar se o calendário apareceu
+                    time.sleep(2)
+                    if is_calendar_open():
+                        logger.info("Calendário aberto com sucesso")
+                        clicked = True
+                        break
+                    else:
+                        logger.warning("Calendário não apareceu após o clique. Tentando outra abordagem.")
+                except Exception as e:
+                    logger.warning(f"Clique direto no seletor {selector} falhou: {str(e)}")
+                    
+                # Tentar JavaScript click como alternativa
+                element = driver.find_element(By.XPATH, selector)
+                driver.execute_script("arguments[0].click();", element)
+                logger.info(f"Clicou via JavaScript no seletor de data: {selector}")
+                
+                # Verificar se o calendário apareceu
+                time.sleep(2)
+                if is_calendar_open():
+                    logger.info("Calendário aberto com sucesso via JavaScript")
+                    clicked = True
+                    break
+                else:
+                    logger.warning("Calendário não apareceu após o clique via JavaScript. Tentando outro seletor.")
+            except Exception as e:
+                logger.warning(f"Seletor {selector} falhou completamente: {str(e)}")
+        
+        # Se as opções acima falharem, tentar encontrar qualquer elemento que pareça com um seletor de data
+        if not clicked:
+            try:
+                logger.info("Tentando abordagem alternativa: procurando elementos de data na página")
+                driver.save_screenshot("date_field_search.png")
+                potential_date_elements = driver.find_elements(By.XPATH, 
+                                                            "//*[contains(@class, 'date') or contains(@class, 'calendar') or contains(@class, 'picker')]")
+                
+                logger.info(f"Encontrou {len(potential_date_elements)} potenciais elementos de data")
+                for i, elem in enumerate(potential_date_elements):
+                    try:
+                        logger.info(f"Elemento {i+1}: {elem.get_attribute('outerHTML')}")
+                        driver.execute_script("arguments[0].style.border='3px solid blue'", elem)
+                        driver.save_screenshot(f"date_candidate_{i+1}.png")
+                        elem.click()
+                        logger.info(f"Clicou com sucesso no potencial elemento de data {i+1}")
+                        
+                        # Verificar se o calendário apareceu
+                        time.sleep(2)
+                        if is_calendar_open():
+                            logger.info(f"Calendário aberto com sucesso após clicar no elemento {i+1}")
+                            clicked = True
+                            break
+                        else:
+                            logger.warning(f"Calendário não apareceu após clicar no elemento {i+1}")
+                    except Exception as e:
+                        logger.warning(f"Não conseguiu clicar no elemento {i+1}: {str(e)}")
+                        try:
+                            driver.execute_script("arguments[0].click();", elem)
+                            logger.info(f"Clicou via JavaScript no potencial elemento de data {i+1}")
+                            
+                            # Verificar se o calendário apareceu
+                            time.sleep(2)
+                            if is_calendar_open():
+                                logger.info(f"Calendário aberto com sucesso após clicar via JS no elemento {i+1}")
+                                clicked = True
+                                break
+                            else:
+                                logger.warning(f"Calendário não apareceu após clicar via JS no elemento {i+1}")
+                        except:
+                            pass
+            except Exception as e:
+                logger.error(f"Falha na abordagem alternativa para encontrar o seletor de data: {str(e)}")
+        
+        if not clicked:
+            logger.error("Não foi possível clicar no seletor de data")
+            return False
+        
+        # Esperar o popup do calendário aparecer
+        time.sleep(3)
+        driver.save_screenshot("date_popup.png")
+        
+        # Verificar e navegar para o mês/ano correto
+        expected_month = start_date.strftime("%B")  # Nome do mês em inglês
+        expected_year = start_date.strftime("%Y")
+        logger.info(f"Mês/ano desejado: {expected_month} {expected_year}")
+        
+        # Funções de utilidade para verificar o mês atual e navegar
+        def get_current_month_year():
+            try:
+                month_year_elements = driver.find_elements(By.XPATH, 
+                    "//div[contains(@class, 'p-datepicker-title') or contains(@class, 'datepicker-title') or contains(@class, 'calendar-title')]")
+                if month_year_elements:
+                    return month_year_elements[0].text
+                return None
+            except:
+                return None
+
+        def is_desired_month(current_text):
+            if not current_text:
+                return False
+                
+            # Mapeamento para nomes de meses em inglês
+            month_map = {
+                'January': 1, 'February': 2, 'March': 3, 'April': 4,
+                'May': 5, 'June': 6, 'July': 7, 'August': 8,
+                'September': 9, 'October': 10, 'November': 11, 'December': 12
+            }
+            
+            # Mapear nomes em espanhol
+            spanish_month_map = {
+                'Enero': 1, 'Febrero': 2, 'Marzo': 3, 'Abril': 4,
+                'Mayo': 5, 'Junio': 6, 'Julio': 7, 'Agosto': 8,
+                'Septiembre': 9, 'Octubre': 10, 'Noviembre': 11, 'Diciembre': 12
+            }
+            
+            import re
+            # Regex mais flexível para extrair mês e ano
+            match = re.search(r'(\w+)[\s,]+(\d{4})', current_text)
+            if not match:
+                return False
+                
+            current_month_str = match.group(1)
+            current_year_str = match.group(2)
+            
+            # Tentar obter o número do mês
+            current_month = None
+            if current_month_str in month_map:
+                current_month = month_map[current_month_str]
+            elif current_month_str in spanish_month_map:
+                current_month = spanish_month_map[current_month_str]
+            else:
+                # Tenta com uma substring parcial para maior flexibilidade
+                for month_name, month_num in {**month_map, **spanish_month_map}.items():
+                    if month_name.lower() in current_month_str.lower():
+                        current_month = month_num
+                        break
+                
+            if not current_month:
+                return False
+                
+            # Comparar com o mês e ano desejados
+            desired_month = int(start_date.strftime("%m"))
+            desired_year = int(start_date.strftime("%Y"))
+            
+            return (current_month == desired_month and int(current_year_str) == desired_year)
+            
+        # Tentar navegar até encontrar o mês desejado (máximo de 12 tentativas)
+        max_attempts = 12
+        attempt = 0
+        correct_month_found = False
+        
+        while attempt < max_attempts and not correct_month_found:
+            current_month_year = get_current_month_year()
+            logger.info(f"Mês/ano atual do calendário: {current_month_year}")
+            
+            if is_desired_month(current_month_year):
+                logger.info(f"Mês desejado encontrado: {current_month_year}")
+                correct_month_found = True
+                break
+                
+            # Se não estiver no mês desejado, clicar no botão de mês anterior/próximo
+            logger.info(f"Mês atual não é o desejado. Tentando navegar.")
+            
+            # Comparar datas para saber se precisa avançar ou retroceder
+            def should_go_forward(current_text):
+                if not current_text:
+                    return False  # Por segurança, preferimos não avançar quando não temos certeza
+                
+                month_map = {
+                    'January': 1, 'February': 2, 'March': 3, 'April': 4,
+                    'May': 5, 'June': 6, 'July': 7, 'August': 8,
+                    'September': 9, 'October': 10, 'November': 11, 'December': 12,
+                    'Enero': 1, 'Febrero': 2, 'Marzo': 3, 'Abril': 4,
+                    'Mayo': 5, 'Junio': 6, 'Julio': 7, 'Agosto': 8,
+                    'Septiembre': 9, 'Octubre': 10, 'Noviembre': 11, 'Diciembre': 12
+                }
+                
+                import re
+                match = re.search(r'(\w+)[\s,]+(\d{4})', current_text)
+                if not match:
+                    return False
+                
+                current_month_str = match.group(1)
+                current_year_str = match.group(2)
+                
+                # Determinar o mês atual
+                current_month = None
+                for month_name, month_num in month_map.items():
+                    if month_name.lower() in current_month_str.lower():
+                        current_month = month_num
+                        break
+                
+                if not current_month:
+                    return False
+                
+                current_year = int(current_year_str)
+                desired_month = int(start_date.strftime("%m"))
+                desired_year = int(start_date.strftime("%Y"))
+                
+                # Calcular se precisa avançar (True) ou retroceder (False)
+                if current_year < desired_year:
+                    return True
+                elif current_year > desired_year:
+                    return False
+                else:  # Mesmo ano
+                    return current_month < desired_month
+            
+            # Determinar se devemos avançar ou retroceder
+            go_forward = should_go_forward(current_month_year)
+            
+            # Selecionar os botões apropriados
+            if go_forward:
+                logger.info("Tentando navegar para o próximo mês")
+                nav_button_selectors = [
+                    "//button[contains(@class, 'next')]",
+                    "//a[contains(@class, 'next')]",
+                    "//div[contains(@class, 'p-datepicker-next')]",
+                    "//span[contains(@class, 'p-datepicker-next-icon')]/..",
+                    "//div[contains(@class, 'datepicker-next')]",
+                    "//i[contains(@class, 'next-icon')]/..",
+                    "//button[contains(@class, 'forward') or contains(@class, 'adelante')]"
+                ]
+            else:
+                logger.info("Tentando navegar para o mês anterior")
+                nav_button_selectors = [
+                    "//button[contains(@class, 'prev')]",
+                    "//a[contains(@class, 'prev')]",
+                    "//div[contains(@class, 'p-datepicker-prev')]",
+                    "//span[contains(@class, 'p-datepicker-prev-icon')]/..",
+                    "//div[contains(@class, 'datepicker-prev')]",
+                    "//i[contains(@class, 'prev-icon')]/..",
+                    "//button[contains(@class, 'back') or contains(@class, 'previo')]"
+                ]
+            
+            button_clicked = False
+            for selector in nav_button_selectors:
+                try:
+                    nav_elements = driver.find_elements(By.XPATH, selector)
+                    if nav_elements:
+                        nav_button = nav_elements[0]
+                        driver.execute_script("arguments[0].style.border='3px solid purple'", nav_button)
+                        driver.save_screenshot(f"nav_button_{attempt+1}.png")
+                        
+                        # Tentar clique direto
+                        try:
+                            nav_button.click()
+                            logger.info(f"Clicou no botão de navegação, tentativa {attempt+1}")
+                            button_clicked = True
+                            break
+                        except:
+                            # Tentar via JavaScript
+                            driver.execute_script("arguments[0].click();", nav_button)
+                            logger.info(f"Clicou via JavaScript no botão de navegação, tentativa {attempt+1}")
+                            button_clicked = True
+                            break
+                except Exception as e:
+                    logger.warning(f"Erro ao tentar clicar no botão {selector}: {str(e)}")
+            
+            if not button_clicked:
+                logger.warning(f"Não conseguiu clicar no botão de navegação na tentativa {attempt+1}")
+                break
+                
+            # Esperar a atualização do calendário
+            time.sleep(2)
+            attempt += 1
+        
+        if not correct_month_found:
+            logger.warning("Não foi possível navegar até o mês desejado após múltiplas tentativas")
+            # Vamos tentar selecionar os dias mesmo assim, no mês atual
+            
+        # Capturar screenshot após navegação entre meses
+        driver.save_screenshot("after_month_navigation.png")
+        
+        # Melhor estratégia para selecionar dia no calendário
+        def select_day(day_number, description):
+            """
+            Método aprimorado para selecionar um dia específico no calendário,
+            capaz de lidar com diferentes estruturas HTML dos dias.
+            """
+            logger.info(f"Tentando selecionar {description}: dia {day_number}")
+            day_str = str(day_number)
+            
+            # Capture o estado atual do calendário
+            driver.save_screenshot(f"calendar_before_{description}.png")
+            
+            # Listar todos os seletores possíveis para o dia (do mais específico para o mais genérico)
+            day_selectors = [
+                # Lidar com dias com classe 'p-highlight' (selecionados)
+                f"//span[contains(@class, 'p-highlight') and text()='{day_str}']",
+                f"//td[contains(@class, 'p-highlight')]//span[text()='{day_str}']",
+                
+                # Lidar com dias normais sem highlight
+                f"//span[contains(@class, 'p-element') and text()='{day_str}']",
+                f"//td//span[text()='{day_str}']",
+                
+                # Estruturas genéricas adicionais
+                f"//table[contains(@class, 'p-datepicker-calendar')]//span[normalize-space()='{day_str}']",
+                f"//div[contains(@class, 'day') and normalize-space()='{day_str}']",
+                f"//td[normalize-space()='{day_str}']",
+                
+                # Qualquer elemento com o texto do dia que não esteja desativado
+                f"//*[normalize-space()='{day_str}' and not(contains(@class, 'disabled'))]"
+            ]
+            
+            # Tentar cada seletor
+            for selector in day_selectors:
+                try:
+                    logger.info(f"Tentando seletor: {selector}")
+                    day_elements = driver.find_elements(By.XPATH, selector)
+                    
+                    if day_elements:
+                        logger.info(f"Encontrados {len(day_elements)} elementos para o dia {day_str}")
+                        
+                        # Tentar cada elemento encontrado
+                        for i, day_elem in enumerate(day_elements):
+                            try:
+                                # Verificar se o elemento está visível
+                                if not day_elem.is_displayed():
+                                    logger.info(f"Elemento {i+1} não está visível, pulando")
+                                    continue
+                                
+                                # Verificar se o elemento está na parte visível do mês atual
+                                class_attr = day_elem.get_attribute("class") or ""
+                                if "disabled" in class_attr or "hidden" in class_attr or "other-month" in class_attr:
+                                    logger.info(f"Elemento {i+1} está desabilitado ou é de outro mês, pulando")
+                                    continue
+                                
+                                # Destacar o elemento para diagnóstico
+                                driver.execute_script("arguments[0].style.border='3px solid green'", day_elem)
+                                driver.save_screenshot(f"{description}_candidate_{i+1}.png")
+                                
+                                # Tentar diferentes métodos de clique
+                                try:
+                                    # 1. Clique direto
+                                    day_elem.click()
+                                    logger.info(f"Clicou no dia {day_str} (elemento {i+1})")
+                                    return True
+                                except Exception as e1:
+                                    logger.warning(f"Clique direto falhou: {str(e1)}")
+                                    
+                                    try:
+                                        # 2. Clique via JavaScript
+                                        driver.execute_script("arguments[0].click();", day_elem)
+                                        logger.info(f"Clicou via JavaScript no dia {day_str} (elemento {i+1})")
+                                        return True
+                                    except Exception as e2:
+                                        logger.warning(f"Clique via JavaScript falhou: {str(e2)}")
+                                        
+                                        try:
+                                            # 3. Ações encadeadas
+                                            from selenium.webdriver.common.action_chains import ActionChains
+                                            actions = ActionChains(driver)
+                                            actions.move_to_element(day_elem).click().perform()
+                                            logger.info(f"Clicou via ActionChains no dia {day_str} (elemento {i+1})")
+                                            return True
+                                        except Exception as e3:
+                                            logger.warning(f"Clique via ActionChains falhou: {str(e3)}")
+                            except Exception as e:
+                                logger.warning(f"Erro ao processar elemento {i+1}: {str(e)}")
+                except Exception as e:
+                    logger.warning(f"Erro ao usar seletor {selector}: {str(e)}")
+            
+            # Se todos os seletores específicos falharem, tentar uma abordagem mais genérica
+            try:
+                # Procurar qualquer elemento visível com o texto do dia
+                all_elements = driver.find_elements(By.XPATH, f"//*[contains(text(), '{day_str}')]")
+                logger.info(f"Abordagem genérica: encontrados {len(all_elements)} elementos contendo '{day_str}'")
+                
+                for i, elem in enumerate(all_elements):
+                    try:
+                        if not elem.is_displayed():
+                            continue
+                            
+                        text = elem.text.strip()
+                        # Verificar se o texto é exatamente o número do dia
+                        if text == day_str:
+                            driver.execute_script("arguments[0].style.border='3px solid blue'", elem)
+                            driver.save_screenshot(f"{description}_generic_{i+1}.png")
+                            
+                            # Tentar clique
+                            try:
+                                elem.click()
+                                logger.info(f"Clicou no dia {day_str} (abordagem genérica)")
+                                return True
+                            except:
+                                driver.execute_script("arguments[0].click();", elem)
+                                logger.info(f"Clicou via JS no dia {day_str} (abordagem genérica)")
+                                return True
+                    except:
+                        continue
+            except Exception as e:
+                logger.warning(f"Abordagem genérica falhou: {str(e)}")
+                
+            # Se chegou aqui, não conseguiu selecionar o dia
+            logger.error(f"Não foi possível selecionar o dia {day_str} para {description}")
+            return False
+        
+        # Tentar selecionar a data inicial
+        start_day = int(start_date.strftime("%d"))
+        start_day_selected = select_day(start_day, "data_inicial")
+        
+        # Aguardar processamento da seleção da data inicial
+        time.sleep(3)
+        driver.save_screenshot("after_start_date_select.png")
+        
+        # Tentar selecionar a data final
+        end_day = int(end_date.strftime("%d"))
+        end_day_selected = select_day(end_day, "data_final")
+        
+        # Aguardar processamento da seleção da data final
+        time.sleep(3)
+        driver.save_screenshot("after_end_date_select.png")
+        
+        # Tentar confirmar a seleção se houver botão de aplicar/confirmar
+        try:
+            # Lista expandida de possíveis botões de confirmação
+            confirm_buttons_xpaths = [
+                "//button[contains(text(), 'Apply') or contains(text(), 'Aplicar')]",
+                "//button[contains(text(), 'OK') or contains(text(), 'Ok')]",
+                "//button[contains(text(), 'Done') or contains(text(), 'Concluir')]",
+                "//button[contains(text(), 'Confirm') or contains(text(), 'Confirmar')]",
+                "//button[contains(@class, 'confirm') or contains(@class, 'apply')]",
+                "//button[contains(@class, 'btn-primary') or contains(@class, 'btn-success')]",
+                "//span[contains(text(), 'Aplicar')]/parent::button",
+                "//span[contains(text(), 'Apply')]/parent::button"
+            ]
+            
+            for xpath in confirm_buttons_xpaths:
+                try:
+                    elements = driver.find_elements(By.XPATH, xpath)
+                    if elements:
+                        confirm_button = elements[0]
+                        logger.info(f"Botão de confirmação encontrado: {confirm_button.text}")
+                        # Destacar o botão
+                        driver.execute_script("arguments[0].style.border='3px solid green'", confirm_button)
+                        driver.save_screenshot("confirm_button.png")
+                        
+                        # Tentar clicar
+                        try:
+                            confirm_button.click()
+                            logger.info("Clicou no botão de confirmação")
+                            break
+                        except:
+                            # Tentar via JavaScript
+                            driver.execute_script("arguments[0].click();", confirm_button)
+                            logger.info("Clicou via JavaScript no botão de confirmação")
+                            break
+                except Exception as e:
+                    logger.warning(f"Erro ao tentar usar seletor de botão {xpath}: {str(e)}")
+        except Exception as e:
+            logger.info(f"Não encontrou botão de confirmação: {str(e)}, continuando...")
+        
+        # Esperar carregamento dos dados
+        time.sleep(5)
+        driver.save_screenshot("after_date_select.png")
+        
+        # Verificar resultado da seleção
+        success = start_day_selected or end_day_selected
+        
+        if success:
+            logger.info(f"Pelo menos uma data foi selecionada com sucesso")
+            if start_day_selected and end_day_selected:
+                logger.info("Ambas as datas foram selecionadas com sucesso")
+            elif start_day_selected:
+                logger.warning("Apenas a data inicial foi selecionada")
+            else:
+                logger.warning("Apenas a data final foi selecionada")
+        else:
+            logger.error("Não foi possível selecionar nenhuma das datas")
+        
+        return success
+    except Exception as e:
+        logger.error(f"Erro ao selecionar intervalo de datas: {str(e)}")
+        return False
+
+def extract_product_data(driver, logger):
+    """Extract product data from the Product Sold report with improved accuracy."""
+    try:
+        logger.info("Iniciando extração de dados dos produtos com método melhorado")
+        driver.save_screenshot("product_cards.png")
+        
+        # Esperar que a página carregue completamente
+        time.sleep(5)
+        
+        products_data = []
+        
+        # Lista de textos a ignorar (cabeçalhos, títulos, etc)
+        ignore_texts = [
+            "Informe de productos", 
+            "Reporte de productos",
+            "Productos vendidos",
+            "Productos en transito",
+            "Resumen",
+            "Total",
+            "Filtrar"
+        ]
+        
+        # Localizar todos os cards de produtos usando um seletor mais específico
+        product_cards = driver.find_elements(By.XPATH, "//div[contains(@class, 'card') or contains(@class, 'product-card') or contains(@class, 'item')]")
+        
+        logger.info(f"Encontrados {len(product_cards)} cards de produtos")
+        
+        if not product_cards or len(product_cards) < 1:
+            # Método alternativo: tentar localizar pelo container de imagem que geralmente precede os dados
+            product_cards = driver.find_elements(By.XPATH, "//div[.//img]/following-sibling::div[1]")
+            logger.info(f"Método alternativo: Encontrados {len(product_cards)} cards via containers de imagem")
+        
+        # Processar cada card de produto individualmente
+        for i, card in enumerate(product_cards):
+            try:
+                # Verificar se este é realmente um card de produto válido
+                card_text = card.text
+                
+                # Ignorar cards vazios ou inválidos
+                if not card_text or len(card_text) < 20:
+                    continue
+                
+                # Para debug
+                logger.info(f"Processando card #{i+1}:\n{card_text[:100]}...")
+                
+                # Tentar extrair a imagem do produto - procurando um elemento img no card ou no elemento anterior
+                image_url = ""
+                try:
+                    # Primeiro tenta encontrar imagem dentro do card atual
+                    img_elements = card.find_elements(By.XPATH, ".//img")
+                    if img_elements:
+                        image_url = img_elements[0].get_attribute("src")
+                        logger.info(f"Imagem encontrada no card: {image_url}")
+                    else:
+                        # Se não encontrar, tenta em elementos próximos
+                        try:
+                            # Tenta elemento pai que pode conter a imagem
+                            parent = card.find_element(By.XPATH, "..")
+                            img_elements = parent.find_elements(By.XPATH, ".//img")
+                            if img_elements:
+                                image_url = img_elements[0].get_attribute("src")
+                                logger.info(f"Imagem encontrada no pai: {image_url}")
+                        except:
+                            pass
+                            
+                        # Tenta elemento anterior que pode conter a imagem
+                        try:
+                            # Usando JavaScript para acessar o elemento irmão anterior
+                            sibling_img = driver.execute_script("""
+                                var el = arguments[0];
+                                var sibling = el.previousElementSibling;
+                                return sibling ? sibling.querySelector('img') : null;
+                            """, card)
+                            
+                            if sibling_img:
+                                image_url = sibling_img.get_attribute("src")
+                                logger.info(f"Imagem encontrada no irmão anterior via JS: {image_url}")
+                        except Exception as e:
+                            logger.warning(f"Erro ao tentar encontrar imagem no elemento adjacente: {str(e)}")
+                except Exception as e:
+                    logger.warning(f"Erro ao buscar imagem para o produto: {str(e)}")
+                
+                # Extrair nome do produto (geralmente o primeiro texto substancial no card)
+                lines = card_text.split('\n')
+                if not lines:
+                    continue
+                    
+                product_name = lines[0]
+                
+                # Verificar se o nome do produto não é um dos textos a ignorar
+                if any(ignore_text.lower() in product_name.lower() for ignore_text in ignore_texts):
+                    logger.info(f"Ignorando texto '{product_name}' por ser um cabeçalho ou título")
+                    continue
+                
+                # Verificações adicionais para validar que é um produto real
+                # 1. Deve ter pelo menos alguns caracteres no nome
+                if len(product_name) < 5:
+                    logger.info(f"Ignorando '{product_name}': nome muito curto")
+                    continue
+                    
+                # 2. Deve ter palavras "Stock" ou "Proveedor" no card
+                if "Stock:" not in card_text and "Proveedor:" not in card_text:
+                    logger.info(f"Ignorando '{product_name}': não contém informações de produto")
+                    continue
+                
+                # Inicializar dados do produto
+                product_data = {
+                    "product": product_name,
+                    "provider": "",
+                    "stock": 0,
+                    "orders_count": 0,
+                    "orders_value": 0.0,
+                    "transit_count": 0,
+                    "transit_value": 0.0,
+                    "delivered_count": 0,
+                    "delivered_value": 0.0,
+                    "profits": 0.0,
+                    "image_url": image_url  # Adicionando URL da imagem
+                }
+                
+                # Extrair informações específicas deste card apenas
+                # Tentar extrair o fornecedor diretamente deste card
+                try:
+                    provider_element = card.find_element(By.XPATH, ".//div[contains(text(), 'Proveedor:')]")
+                    provider_text = provider_element.text
+                    if "Proveedor:" in provider_text:
+                        product_data["provider"] = provider_text.split("Proveedor:")[1].strip()
+                except:
+                    # Tentar método alternativo com regex no texto completo
+                    provider_match = re.search(r'Proveedor:\s*([^\n]+)', card_text)
+                    if provider_match:
+                        product_data["provider"] = provider_match.group(1).strip()
+                
+                # Extrair estoque diretamente deste card
+                try:
+                    stock_element = card.find_element(By.XPATH, ".//div[contains(text(), 'Stock:')]")
+                    stock_text = stock_element.text
+                    stock_match = re.search(r'Stock:\s*(\d+)', stock_text)
+                    if stock_match:
+                        product_data["stock"] = int(stock_match.group(1))
+                except:
+                    # Método alternativo com regex
+                    stock_match = re.search(r'Stock:\s*(\d+)', card_text)
+                    if stock_match:
+                        product_data["stock"] = int(stock_match.group(1))
+                
+                # Extrair vendidos (ordens)
+                orders_match = re.search(r'(\d+)\s+ordenes', card_text)
+                if orders_match:
+                    product_data["orders_count"] = int(orders_match.group(1))
+                    
+                    # Buscar o valor das ordens (geralmente na linha seguinte)
+                    orders_value_match = re.search(r'ordenes\s*\n\s*\$\s*([\d.,]+)', card_text)
+                    if orders_value_match:
+                        value_str = orders_value_match.group(1).replace('.', '').replace(',', '.')
+                        try:
+                            product_data["orders_value"] = float(value_str)
+                        except:
+                            pass
+                
+                # Extrair em trânsito
+                transit_match = re.search(r'(\d+)\s+productos\s*\n\s*En\s+transito', card_text, re.IGNORECASE) or \
+                               re.search(r'En\s+transito\s*\n\s*(\d+)\s+productos', card_text, re.IGNORECASE)
+                
+                if transit_match:
+                    product_data["transit_count"] = int(transit_match.group(1))
+                    
+                    # Buscar o valor em trânsito
+                    transit_value_match = re.search(r'En\s+transito\s*\n.*\n\s*\$\s*([\d.,]+)', card_text, re.IGNORECASE)
+                    if transit_value_match:
+                        value_str = transit_value_match.group(1).replace('.', '').replace(',', '.')
+                        try:
+                            product_data["transit_value"] = float(value_str)
+                        except:
+                            pass
+                
+                # Extrair entregados
+                delivered_match = re.search(r'(\d+)\s+productos\s*\n\s*Entregados', card_text, re.IGNORECASE) or \
+                                 re.search(r'Entregados\s*\n\s*(\d+)\s+productos', card_text, re.IGNORECASE)
+                
+                if delivered_match:
+                    product_data["delivered_count"] = int(delivered_match.group(1))
+                    
+                    # Buscar o valor entregados
+                    delivered_value_match = re.search(r'Entregados\s*\n.*\n\s*\$\s*([\d.,]+)', card_text, re.IGNORECASE)
+                    if delivered_value_match:
+                        value_str = delivered_value_match.group(1).replace('.', '').replace(',', '.')
+                        try:
+                            product_data["delivered_value"] = float(value_str)
+                        except:
+                            pass
+                
+                # Extrair ganâncias
+                profits_match = re.search(r'Ganancias\s*\n\s*\$\s*([\d.,]+)', card_text, re.IGNORECASE)
+                if profits_match:
+                    value_str = profits_match.group(1).replace('.', '').replace(',', '.')
+                    try:
+                        product_data["profits"] = float(value_str)
+                    except:
+                        pass
+                
+                # Verificação final mais rigorosa - produto real deve ter pelo menos duas métricas válidas
+                valid_metrics_count = sum([
+                    product_data["stock"] > 0,
+                    product_data["orders_count"] > 0,
+                    product_data["transit_count"] > 0,
+                    product_data["delivered_count"] > 0,
+                    product_data["profits"] > 0
+                ])
+                
+                if valid_metrics_count >= 1:
+                    products_data.append(product_data)
+                    logger.info(f"Produto '{product_name}' processado com sucesso")
+                else:
+                    logger.warning(f"Produto '{product_name}' ignorado por não ter dados significativos")
+                
+            except Exception as e:
+                logger.error(f"Erro ao processar card #{i+1}: {str(e)}")
+        
+        logger.info(f"Total de {len(products_data)} produtos extraídos com sucesso")
+        return products_data
+        
+    except Exception as e:
+        logger.error(f"Erro geral ao extrair dados dos produtos: {str(e)}")
+        return []
+
+def save_dropi_metrics_to_db(store_id, date_str, products_data, start_date_str=None, end_date_str=None):
+    """Save Dropi product metrics to the database with date interval support."""
+    # Se as datas de início e fim não foram fornecidas, use a data de referência para ambas
+    if not start_date_str:
+        start_date_str = date_str
+    if not end_date_str:
+        end_date_str = date_str
+    
+    # Substituir os dados do período - cada produto com um ID de instância único
+    import uuid
+    
+    rows = []
+    for product in products_data:
+        product_name = product.get("product", "")
+        if not product_name:
+            continue
+        
+        rows.append({
+            "store_id": store_id,
+            "date": date_str,
+            "date_start": start_date_str,
+            "date_end": end_date_str,
+            "product": product_name,
+            # Gerar ID único para cada instância de produto
+            "product_instance_id": str(uuid.uuid4()),
+            "provider": product.get("provider", ""),
+            "stock": product.get("stock", 0),
+            "orders_count": product.get("orders_count", 0),
+            "orders_value": product.get("orders_value", 0),
+            "transit_count": product.get("transit_count", 0),
+            "transit_value": product.get("transit_value", 0),
+            "delivered_count": product.get("delivered_count", 0),
+            "delivered_value": product.get("delivered_value", 0),
+            "profits": product.get("profits", 0),
+            "image_url": product.get("image_url", "")
+        })
+    
+    try:
+        result = replace_period("dropi_metrics", store_id, (start_date_str, end_date_str), rows)
+        saved_count = result["inserted"]
+    except Exception as e:
+        logger.error(f"Erro ao salvar produtos da Dropi: {str(e)}")
+        raise e
+    
+    logger.info(f"Total de {saved_count} produtos salvos com sucesso de {len(products_data)}")
+    return saved_count > 0
+
+def update_dropi_data_silent(store, start_date, end_date):
+    """Atualiza os dados da Dropi sem exibir feedback de progresso."""
+    # Configurar o driver Selenium
+    driver = setup_selenium(headless=True)
+    
+    if not driver:
+        return False
+    
+    try:
+        # Converter datas para strings
+        start_date_str = start_date.strftime("%Y-%m-%d")
+        end_date_str = end_date.strftime("%Y-%m-%d")
+        
+        # Data de referência é a mesma da final (mantido para compatibilidade)
+        date_str = end_date_str
+        
+        logger.info(f"Buscando dados Dropi para o período: {start_date_str} a {end_date_str}")
+        
+        # Fazer login no Dropi
+        success = login(driver, store["dropi_username"], store["dropi_password"], logger, store["dropi_url"])
+        
+        if not success:
+            driver.quit()
+            return False
+        
+        # Navegar para o relatório de produtos vendidos
+        if not navigate_to_product_sold(driver, logger):
+            driver.quit()
+            return False
+        
+        # Selecionar intervalo de datas específicas
+        if not select_date_range(driver, start_date, end_date, logger):
+            driver.quit()
+            return False
+        
+        # Extrair dados dos produtos
+        product_data = extract_product_data(driver, logger)
+        
+        if not product_data:
+            driver.quit()
+            return False
+        
+        # Verificar se a loja está no modo personalizado
+        is_custom = store.get("is_custom", False)
+        
+        if is_custom:
+            # Obter os dados personalizados antes de limpar
+            custom_data = get_custom_product_data(store["id"])
+            
+            # Para cada produto nos novos dados, preservar os valores personalizados
+            for product in product_data:
+                product_name = product.get("product", "")
+                if product_name in custom_data:
+                    # Usar o fornecedor personalizado se existir
+                    if custom_data[product_name].get("custom_provider"):
+                        product["provider"] = custom_data[product_name]["custom_provider"]
+        
+        # Limpar dados antigos e salvar os novos - agora com datas inicial e final
+        if not save_dropi_metrics_to_db(store["id"], date_str, product_data, start_date_str, end_date_str):
+            logger.error("Nenhum produto da Dropi foi salvo no banco")
+            driver.quit()
+            return False
+        
+        # Verificar após salvar (depuração)
+        try:
+            from db_utils import execute_query
+            result = execute_query(
+                """
+                SELECT COUNT(*) FROM dropi_metrics 
+                WHERE store_id = ? 
+                  AND date_start = ? 
+                  AND date_end = ?
+                """, 
+                (store["id"], start_date_str, end_date_str),
+                fetch_type='one'
+            )
+            count = result[0] if result else 0
+            logger.info(f"Verificação: {count} produtos salvos no banco para o período {start_date_str} a {end_date_str}")
+        except Exception as e:
+            logger.error(f"Erro na verificação de contagem: {str(e)}")
+        
+        driver.quit()
+        return True
+            
+    except Exception as e:
+        logger.error(f"Erro ao atualizar dados da Dropi: {str(e)}")
+        try:
+            driver.quit()
+        except:
+            pass
+        return False
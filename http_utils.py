@@ -0,0 +1,118 @@
+import requests
+from requests.adapters import HTTPAdapter
+import threading
+import logging
+import random
+import os
+import time
+
+# Configuração do logger
+logger = logging.getLogger("http_utils")
+
+# Tempo máximo (em segundos) para abrir a conexão e para esperar dados da resposta
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+
+# Conexões keep-alive mantidas por host e quantidade de hosts com pool próprio
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "10"))
+HTTP_MAX_HOSTS = int(os.getenv("HTTP_MAX_HOSTS", "20"))
+
+# Novas tentativas com espera exponencial e jitter (erros de conexão, 429 e 5xx)
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "30"))
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+class ManagedSession(requests.Session):
+    """
+    Sessão HTTP com timeout padrão e compressão.
+
+    Toda requisição sem timeout explícito usa (HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT), para que um servidor travado não prenda a thread
+    do script para sempre.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.headers["Accept-Encoding"] = "gzip, deflate"
+        # pool_block=True limita as conexões simultâneas por host ao tamanho do pool
+        adapter = HTTPAdapter(
+            pool_connections=HTTP_MAX_HOSTS,
+            pool_maxsize=HTTP_MAX_CONNECTIONS_PER_HOST,
+            pool_block=True
+        )
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+        return super().request(method, url, **kwargs)
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_http_session():
+    """Retorna a sessão HTTP do processo, com conexões keep-alive reaproveitadas entre requisições."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = ManagedSession()
+    return _session
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Tempo de espera antes da tentativa attempt (0, 1, 2...).
+
+    Usa o Retry-After do servidor quando informado; caso contrário, espera
+    exponencial com jitter completo (aleatório entre 0 e o limite da tentativa),
+    para que clientes que falharam juntos não tentem de novo ao mesmo tempo.
+    """
+    if retry_after is not None:
+        try:
+            return min(float(retry_after), HTTP_BACKOFF_MAX)
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt)))
+
+def http_request(method, url, retries=None, session=None, **kwargs):
+    """
+    Faz uma requisição pela sessão compartilhada, repetindo erros transitórios.
+
+    Erros de conexão, timeouts e respostas 429/5xx são repetidos até retries
+    vezes (padrão HTTP_MAX_RETRIES). Se as tentativas acabarem, a última
+    resposta é retornada (ou a última exceção é lançada).
+
+    Args:
+        method: Método HTTP ('GET', 'POST'...)
+        url: URL de destino
+        retries: Número máximo de novas tentativas
+        session: Sessão a usar (padrão: get_http_session())
+        **kwargs: Repassados para requests (json, headers, timeout, stream...)
+
+    Returns:
+        requests.Response
+    """
+    session = session or get_http_session()
+    retries = HTTP_MAX_RETRIES if retries is None else retries
+
+    for attempt in range(retries + 1):
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt >= retries:
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning(f"Falha de conexão com {url} ({str(e)}); nova tentativa em {delay:.2f}s")
+            time.sleep(delay)
+            continue
+
+        if response.status_code in RETRY_STATUSES and attempt < retries:
+            delay = backoff_delay(attempt, response.headers.get("Retry-After"))
+            logger.warning(f"{url} respondeu {response.status_code}; nova tentativa em {delay:.2f}s")
+            response.close()
+            time.sleep(delay)
+            continue
+
+        return response
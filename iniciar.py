@@ -11,7 +11,13 @@ st.set_page_config(
 )
 
 # Importar utilitários de banco de dados
-from db_utils import load_stores, get_store_details, save_store
+from db_utils import load_stores, get_store_details, save_store, init_db
+
+# Aplicar migrações de esquema pendentes (executa de fato só uma vez por processo)
+try:
+    init_db()
+except Exception as e:
+    st.error(f"Erro ao inicializar banco de dados: {str(e)}")
 
 # CSS atualizado com bordas arredondadas e fundo verde para tabelas
 st.markdown("""
@@ -0,0 +1,190 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
+import os
+import time
+from datetime import datetime
+
+from db_utils import load_stores, get_store_details
+from shopify_utils import (
+    get_shopify_url, get_shopify_headers, sync_shopify_data, stream_shopify_metrics,
+    rebuild_order_lines_from_archive, script_ctx_initializer
+)
+from dropi_utils import update_dropi_data_silent
+
+# Configuração do logger
+logger = logging.getLogger("refresh_utils")
+
+# Lojas atualizadas ao mesmo tempo por fonte: cada atualização Dropi abre um
+# Chrome (centenas de MB de memória), enquanto a Shopify é só HTTP
+REFRESH_DROPI_WORKERS = int(os.getenv("REFRESH_DROPI_WORKERS", "1"))
+REFRESH_SHOPIFY_WORKERS = int(os.getenv("REFRESH_SHOPIFY_WORKERS", "4"))
+
+REFRESH_SOURCES = ("shopify", "dropi")
+
+class RefreshSkipped(Exception):
+    """A loja não tem configuração para a fonte (ex.: sem credenciais da Dropi)."""
+
+def refresh_shopify_store(store, start_date, end_date, mode="incremental"):
+    """
+    Atualiza as métricas Shopify de uma loja, como o botão "Atualizar Dados Shopify".
+
+    Args:
+        mode: 'incremental' (pedidos novos ou alterados) ou 'completo' (dias que faltam no banco)
+
+    Returns:
+        Texto com o resultado da atualização
+    """
+    if not store.get("shop_name") or not store.get("access_token"):
+        raise RefreshSkipped("loja sem credenciais da Shopify")
+
+    url = get_shopify_url(store["shop_name"])
+    headers = get_shopify_headers(store["access_token"])
+    start_date_str = start_date.strftime("%Y-%m-%d")
+    end_date_str = end_date.strftime("%Y-%m-%d")
+
+    if mode == "completo":
+        ranges = stream_shopify_metrics(store["id"], url, headers, start_date_str, end_date_str)
+        return f"{len(ranges)} período(s) buscado(s)" if ranges else "período já atualizado"
+
+    summary = sync_shopify_data(store["id"], url, headers, start_date_str)
+    return f"{summary['orders']} pedidos novos ou alterados"
+
+def refresh_dropi_store(store, start_date, end_date, mode=None):
+    """
+    Atualiza as métricas Dropi de uma loja pelo Selenium, como o botão "Atualizar Dados Dropi".
+
+    Returns:
+        Texto com o resultado da atualização
+    """
+    if not store.get("dropi_username") or not store.get("dropi_password"):
+        raise RefreshSkipped("loja sem credenciais da Dropi")
+
+    if not update_dropi_data_silent(store, start_date, end_date):
+        raise RuntimeError("falha ao extrair ou salvar os dados da Dropi (ver logs)")
+    return "dados extraídos e salvos"
+
+REFRESHERS = {
+    "shopify": refresh_shopify_store,
+    "dropi": refresh_dropi_store,
+}
+
+def _refresh_store_source(store_id, source, start_date, end_date, shopify_mode):
+    """
+    Executa a atualização de uma fonte de uma loja sem deixar exceções escaparem.
+
+    Cada tarefa busca seus próprios detalhes da loja e grava só os dados dela:
+    a falha de uma loja (ou de uma fonte) não interrompe as demais.
+    """
+    started = time.perf_counter()
+    result = {"store_id": store_id, "store": store_id, "source": source, "status": "ok", "detail": ""}
+
+    try:
+        store = get_store_details(store_id)
+        if not store:
+            raise RuntimeError("loja não encontrada")
+        result["store"] = store["name"]
+        result["detail"] = REFRESHERS[source](store, start_date, end_date, shopify_mode)
+    except RefreshSkipped as e:
+        result["status"] = "ignorada"
+        result["detail"] = str(e)
+    except Exception as e:
+        logger.error(f"Erro ao atualizar {source} da loja {store_id}: {str(e)}")
+        result["status"] = "erro"
+        result["detail"] = str(e) or type(e).__name__
+
+    result["duration"] = time.perf_counter() - started
+    return result
+
+def refresh_stores(start_date, end_date, store_ids=None, sources=REFRESH_SOURCES, shopify_mode="incremental", progress=None):
+    """
+    Atualiza Shopify e/ou Dropi de várias lojas em paralelo.
+
+    Cada fonte tem o próprio pool de threads (REFRESH_SHOPIFY_WORKERS e
+    REFRESH_DROPI_WORKERS), então as lojas da Shopify avançam enquanto os
+    navegadores da Dropi, limitados a poucos de cada vez, seguem em fila.
+
+    Args:
+        start_date, end_date: Período (date ou datetime)
+        store_ids: Lojas a atualizar (padrão: todas as lojas cadastradas)
+        sources: Fontes a atualizar ('shopify', 'dropi')
+        shopify_mode: 'incremental' ou 'completo'
+        progress: Função opcional chamada a cada tarefa concluída com (concluídas, total, resultado)
+
+    Returns:
+        Dicionário com results (uma linha por loja e fonte: store, source, status,
+        detail, duration), ok, failed, skipped e duration (tempo total)
+    """
+    if store_ids is None:
+        store_ids = [store_id for store_id, _ in load_stores()]
+
+    caps = {"shopify": REFRESH_SHOPIFY_WORKERS, "dropi": REFRESH_DROPI_WORKERS}
+    attach_ctx = script_ctx_initializer()
+
+    started = time.perf_counter()
+    executors = {
+        source: ThreadPoolExecutor(max_workers=max(1, caps[source]), initializer=attach_ctx)
+        for source in sources
+    }
+    results = []
+
+    try:
+        futures = [
+            executors[source].submit(_refresh_store_source, store_id, source, start_date, end_date, shopify_mode)
+            for store_id in store_ids
+            for source in sources
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if progress:
+                progress(len(results), len(futures), result)
+    finally:
+        for executor in executors.values():
+            executor.shutdown(wait=True)
+
+    results.sort(key=lambda result: (result["store"], result["source"]))
+    report = {
+        "results": results,
+        "ok": sum(1 for result in results if result["status"] == "ok"),
+        "failed": sum(1 for result in results if result["status"] == "erro"),
+        "skipped": sum(1 for result in results if result["status"] == "ignorada"),
+        "duration": time.perf_counter() - started,
+    }
+    logger.info(
+        f"Atualização de {len(store_ids)} loja(s) concluída em {report['duration']:.1f}s: "
+        f"{report['ok']} ok, {report['failed']} com erro, {report['skipped']} ignorada(s)"
+    )
+    return report
+
+def rebuild_stores_from_archive(start_date, end_date, store_ids=None):
+    """
+    Regrava os itens de pedido das lojas a partir do arquivo local de pedidos, sem chamar a API.
+
+    Args:
+        start_date, end_date: Período (YYYY-MM-DD)
+        store_ids: Lojas a reprocessar (padrão: todas as lojas cadastradas)
+
+    Returns:
+        Lista com uma linha por loja: store_id, status, days (dias reprocessados) e duration
+    """
+    if store_ids is None:
+        store_ids = [store_id for store_id, _ in load_stores()]
+
+    results = []
+    for store_id in store_ids:
+        started = time.perf_counter()
+        result = {"store_id": store_id, "status": "ok", "days": 0}
+        try:
+            ranges = rebuild_order_lines_from_archive(store_id, start_date, end_date)
+            if not ranges:
+                result["status"] = "ignorada"
+            result["days"] = sum(
+                (datetime.strptime(range_end, "%Y-%m-%d") - datetime.strptime(range_start, "%Y-%m-%d")).days + 1
+                for range_start, range_end in ranges
+            )
+        except Exception as e:
+            logger.error(f"Erro ao reprocessar o arquivo de pedidos da loja {store_id}: {str(e)}")
+            result["status"] = "erro"
+        result["duration"] = time.perf_counter() - started
+        results.append(result)
+    return results
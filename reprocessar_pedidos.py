@@ -0,0 +1,33 @@
+"""
+Regrava os itens de pedido Shopify a partir do arquivo local de pedidos, sem chamar a API.
+
+Uso:
+    python reprocessar_pedidos.py --inicio 2025-01-01 --fim 2025-01-31 [--loja ID ...]
+
+Só os dias completos do arquivo (SHOPIFY_ARCHIVE_DIR) são regravados; os
+demais dias do período ficam como estão em order_line_items. No Railway,
+SHOPIFY_ARCHIVE_DIR deve ficar em um volume persistente.
+"""
+import argparse
+import logging
+
+from db_utils import init_db
+from refresh_utils import rebuild_stores_from_archive
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstrói order_line_items a partir do arquivo de pedidos da Shopify")
+    parser.add_argument("--inicio", required=True, help="Data inicial (YYYY-MM-DD)")
+    parser.add_argument("--fim", required=True, help="Data final (YYYY-MM-DD)")
+    parser.add_argument("--loja", action="append", help="ID da loja (pode ser repetido; padrão: todas)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+
+    results = rebuild_stores_from_archive(args.inicio, args.fim, store_ids=args.loja)
+    for result in results:
+        print(f"{result['store_id']}: {result['status']} ({result['days']} dias, {result['duration']:.2f}s)")
+    return 1 if any(result["status"] == "erro" for result in results) else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,1260 @@
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import logging
+import os
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from http_utils import get_http_session, http_request
+from db_utils import (
+    get_sync_state, save_sync_state, get_store_timezone, save_store_timezone, replace_order_lines, execute_statement, execute_upsert_many,
+    get_covered_metric_days, get_crawl_checkpoint, save_crawl_checkpoint, delete_crawl_checkpoints, purge_crawl_checkpoints,
+    replace_period, mark_metric_days, stage_order_lines, publish_staged_order_lines, clear_staged_order_lines
+)
+from archive_utils import (
+    archive_orders, archive_timestamp, mark_archive_complete, archived_days, read_archived_orders, reset_archive_complete
+)
+from timezone_utils import DEFAULT_TIMEZONE, local_datetime, local_day, day_start_utc, local_today
+
+# Configuração do logger
+logger = logging.getLogger("shopify_utils")
+
+SHOPIFY_API_VERSION = "2025-01"
+
+# Limites de custo da API GraphQL (valores padrão do plano básico, atualizados a cada resposta)
+SHOPIFY_BUCKET_SIZE = float(os.getenv("SHOPIFY_BUCKET_SIZE", "1000"))
+SHOPIFY_RESTORE_RATE = float(os.getenv("SHOPIFY_RESTORE_RATE", "50"))
+
+# Custo presumido de uma consulta ainda não vista pelo controlador
+SHOPIFY_DEFAULT_QUERY_COST = float(os.getenv("SHOPIFY_DEFAULT_QUERY_COST", "100"))
+
+# Número máximo de novas tentativas para respostas THROTTLED ou HTTP 429/5xx
+SHOPIFY_MAX_RETRIES = int(os.getenv("SHOPIFY_MAX_RETRIES", "5"))
+
+# Margem (em segundos) subtraída da marca d'água para tolerar diferença de relógio com a Shopify
+SHOPIFY_SYNC_OVERLAP_SECONDS = int(os.getenv("SHOPIFY_SYNC_OVERLAP_SECONDS", "300"))
+
+# Intervalo entre consultas de status e tempo máximo de espera de uma operação bulk
+SHOPIFY_BULK_POLL_SECONDS = float(os.getenv("SHOPIFY_BULK_POLL_SECONDS", "2"))
+SHOPIFY_BULK_TIMEOUT_SECONDS = float(os.getenv("SHOPIFY_BULK_TIMEOUT_SECONDS", "1800"))
+
+# Itens por pedido na página de pedidos (mantém o custo baixo) e por página nas
+# consultas de complemento dos pedidos com mais itens
+SHOPIFY_ORDER_LINE_ITEMS = int(os.getenv("SHOPIFY_ORDER_LINE_ITEMS", "10"))
+SHOPIFY_LINE_ITEMS_PAGE_SIZE = int(os.getenv("SHOPIFY_LINE_ITEMS_PAGE_SIZE", "100"))
+
+# Dias recentes (a partir de hoje, no fuso da loja) sempre buscados de novo, mesmo já estando no banco
+SHOPIFY_RECENT_DAYS = int(os.getenv("SHOPIFY_RECENT_DAYS", "1"))
+
+# Pedidos recentes mantidos abertos (à espera dos seus itens) ao ler o resultado de uma operação bulk
+SHOPIFY_BULK_PARENT_CACHE = int(os.getenv("SHOPIFY_BULK_PARENT_CACHE", "10000"))
+
+# Pedidos de uma operação bulk acumulados antes de cada gravação (itens de pedido e arquivo de pedidos)
+SHOPIFY_BULK_ARCHIVE_BATCH = int(os.getenv("SHOPIFY_BULK_ARCHIVE_BATCH", "500"))
+
+# Tamanho (em dias) das janelas em que o período de pedidos é dividido
+SHOPIFY_ORDER_WINDOW_DAYS = int(os.getenv("SHOPIFY_ORDER_WINDOW_DAYS", "7"))
+
+# Número máximo de janelas de pedidos buscadas ao mesmo tempo
+SHOPIFY_ORDER_MAX_WORKERS = int(os.getenv("SHOPIFY_ORDER_MAX_WORKERS", "4"))
+
+# Idade máxima (em horas) de um ponto de retomada; mais antigos que isso são ignorados
+SHOPIFY_CHECKPOINT_TTL_HOURS = float(os.getenv("SHOPIFY_CHECKPOINT_TTL_HOURS", "24"))
+
+def get_shopify_url(shop_name):
+    """Monta a URL da API GraphQL Admin da loja."""
+    return f"https://{shop_name}.myshopify.com/admin/api/{SHOPIFY_API_VERSION}/graphql.json"
+
+def get_shopify_headers(access_token):
+    """Monta os cabeçalhos de autenticação da API Shopify."""
+    return {
+        "Content-Type": "application/json",
+        "X-Shopify-Access-Token": access_token,
+    }
+
+def script_ctx_initializer():
+    """
+    Initializer de ThreadPoolExecutor que propaga o contexto do script Streamlit atual.
+    
+    Assim st.error/st.warning chamados dentro das threads continuam aparecendo na página.
+    """
+    ctx = get_script_run_ctx()
+    
+    def attach_ctx():
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+    
+    return attach_ctx
+
+def run_in_threads(tasks, max_workers):
+    """Executa funções sem argumentos em um pool de threads e retorna os resultados na mesma ordem."""
+    with ThreadPoolExecutor(max_workers=max_workers, initializer=script_ctx_initializer()) as executor:
+        futures = [executor.submit(task) for task in tasks]
+        return [future.result() for future in futures]
+
+class ShopifyThrottle:
+    """
+    Controlador de custo (leaky bucket) da API GraphQL de uma loja.
+    
+    A Shopify mantém, por loja, um balde de pontos que se esvazia com o custo de
+    cada consulta e se recompõe a restoreRate pontos por segundo. O controlador
+    mantém uma estimativa local desse balde, reserva o custo esperado antes de cada
+    requisição (esperando a recomposição quando não há pontos) e a corrige com o
+    throttleStatus devolvido em extensions.cost. Assim as requisições concorrentes
+    de uma loja ficam logo abaixo da taxa de recomposição em vez de receberem THROTTLED.
+    """
+    
+    def __init__(self, bucket_size=SHOPIFY_BUCKET_SIZE, restore_rate=SHOPIFY_RESTORE_RATE):
+        self.bucket_size = bucket_size
+        self.restore_rate = restore_rate
+        self.available = bucket_size
+        self._in_flight = 0.0
+        self._updated_at = time.monotonic()
+        self._query_costs = {}
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "throttled": 0, "waited_seconds": 0.0, "actual_cost": 0.0}
+    
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated_at
+        self.available = min(self.bucket_size, self.available + elapsed * self.restore_rate)
+        self._updated_at = now
+    
+    def estimate_cost(self, query):
+        """Custo esperado da consulta: o último requestedQueryCost observado ou o valor padrão."""
+        return self._query_costs.get(query, SHOPIFY_DEFAULT_QUERY_COST)
+    
+    def acquire(self, query):
+        """
+        Reserva o custo estimado da consulta, esperando a recomposição do balde se necessário.
+        
+        Returns:
+            Custo reservado (deve ser devolvido com update ou release)
+        """
+        with self._lock:
+            cost = min(self.estimate_cost(query), self.bucket_size)
+            self._refill()
+            # Reserva antes de esperar, para que outras threads enxerguem o balde já comprometido
+            self.available -= cost
+            self._in_flight += cost
+            wait = -self.available / self.restore_rate if self.available < 0 else 0.0
+            self.stats["requests"] += 1
+            self.stats["waited_seconds"] += wait
+        
+        if wait > 0:
+            time.sleep(wait)
+        return cost
+    
+    def release(self, reserved_cost):
+        """Devolve a reserva de uma requisição que falhou sem consumir pontos na Shopify."""
+        with self._lock:
+            self._in_flight = max(0.0, self._in_flight - reserved_cost)
+            self.available = min(self.bucket_size, self.available + reserved_cost)
+    
+    def update(self, query, reserved_cost, cost_info):
+        """
+        Ajusta o balde com o extensions.cost da resposta.
+        
+        Args:
+            query: Texto da consulta (chave da estimativa de custo)
+            reserved_cost: Custo reservado em acquire
+            cost_info: Dicionário extensions.cost da resposta (pode ser None)
+        """
+        cost_info = cost_info or {}
+        status = cost_info.get("throttleStatus") or {}
+        requested = cost_info.get("requestedQueryCost")
+        actual = cost_info.get("actualQueryCost")
+        
+        with self._lock:
+            self._in_flight = max(0.0, self._in_flight - reserved_cost)
+            if requested is not None:
+                self._query_costs[query] = float(requested)
+            if actual is not None:
+                self.stats["actual_cost"] += float(actual)
+            
+            if status:
+                self.bucket_size = float(status.get("maximumAvailable") or self.bucket_size)
+                self.restore_rate = float(status.get("restoreRate") or self.restore_rate)
+                # O saldo informado pela Shopify já inclui esta consulta; mantém
+                # descontadas apenas as reservas de requisições ainda em andamento
+                self.available = float(status.get("currentlyAvailable", self.available)) - self._in_flight
+                self._updated_at = time.monotonic()
+            elif actual is not None:
+                # Sem throttleStatus, devolve a diferença entre o reservado e o custo real
+                self.available = min(self.bucket_size, self.available + reserved_cost - float(actual))
+    
+    def throttled_delay(self, query, reserved_cost, cost_info):
+        """
+        Processa uma resposta THROTTLED e retorna quanto esperar antes de repetir a consulta.
+        
+        A espera é o tempo para o balde recompor os pontos que faltam para o custo solicitado.
+        """
+        cost_info = cost_info or {}
+        status = cost_info.get("throttleStatus") or {}
+        
+        with self._lock:
+            self.stats["throttled"] += 1
+            self._in_flight = max(0.0, self._in_flight - reserved_cost)
+            requested = float(cost_info.get("requestedQueryCost") or self.estimate_cost(query))
+            self._query_costs[query] = requested
+            if status:
+                self.restore_rate = float(status.get("restoreRate") or self.restore_rate)
+                self.available = float(status.get("currentlyAvailable", 0.0)) - self._in_flight
+                self._updated_at = time.monotonic()
+            else:
+                self._refill()
+            return max(0.0, (requested - self.available) / self.restore_rate)
+
+_throttles = {}
+_throttles_lock = threading.Lock()
+
+def get_shopify_throttle(url):
+    """Retorna o controlador de custo compartilhado da loja (um por URL de API)."""
+    with _throttles_lock:
+        if url not in _throttles:
+            _throttles[url] = ShopifyThrottle()
+        return _throttles[url]
+
+def _is_throttled(data):
+    errors = data.get("errors")
+    if not isinstance(errors, list):
+        return False
+    return any((error.get("extensions") or {}).get("code") == "THROTTLED" for error in errors if isinstance(error, dict))
+
+def shopify_graphql(url, headers, query, variables=None, session=None, throttle=None):
+    """
+    Executa uma consulta GraphQL na Shopify respeitando o limite de custo da loja.
+    
+    Respostas THROTTLED são repetidas até SHOPIFY_MAX_RETRIES vezes, esperando o
+    tempo calculado a partir do throttleStatus. Falhas de conexão, HTTP 429 e
+    erros 5xx são repetidos pelo cliente HTTP compartilhado (http_utils).
+    
+    Returns:
+        JSON da resposta, ou None se a consulta falhou (o erro é exibido com st.error)
+    """
+    session = session or get_http_session()
+    throttle = throttle or get_shopify_throttle(url)
+    payload = {"query": query, "variables": variables or {}}
+    
+    for attempt in range(SHOPIFY_MAX_RETRIES + 1):
+        reserved = throttle.acquire(query)
+        try:
+            response = http_request("POST", url, session=session, headers=headers, json=payload)
+        except Exception as e:
+            throttle.release(reserved)
+            st.error(f"Erro ao acessar a API Shopify: {str(e)}")
+            return None
+        
+        if response.status_code != 200:
+            throttle.release(reserved)
+            st.error(f"Erro na conexão com a Shopify. Código: {response.status_code}")
+            return None
+        
+        try:
+            data = response.json()
+        except ValueError as e:
+            throttle.release(reserved)
+            st.error(f"Erro ao acessar a API Shopify: {str(e)}")
+            return None
+        
+        cost_info = (data.get("extensions") or {}).get("cost")
+        
+        if _is_throttled(data):
+            delay = throttle.throttled_delay(query, reserved, cost_info)
+            if attempt < SHOPIFY_MAX_RETRIES:
+                logger.warning(f"Consulta Shopify limitada (THROTTLED); nova tentativa em {delay:.2f}s")
+                time.sleep(delay)
+                continue
+            st.error("Limite de custo da API Shopify excedido após várias tentativas. Os dados podem estar incompletos.")
+            return None
+        
+        throttle.update(query, reserved, cost_info)
+        
+        # Verificar erros na resposta
+        if "errors" in data:
+            st.error(f"Erro na API Shopify: {data['errors']}")
+            return None
+        
+        return data
+    
+    return None
+
+SHOP_TIMEZONE_QUERY = """
+{
+  shop {
+    ianaTimezone
+  }
+}
+"""
+
+class ShopifyCrawlError(Exception):
+    """Uma paginação da Shopify foi interrompida antes da última página."""
+
+def get_shop_timezone(store_id, url, headers, session=None):
+    """Fuso horário IANA da loja, em que a Shopify conta os dias dos pedidos (buscado na API só na primeira vez)."""
+    timezone_name = get_store_timezone(store_id)
+    if timezone_name:
+        return timezone_name
+    
+    data = shopify_graphql(url, headers, SHOP_TIMEZONE_QUERY, session=session)
+    timezone_name = (((data or {}).get("data") or {}).get("shop") or {}).get("ianaTimezone")
+    if not timezone_name:
+        raise ShopifyCrawlError("Não foi possível obter o fuso horário da loja")
+    
+    if save_store_timezone(store_id, timezone_name):
+        # Os dias completos do arquivo de pedidos foram contados em UTC
+        reset_archive_complete(store_id, timezone_name)
+    logger.info(f"Fuso horário da loja {store_id}: {timezone_name}")
+    return timezone_name
+
+def _crawl_products(url, headers, search=None, session=None):
+    """
+    Percorre as páginas de produtos, em ordem crescente de updated_at.
+    
+    A ordenação garante que, se a paginação for interrompida, tudo até o último
+    produto recebido foi lido (o maior updated_at gravado é uma marca d'água segura).
+    """
+    query = """
+    query getProducts($cursor: String, $search: String) {
+      products(first: 50, after: $cursor, query: $search, sortKey: UPDATED_AT) {
+        edges {
+          node {
+            id
+            title
+            handle
+            onlineStoreUrl
+            updatedAt
+            images(first: 1) {
+              edges {
+                node {
+                  originalSrc
+                }
+              }
+            }
+          }
+        }
+        pageInfo {
+          hasNextPage
+          endCursor
+        }
+      }
+    }
+    """
+    
+    session = session or get_http_session()
+    all_products = []
+    cursor = None
+    
+    while True:
+        variables = {"cursor": cursor, "search": search}
+        data = shopify_graphql(url, headers, query, variables, session=session)
+        if data is None:
+            break
+        
+        products_data = data.get("data", {}).get("products", {})
+        edges = products_data.get("edges", [])
+        all_products.extend(edges)
+        
+        page_info = products_data.get("pageInfo", {})
+        if page_info.get("hasNextPage"):
+            cursor = page_info.get("endCursor")
+        else:
+            break
+    
+    return all_products
+
+def _product_url_and_image(product):
+    """Extrai a URL (ou /products/handle) e a primeira imagem de um produto da API."""
+    handle = product.get("handle", "")
+    url = product.get("onlineStoreUrl", "")
+    
+    if not url and handle:
+        # Se a URL não estiver disponível, construa-a a partir do handle
+        url = f"/products/{handle}"
+    
+    # Extrair URL da imagem
+    image_url = ""
+    images = product.get("images", {}).get("edges", [])
+    if images and len(images) > 0:
+        image_url = images[0].get("node", {}).get("originalSrc", "")
+    
+    return url or "", image_url or ""
+
+def refresh_product_catalog(store_id, url, headers, session=None):
+    """
+    Atualiza a tabela shopify_products da loja com os produtos novos ou alterados.
+    
+    Busca apenas produtos com updated_at a partir do maior valor já gravado
+    (catálogo inteiro só na primeira vez).
+    
+    Returns:
+        Quantidade de produtos recebidos
+    """
+    watermark = execute_statement("shopify_products_watermark", (store_id,), fetch_type='one', cached=False)
+    since = watermark[0] if watermark else None
+    search = f"updated_at:>='{since}'" if since else None
+    
+    rows = []
+    for product_edge in _crawl_products(url, headers, search=search, session=session):
+        product = product_edge.get("node", {})
+        product_url, image_url = _product_url_and_image(product)
+        rows.append({
+            "store_id": store_id,
+            "product_id": product.get("id"),
+            "title": product.get("title", ""),
+            "handle": product.get("handle", ""),
+            "url": product_url,
+            "image_url": image_url,
+            "updated_at": product.get("updatedAt"),
+        })
+    
+    if rows:
+        execute_upsert_many("shopify_products", rows, ["store_id", "product_id"])
+    
+    logger.info(f"Catálogo da loja {store_id}: {len(rows)} produtos novos ou alterados")
+    return len(rows)
+
+def iter_order_pages(url, headers, date_filter, session=None, strict=False, cursor=None, with_cursor=False):
+    """
+    Gera, uma a uma, as páginas de pedidos que atendem ao filtro de busca informado.
+    
+    Cada página já vem com os itens completos (ver _complete_line_items) e é
+    entregue assim que chega, sem acumular as anteriores em memória.
+    
+    Com strict=True, uma falha no meio da paginação gera ShopifyCrawlError em vez
+    de simplesmente encerrar (usado quando o resultado avança a marca d'água).
+    
+    Args:
+        cursor: endCursor a partir do qual continuar (retomada de uma paginação interrompida)
+        with_cursor: Se True, gera tuplas (página, cursor da próxima página ou None na última)
+    """
+    query = """
+    query getOrders($cursor: String, $search: String) {
+      orders(first: 50, after: $cursor, query: $search) {
+        edges {
+          node {
+            id
+            name
+            createdAt
+            updatedAt
+            totalPriceSet {
+              shopMoney {
+                amount
+              }
+            }
+            lineItems(first: %d) {
+              edges {
+                node {
+                  title
+                  quantity
+                  originalTotalSet {
+                    shopMoney {
+                      amount
+                    }
+                  }
+                }
+              }
+              pageInfo {
+                hasNextPage
+                endCursor
+              }
+            }
+          }
+        }
+        pageInfo {
+          hasNextPage
+          endCursor
+        }
+      }
+    }
+    """ % SHOPIFY_ORDER_LINE_ITEMS
+    
+    session = session or get_http_session()
+    
+    while True:
+        variables = {"cursor": cursor, "search": date_filter}
+        data = shopify_graphql(url, headers, query, variables, session=session)
+        if data is None:
+            if strict:
+                raise ShopifyCrawlError(f"Paginação de pedidos interrompida ({date_filter})")
+            break
+        
+        orders_data = data.get("data", {}).get("orders", {})
+        edges = orders_data.get("edges", [])
+        _complete_line_items(url, headers, edges, session=session, strict=strict)
+        
+        page_info = orders_data.get("pageInfo", {})
+        next_cursor = page_info.get("endCursor") if page_info.get("hasNextPage") else None
+        yield (edges, next_cursor) if with_cursor else edges
+        
+        if next_cursor is None:
+            break
+        cursor = next_cursor
+
+ORDER_LINE_ITEMS_QUERY = """
+query getOrderLineItems($id: ID!, $cursor: String) {
+  order(id: $id) {
+    lineItems(first: %d, after: $cursor) {
+      edges {
+        node {
+          title
+          quantity
+          originalTotalSet {
+            shopMoney {
+              amount
+            }
+          }
+        }
+      }
+      pageInfo {
+        hasNextPage
+        endCursor
+      }
+    }
+  }
+}
+""" % SHOPIFY_LINE_ITEMS_PAGE_SIZE
+
+def _fetch_remaining_line_items(url, headers, order_node, session=None, strict=False):
+    """Busca as páginas restantes de itens de um pedido e as acrescenta ao próprio nó."""
+    line_items = order_node["lineItems"]
+    cursor = line_items["pageInfo"]["endCursor"]
+    
+    while cursor:
+        variables = {"id": order_node["id"], "cursor": cursor}
+        data = shopify_graphql(url, headers, ORDER_LINE_ITEMS_QUERY, variables, session=session)
+        if data is None:
+            if strict:
+                raise ShopifyCrawlError(f"Paginação de itens do pedido {order_node['id']} interrompida")
+            break
+        
+        page = (data.get("data", {}).get("order") or {}).get("lineItems", {})
+        line_items["edges"].extend(page.get("edges", []))
+        page_info = page.get("pageInfo", {})
+        cursor = page_info.get("endCursor") if page_info.get("hasNextPage") else None
+    
+    line_items["pageInfo"] = {"hasNextPage": False, "endCursor": None}
+
+def _complete_line_items(url, headers, orders, session=None, strict=False):
+    """
+    Segunda fase da busca de pedidos: completa os itens dos pedidos com mais itens
+    do que a primeira página.
+    
+    As páginas de pedidos pedem poucos itens por pedido (mantendo o custo da
+    consulta baixo); apenas os pedidos com lineItems.pageInfo.hasNextPage recebem
+    consultas adicionais, com páginas maiores.
+    """
+    incomplete = [
+        order_edge["node"] for order_edge in orders
+        if order_edge.get("node", {}).get("lineItems", {}).get("pageInfo", {}).get("hasNextPage")
+    ]
+    if not incomplete:
+        return
+    
+    logger.info(f"Completando os itens de {len(incomplete)} pedidos grandes")
+    run_in_threads([
+        (lambda node=node: _fetch_remaining_line_items(url, headers, node, session=session, strict=strict))
+        for node in incomplete
+    ], max_workers=min(SHOPIFY_ORDER_MAX_WORKERS, len(incomplete)))
+
+def split_date_windows(start_date, end_date, window_days):
+    """
+    Divide o intervalo [start_date, end_date] em janelas consecutivas de window_days dias.
+    
+    Returns:
+        Lista de tuplas (início, fim) no formato YYYY-MM-DD
+    """
+    start = datetime.strptime(start_date, "%Y-%m-%d").date()
+    end = datetime.strptime(end_date, "%Y-%m-%d").date()
+    
+    windows = []
+    current = start
+    while current <= end:
+        window_end = min(current + timedelta(days=window_days - 1), end)
+        windows.append((current.strftime("%Y-%m-%d"), window_end.strftime("%Y-%m-%d")))
+        current = window_end + timedelta(days=1)
+    return windows
+
+def _next_day(day):
+    """Dia seguinte a uma data YYYY-MM-DD."""
+    return (datetime.strptime(day, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+
+def created_since_filter(start_date, timezone_name=DEFAULT_TIMEZONE):
+    """Filtro created_at a partir do início do dia start_date no fuso da loja (limite em UTC)."""
+    return f"created_at:>='{day_start_utc(start_date, timezone_name)}'"
+
+def created_between_filter(start_date, end_date, timezone_name=DEFAULT_TIMEZONE):
+    """Filtro created_at dos dias [start_date, end_date] no fuso da loja, com limites em UTC (fim aberto)."""
+    return (
+        f"{created_since_filter(start_date, timezone_name)} "
+        f"AND created_at:<'{day_start_utc(_next_day(end_date), timezone_name)}'"
+    )
+
+def _window_filter(windows, index, timezone_name=DEFAULT_TIMEZONE):
+    """Monta o filtro created_at de uma janela (janelas consecutivas não se sobrepõem)."""
+    window_start, window_end = windows[index]
+    return created_between_filter(window_start, window_end, timezone_name)
+
+def order_filters(start_date, end_date, window_days=None, timezone_name=DEFAULT_TIMEZONE):
+    """Filtros de busca das janelas de window_days dias em que o período é dividido."""
+    try:
+        windows = split_date_windows(start_date, end_date, window_days or SHOPIFY_ORDER_WINDOW_DAYS)
+    except (TypeError, ValueError):
+        windows = []
+    
+    if len(windows) <= 1:
+        return [created_between_filter(start_date, end_date, timezone_name)]
+    return [_window_filter(windows, i, timezone_name) for i in range(len(windows))]
+
+def _checkpoint_key(kind, date_filter):
+    """Chave do ponto de retomada: tipo da busca ('metrics', 'sync', 'bulk') mais o filtro de pedidos."""
+    return f"{kind}:{date_filter}"
+
+class CrawlCheckpoint:
+    """Ponto de retomada persistido (cursor e estado) da paginação de um filtro de pedidos de uma loja."""
+    
+    def __init__(self, store_id, crawl_key, state=None):
+        self.store_id = store_id
+        self.crawl_key = crawl_key
+        self.state = state
+        self.end_cursor = None
+        self.saved_state = None
+        self.pages = 0
+        self.orders = 0
+        self.completed = False
+        self.resumed = False
+        # Início da paginação (gravado no estado, para valer também após a retomada)
+        self.started_at = archive_timestamp()
+        
+        try:
+            saved = get_crawl_checkpoint(store_id, crawl_key)
+        except Exception as e:
+            logger.warning(f"Erro ao ler o ponto de retomada {crawl_key}: {str(e)}")
+            saved = None
+        
+        if saved and not self._expired(saved["updated_at"]):
+            self.end_cursor = saved["end_cursor"]
+            self.saved_state = json.loads(saved["state"]) if saved["state"] else None
+            self.pages = saved["pages"]
+            self.orders = saved["orders"]
+            self.completed = saved["completed"]
+            self.resumed = True
+            self.started_at = (self.saved_state or {}).get("started_at")
+            logger.info(f"Retomando {crawl_key} da loja {store_id} após {self.pages} páginas")
+        else:
+            # Registrada antes da primeira página: linhas preparadas sem ponto de retomada são sobras
+            self._write()
+    
+    @staticmethod
+    def _expired(updated_at):
+        try:
+            saved_at = datetime.strptime(updated_at, "%Y-%m-%d %H:%M:%S")
+        except (TypeError, ValueError):
+            return True
+        return datetime.now() - saved_at > timedelta(hours=SHOPIFY_CHECKPOINT_TTL_HOURS)
+    
+    def save(self, end_cursor, orders):
+        """Registra uma página consumida; end_cursor None marca a paginação como concluída."""
+        self.end_cursor = end_cursor
+        self.pages += 1
+        self.orders += orders
+        self.completed = end_cursor is None
+        self._write()
+    
+    def _write(self):
+        try:
+            state = dict(self.state()) if self.state else {}
+            if self.started_at:
+                state["started_at"] = self.started_at
+            state = json.dumps(state) if state else None
+            save_crawl_checkpoint(
+                self.store_id, self.crawl_key, self.end_cursor, state,
+                self.pages, self.orders, self.completed
+            )
+        except Exception as e:
+            # Sem o ponto de retomada a busca continua; só não poderá ser retomada daqui
+            logger.warning(f"Erro ao gravar o ponto de retomada {self.crawl_key}: {str(e)}")
+
+def _purge_stale_crawls(store_id, keep_keys=()):
+    """Remove os pontos de retomada expirados da loja e as linhas preparadas que ficaram sem dono."""
+    expired_before = (datetime.now() - timedelta(hours=SHOPIFY_CHECKPOINT_TTL_HOURS)).strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        purged = purge_crawl_checkpoints(store_id, expired_before, keep_keys)
+    except Exception as e:
+        logger.warning(f"Erro ao limpar os pontos de retomada da loja {store_id}: {str(e)}")
+        return
+    if purged["checkpoints"] or purged["staged"]:
+        logger.info(
+            f"Loja {store_id}: {purged['checkpoints']} pontos de retomada expirados e "
+            f"{purged['staged']} linhas preparadas sem dono removidos"
+        )
+
+def _crawl_started(checkpoints):
+    """Início mais antigo das paginações, ou None se algum ponto retomado não o registrou."""
+    started = [checkpoint.started_at for checkpoint in checkpoints]
+    return min(started) if started and all(started) else None
+
+def consume_order_pages(url, headers, start_date, end_date, consumer, session=None, window_days=None, max_workers=None, strict=False, checkpoint_for=None, timezone_name=DEFAULT_TIMEZONE):
+    """
+    Percorre os pedidos do período entregando cada página ao consumer assim que ela chega.
+    
+    O intervalo é dividido em janelas de window_days dias, buscadas em paralelo
+    (no máximo max_workers ao mesmo tempo). As chamadas a consumer(índice da
+    janela, página) são serializadas, então o consumer não precisa de lock próprio.
+    
+    Args:
+        timezone_name: Fuso horário da loja, em que os dias do período são contados
+        checkpoint_for: Função opcional (índice da janela, filtro) -> CrawlCheckpoint.
+            Cada janela começa do cursor gravado (janelas concluídas são puladas) e
+            o ponto é gravado depois de cada página entregue ao consumer.
+    
+    Returns:
+        Quantidade de janelas percorridas
+    """
+    session = session or get_http_session()
+    max_workers = max_workers or SHOPIFY_ORDER_MAX_WORKERS
+    filters = order_filters(start_date, end_date, window_days, timezone_name)
+    
+    consumer_lock = threading.Lock()
+    
+    def crawl(index, date_filter):
+        checkpoint = None
+        if checkpoint_for:
+            with consumer_lock:
+                checkpoint = checkpoint_for(index, date_filter)
+            if checkpoint.completed:
+                return
+        
+        pages = iter_order_pages(
+            url, headers, date_filter, session=session, strict=strict,
+            cursor=checkpoint.end_cursor if checkpoint else None, with_cursor=True
+        )
+        for page, next_cursor in pages:
+            with consumer_lock:
+                consumer(index, page)
+                if checkpoint:
+                    checkpoint.save(next_cursor, len(page))
+    
+    run_in_threads([
+        (lambda index=index, date_filter=date_filter: crawl(index, date_filter))
+        for index, date_filter in enumerate(filters)
+    ], max_workers=min(max_workers, len(filters)))
+    return len(filters)
+
+def missing_day_ranges(store_id, start_date, end_date, timezone_name=DEFAULT_TIMEZONE):
+    """
+    Períodos contínuos de [start_date, end_date] que precisam ser buscados na Shopify.
+    
+    São os dias ainda não registrados em shopify_metric_days mais os dias recentes
+    (a partir de hoje - SHOPIFY_RECENT_DAYS, no fuso da loja), que ainda podem receber pedidos.
+    
+    Returns:
+        Lista de tuplas (início, fim)
+    """
+    covered = get_covered_metric_days(store_id, start_date, end_date)
+    recent_start = local_today(timezone_name, -SHOPIFY_RECENT_DAYS)
+    
+    return merge_day_ranges(
+        day for day, _ in split_date_windows(start_date, end_date, 1)
+        if day not in covered or day >= recent_start
+    )
+
+def merge_day_ranges(days):
+    """Junta dias (YYYY-MM-DD, em ordem) em períodos contínuos (início, fim)."""
+    ranges = []
+    for day in days:
+        if ranges and _next_day(ranges[-1][1]) == day:
+            ranges[-1] = (ranges[-1][0], day)
+        else:
+            ranges.append((day, day))
+    return ranges
+
+def _range_days(ranges):
+    """Dias (YYYY-MM-DD) dos períodos (início, fim) informados."""
+    return [day for range_start, range_end in ranges for day, _ in split_date_windows(range_start, range_end, 1)]
+
+def stream_shopify_metrics(store_id, url, headers, start_date, end_date, progress=None, force=False):
+    """Busca em streaming os dias que faltam no banco (todos com force) e retorna os períodos buscados."""
+    session = get_http_session()
+    started = time.perf_counter()
+    timezone_name = get_shop_timezone(store_id, url, headers, session=session)
+    ranges = [(start_date, end_date)] if force else missing_day_ranges(store_id, start_date, end_date, timezone_name)
+    if not ranges:
+        return []
+    
+    counters = {"pages": 0, "orders": 0, "resumed": 0}
+    _purge_stale_crawls(store_id, [
+        _checkpoint_key("metrics", date_filter)
+        for range_start, range_end in ranges
+        for date_filter in order_filters(range_start, range_end, timezone_name=timezone_name)
+    ])
+    
+    def crawl_ranges():
+        for range_start, range_end in ranges:
+            crawl_keys = [
+                _checkpoint_key("metrics", date_filter)
+                for date_filter in order_filters(range_start, range_end, timezone_name=timezone_name)
+            ]
+            
+            range_checkpoints = []
+            # Arquivo completo só se todas as páginas deste período foram gravadas
+            range_archive = {"complete": True}
+            
+            def checkpoint_for(index, date_filter, range_checkpoints=range_checkpoints):
+                checkpoint = CrawlCheckpoint(store_id, _checkpoint_key("metrics", date_filter))
+                range_checkpoints.append(checkpoint)
+                if checkpoint.resumed:
+                    counters["resumed"] += checkpoint.pages
+                    counters["pages"] += checkpoint.pages
+                    counters["orders"] += checkpoint.orders
+                else:
+                    # Recomeço: descarta o que uma busca anterior (expirada) deixou preparado
+                    clear_staged_order_lines(store_id, [checkpoint.crawl_key])
+                return checkpoint
+            
+            def consume(index, page, crawl_keys=crawl_keys, range_archive=range_archive):
+                order_ids, rows = orders_to_line_rows(store_id, page, timezone_name)
+                stage_order_lines(store_id, crawl_keys[index], order_ids, rows)
+                range_archive["complete"] = archive_orders(store_id, page, timezone_name) and range_archive["complete"]
+                counters["pages"] += 1
+                counters["orders"] += len(order_ids)
+                if progress:
+                    progress(counters["pages"], counters["orders"])
+            
+            consume_order_pages(
+                url, headers, range_start, range_end, consume, session=session,
+                strict=True, checkpoint_for=checkpoint_for, timezone_name=timezone_name
+            )
+            days = _range_days([(range_start, range_end)])
+            publish_staged_order_lines(store_id, crawl_keys, (range_start, range_end), days)
+            if range_archive["complete"]:
+                mark_archive_complete(store_id, days, _crawl_started(range_checkpoints))
+    
+    try:
+        run_in_threads([
+            lambda: refresh_product_catalog(store_id, url, headers, session=session),
+            crawl_ranges,
+        ], max_workers=2)
+    except ShopifyCrawlError as e:
+        logger.error(f"Busca de pedidos da loja {store_id} interrompida após {counters['pages']} páginas: {str(e)}")
+        raise
+    _purge_stale_crawls(store_id)
+    
+    logger.info(
+        f"{counters['orders']} pedidos da Shopify em {counters['pages']} páginas "
+        f"({counters['resumed']} retomadas, {len(ranges)} período(s) sem dados) "
+        f"gravados em {time.perf_counter() - started:.2f}s"
+    )
+    return ranges
+
+BULK_ORDERS_QUERY = """
+{
+  orders(query: "%s") {
+    edges {
+      node {
+        id
+        createdAt
+        lineItems {
+          edges {
+            node {
+              id
+              title
+              quantity
+              originalTotalSet {
+                shopMoney {
+                  amount
+                }
+              }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+BULK_RUN_MUTATION = """
+mutation runBulk($query: String!) {
+  bulkOperationRunQuery(query: $query) {
+    bulkOperation {
+      id
+      status
+    }
+    userErrors {
+      field
+      message
+    }
+  }
+}
+"""
+
+BULK_STATUS_QUERY = """
+query bulkStatus($id: ID!) {
+  node(id: $id) {
+    ... on BulkOperation {
+      id
+      status
+      errorCode
+      objectCount
+      url
+      partialDataUrl
+    }
+  }
+}
+"""
+
+def run_bulk_orders_query(url, headers, start_date, end_date, session=None, timezone_name=DEFAULT_TIMEZONE):
+    """
+    Envia a consulta de pedidos e itens como bulkOperationRunQuery e espera a conclusão.
+    
+    Returns:
+        URL do arquivo JSONL com o resultado ("" se não houver pedidos, None em caso de erro)
+    """
+    session = session or get_http_session()
+    bulk_query = BULK_ORDERS_QUERY % created_between_filter(start_date, end_date, timezone_name)
+    
+    data = shopify_graphql(url, headers, BULK_RUN_MUTATION, {"query": bulk_query}, session=session)
+    if data is None:
+        return None
+    
+    result = data.get("data", {}).get("bulkOperationRunQuery", {})
+    if result.get("userErrors"):
+        st.error(f"Erro ao iniciar operação bulk na Shopify: {result['userErrors']}")
+        return None
+    
+    operation_id = result["bulkOperation"]["id"]
+    deadline = time.monotonic() + SHOPIFY_BULK_TIMEOUT_SECONDS
+    
+    while time.monotonic() < deadline:
+        data = shopify_graphql(url, headers, BULK_STATUS_QUERY, {"id": operation_id}, session=session)
+        if data is None:
+            return None
+        
+        operation = data.get("data", {}).get("node") or {}
+        status = operation.get("status")
+        
+        if status == "COMPLETED":
+            logger.info(f"Operação bulk {operation_id} concluída com {operation.get('objectCount')} objetos")
+            return operation.get("url") or ""
+        
+        if status in ("FAILED", "CANCELED", "EXPIRED"):
+            st.error(f"Operação bulk da Shopify terminou com status {status} ({operation.get('errorCode')})")
+            return None
+        
+        time.sleep(SHOPIFY_BULK_POLL_SECONDS)
+    
+    st.error("Tempo esgotado aguardando a operação bulk da Shopify.")
+    return None
+
+def iter_bulk_orders(lines):
+    """
+    Remonta os pedidos das linhas JSONL de uma operação bulk, em lotes.
+    
+    As linhas são lidas uma a uma. Cada pedido (linha sem __parentId) fica em um
+    cache limitado de pedidos abertos e recebe os itens seguintes (linhas com
+    __parentId), que vêm logo depois dele. Os pedidos que saem do cache são
+    entregues em lotes de SHOPIFY_BULK_ARCHIVE_BATCH, então a memória não
+    depende do tamanho do período.
+    
+    Yields:
+        Listas de pedidos no formato das páginas da API (nó com lineItems.edges)
+    """
+    open_orders = OrderedDict()
+    closed_orders = []
+    missing_parents = 0
+    
+    for line in lines:
+        if not line:
+            continue
+        record = json.loads(line)
+        parent_id = record.get("__parentId")
+        
+        if parent_id is None:
+            open_orders[record.get("id")] = dict(record, lineItems={"edges": []})
+            if len(open_orders) > SHOPIFY_BULK_PARENT_CACHE:
+                closed_orders.append(open_orders.popitem(last=False)[1])
+                if len(closed_orders) >= SHOPIFY_BULK_ARCHIVE_BATCH:
+                    yield closed_orders
+                    closed_orders = []
+            continue
+        
+        if parent_id not in open_orders:
+            missing_parents += 1
+            continue
+        
+        item = {key: value for key, value in record.items() if key != "__parentId"}
+        open_orders[parent_id]["lineItems"]["edges"].append({"node": item})
+    
+    if closed_orders or open_orders:
+        yield closed_orders + list(open_orders.values())
+    
+    if missing_parents:
+        logger.warning(f"{missing_parents} itens da operação bulk sem pedido correspondente foram ignorados")
+
+def stream_bulk_result(result_url, session=None):
+    """Baixa o arquivo JSONL da operação bulk em streaming, gerando uma linha por vez."""
+    session = session or get_http_session()
+    with http_request("GET", result_url, session=session, stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            yield line
+
+def fetch_shopify_bulk_metrics(store_id, url, headers, start_date, end_date):
+    """
+    Modo bulk, para períodos longos: a Shopify gera o arquivo de pedidos do período
+    (enquanto o catálogo é atualizado em paralelo) e ele é lido em streaming,
+    preparando os itens lote a lote e publicando o período de uma vez no fim.
+    
+    Returns:
+        Lista com o período (início, fim) gravado, ou None em caso de erro
+    """
+    session = get_http_session()
+    try:
+        timezone_name = get_shop_timezone(store_id, url, headers, session=session)
+    except ShopifyCrawlError:
+        return None
+    
+    bulk_started = archive_timestamp()
+    _, result_url = run_in_threads([
+        lambda: refresh_product_catalog(store_id, url, headers, session=session),
+        lambda: run_bulk_orders_query(url, headers, start_date, end_date, session=session, timezone_name=timezone_name),
+    ], max_workers=2)
+    
+    if result_url is None:
+        return None
+    
+    crawl_key = _checkpoint_key("bulk", created_between_filter(start_date, end_date, timezone_name))
+    _purge_stale_crawls(store_id, [crawl_key])
+    # A operação bulk não é retomada; o ponto só registra a quem pertencem as linhas preparadas
+    CrawlCheckpoint(store_id, crawl_key)
+    days = _range_days([(start_date, end_date)])
+    archived = True
+    order_count = 0
+    try:
+        clear_staged_order_lines(store_id, [crawl_key])
+        # Operação concluída sem arquivo: nenhum pedido no período
+        if result_url:
+            for orders in iter_bulk_orders(stream_bulk_result(result_url, session=session)):
+                order_ids, rows = orders_to_line_rows(store_id, orders, timezone_name)
+                stage_order_lines(store_id, crawl_key, order_ids, rows)
+                archived = archive_orders(store_id, orders, timezone_name) and archived
+                order_count += len(order_ids)
+        publish_staged_order_lines(store_id, [crawl_key], (start_date, end_date), days)
+    except Exception as e:
+        # Os itens publicados antes continuam valendo
+        clear_staged_order_lines(store_id, [crawl_key])
+        delete_crawl_checkpoints(store_id, [crawl_key])
+        st.error(f"Erro ao ler o resultado da operação bulk: {str(e)}")
+        return None
+    
+    if archived:
+        mark_archive_complete(store_id, days, bulk_started)
+    _purge_stale_crawls(store_id)
+    
+    logger.info(f"Operação bulk da loja {store_id}: {order_count} pedidos gravados")
+    return [(start_date, end_date)]
+
+def _shopify_numeric_id(gid):
+    """Id numérico de um id GraphQL (gid://shopify/Order/123 → 123), ou None se não for numérico."""
+    try:
+        return int(str(gid).rsplit("/", 1)[-1])
+    except (TypeError, ValueError):
+        return None
+
+def orders_to_line_rows(store_id, orders, timezone_name=DEFAULT_TIMEZONE):
+    """
+    Converte pedidos da API em linhas de order_line_items (uma por item de pedido).
+    
+    Dia e hora de criação ficam no fuso da loja; pedidos repetidos entram uma vez só.
+    
+    Returns:
+        Tupla (ids numéricos dos pedidos, linhas)
+    """
+    order_ids = []
+    seen_ids = set()
+    rows = []
+    for order_edge in orders:
+        order_node = order_edge.get("node", order_edge)
+        if not order_node.get("id"):
+            continue
+        order_id = _shopify_numeric_id(order_node["id"])
+        if order_id is None:
+            logger.warning(f"Pedido com id inesperado ignorado: {order_node['id']}")
+            continue
+        if order_id in seen_ids:
+            continue
+        seen_ids.add(order_id)
+        order_ids.append(order_id)
+        
+        created_at = order_node.get("createdAt") or None
+        created_local = local_datetime(created_at, timezone_name)
+        
+        line_items = order_node.get("lineItems", {}).get("edges", [])
+        for line_index, line_item_edge in enumerate(line_items):
+            line_item = line_item_edge.get("node", {})
+            try:
+                amount = round(float(line_item.get("originalTotalSet", {}).get("shopMoney", {}).get("amount", "0")), 2)
+            except (ValueError, TypeError):
+                amount = 0
+            rows.append({
+                "store_id": store_id,
+                "order_id": order_id,
+                "line_index": line_index,
+                "created_at": created_at,
+                "created_day": created_local.strftime("%Y-%m-%d") if created_local else None,
+                "created_hour": created_local.hour if created_local else None,
+                "updated_at": order_node.get("updatedAt") or None,
+                "product": line_item.get("title", "Unknown"),
+                "quantity": line_item.get("quantity", 0),
+                "amount": amount,
+            })
+    return order_ids, rows
+
+def sync_shopify_orders(store_id, url, headers, start_date, session=None, progress=None):
+    """Sincroniza incrementalmente os pedidos da loja com order_line_items (retorna mode, orders e covered_start)."""
+    session = session or get_http_session()
+    timezone_name = get_shop_timezone(store_id, url, headers, session=session)
+    state = get_sync_state(store_id)
+    
+    # A nova marca d'água é o início desta sincronização (com margem): tudo que
+    # mudar enquanto as páginas são lidas será buscado de novo na próxima
+    sync_started = datetime.now(timezone.utc) - timedelta(seconds=SHOPIFY_SYNC_OVERLAP_SECONDS)
+    watermark = sync_started.strftime("%Y-%m-%dT%H:%M:%SZ")
+    tomorrow = local_today(timezone_name, 1)
+    _purge_stale_crawls(store_id)
+    
+    counters = {"pages": 0, "orders": 0}
+    # Arquivo completo da fase atual (reiniciado a cada período buscado por inteiro)
+    phase_archive = {"complete": True}
+    modes = []
+    complete_ranges = []
+    covered_start = state["covered_start"] if state else None
+    checkpoints = []
+    
+    def checkpoint_for(index, date_filter):
+        checkpoint = CrawlCheckpoint(store_id, _checkpoint_key("sync", date_filter))
+        # Uma paginação retomada guarda a marca d'água de quando começou: pedidos
+        # alterados antes do cursor durante a interrupção voltam na próxima sincronização
+        first_watermark = (checkpoint.saved_state or {}).get("watermark") or watermark
+        checkpoint.state = lambda: {"watermark": first_watermark}
+        checkpoints.append((checkpoint, first_watermark))
+        return checkpoint
+    
+    def apply(index, page):
+        order_ids, rows = orders_to_line_rows(store_id, page, timezone_name)
+        replace_order_lines(store_id, order_ids, rows)
+        phase_archive["complete"] = archive_orders(store_id, page, timezone_name) and phase_archive["complete"]
+        counters["pages"] += 1
+        counters["orders"] += len(order_ids)
+        if progress:
+            progress(counters["pages"], counters["orders"])
+    
+    try:
+        if state is None or not state.get("last_updated_at"):
+            consume_order_pages(
+                url, headers, start_date, tomorrow, apply, session=session,
+                strict=True, checkpoint_for=checkpoint_for, timezone_name=timezone_name
+            )
+            complete_ranges.append((start_date, tomorrow))
+            if phase_archive["complete"]:
+                mark_archive_complete(
+                    store_id, _range_days([(start_date, tomorrow)]),
+                    _crawl_started([checkpoint for checkpoint, _ in checkpoints])
+                )
+            covered_start = start_date
+            modes.append("full")
+        else:
+            if start_date < covered_start:
+                # Dias anteriores à cobertura (o dia covered_start é repetido, sem efeito por ser substituído por pedido)
+                backfill_start = len(checkpoints)
+                phase_archive["complete"] = True
+                consume_order_pages(
+                    url, headers, start_date, covered_start, apply, session=session,
+                    strict=True, checkpoint_for=checkpoint_for, timezone_name=timezone_name
+                )
+                complete_ranges.append((start_date, covered_start))
+                if phase_archive["complete"]:
+                    mark_archive_complete(
+                        store_id, _range_days([(start_date, covered_start)]),
+                        _crawl_started([checkpoint for checkpoint, _ in checkpoints[backfill_start:]])
+                    )
+                covered_start = start_date
+                modes.append("backfill")
+            
+            delta_filter = f"updated_at:>'{state['last_updated_at']}' AND {created_since_filter(covered_start, timezone_name)}"
+            checkpoint = checkpoint_for(0, delta_filter)
+            if not checkpoint.completed:
+                pages = iter_order_pages(
+                    url, headers, delta_filter, session=session, strict=True,
+                    cursor=checkpoint.end_cursor, with_cursor=True
+                )
+                for page, next_cursor in pages:
+                    apply(0, page)
+                    checkpoint.save(next_cursor, len(page))
+            # Pedidos criados desde a última sincronização vieram todos no delta
+            complete_ranges.append((local_day(state["last_updated_at"], timezone_name), tomorrow))
+            modes.append("delta")
+    except ShopifyCrawlError as e:
+        # Os pedidos já recebidos foram gravados, mas a marca d'água fica onde estava
+        logger.error(f"Sincronização incompleta da loja {store_id}: {str(e)}")
+        raise
+    
+    watermark = min([watermark] + [first_watermark for _, first_watermark in checkpoints])
+    save_sync_state(store_id, watermark, covered_start)
+    mark_metric_days(store_id, _range_days(complete_ranges))
+    delete_crawl_checkpoints(store_id, [checkpoint.crawl_key for checkpoint, _ in checkpoints])
+    _purge_stale_crawls(store_id)
+    logger.info(f"Sincronização Shopify ({'+'.join(modes)}) da loja {store_id}: {counters['orders']} pedidos recebidos")
+    return {"mode": "+".join(modes), "orders": counters["orders"], "covered_start": covered_start}
+
+def rebuild_order_lines_from_archive(store_id, start_date, end_date):
+    """
+    Regrava os itens de pedido do período a partir do arquivo local de pedidos, sem chamar a API.
+    
+    Só os dias completos do arquivo (ver mark_archive_complete) são regravados,
+    um dia por transação; os demais dias do período ficam como estão no banco.
+    
+    Returns:
+        Lista de períodos (início, fim) regravados, um por sequência contínua de dias arquivados
+    """
+    started = time.perf_counter()
+    timezone_name = get_store_timezone(store_id) or DEFAULT_TIMEZONE
+    days = archived_days(store_id, start_date, end_date)
+    
+    order_count = 0
+    for day in days:
+        orders = read_archived_orders(store_id, day)
+        order_count += len(orders)
+        _, rows = orders_to_line_rows(store_id, orders, timezone_name)
+        replace_period("order_line_items", store_id, (day, day), rows)
+    mark_metric_days(store_id, days)
+    
+    ranges = merge_day_ranges(days)
+    logger.info(
+        f"{order_count} pedidos arquivados da loja {store_id} reprocessados em "
+        f"{len(ranges)} período(s) em {time.perf_counter() - started:.2f}s"
+    )
+    return ranges
+
+def sync_shopify_data(store_id, url, headers, start_date, progress=None):
+    """
+    Atualização incremental: sincroniza os pedidos com order_line_items em paralelo
+    com o catálogo de produtos.
+    
+    Não há data final: a sincronização vai sempre até hoje, para que a marca
+    d'água avance sem deixar pedidos alterados para trás.
+    
+    Returns:
+        Resumo da sincronização (ver sync_shopify_orders)
+    """
+    session = get_http_session()
+    _, summary = run_in_threads([
+        lambda: refresh_product_catalog(store_id, url, headers, session=session),
+        lambda: sync_shopify_orders(store_id, url, headers, start_date, session=session, progress=progress),
+    ], max_workers=2)
+    return summary
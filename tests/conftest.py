@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_utils
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    """Banco SQLite vazio em um diretório temporário, com pool, migrações e cache do processo zerados."""
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.delenv("RAILWAY_ENVIRONMENT", raising=False)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(db_utils, "SQLITE_DB_PATH", str(tmp_path / "dashboard.db"))
+    monkeypatch.setattr(db_utils, "_pool", None)
+    monkeypatch.setattr(db_utils, "_migrations_applied", False)
+    db_utils.clear_query_cache()
+    yield tmp_path / "dashboard.db"
+    if db_utils._pool is not None:
+        db_utils._pool.close_all()
+    db_utils.clear_query_cache()
@@ -0,0 +1,78 @@
+import gzip
+import json
+
+import pytest
+
+import archive_utils
+import db_utils
+import shopify_utils
+
+def _order(number, quantity=1):
+    return {"node": {"id": f"gid://shopify/Order/{number}", "createdAt": "2025-01-01T12:00:00Z", "quantity": quantity}}
+
+def _records(path):
+    with gzip.open(path, "rt", encoding="utf-8") as archive_file:
+        return [json.loads(line) for line in archive_file if line.strip()]
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive_utils, "SHOPIFY_ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(archive_utils, "SHOPIFY_ARCHIVE_ENABLED", True)
+    return tmp_path
+
+def test_refetched_day_is_rewritten_with_one_record_per_order(archive_dir):
+    archive_utils.archive_orders("loja", [_order(1), _order(2)])
+    
+    # Nova busca completa do dia: o pedido 1 mudou e o pedido 2 foi excluído na Shopify
+    started = archive_utils.archive_timestamp()
+    archive_utils.archive_orders("loja", [_order(1, quantity=5)])
+    archive_utils.mark_archive_complete("loja", ["2025-01-01"], started)
+    
+    records = _records(archive_utils.archive_path("loja", "2025-01-01"))
+    assert len(records) == 2
+    assert [record["deleted"] for record in records if "deleted" in record] == ["gid://shopify/Order/2"]
+    assert archive_utils.read_archived_orders("loja", "2025-01-01") == [_order(1, quantity=5)]
+    assert archive_utils.archived_days("loja", "2025-01-01", "2025-01-31") == ["2025-01-01"]
+
+def test_order_archived_after_its_tombstone_is_read_again(archive_dir):
+    archive_utils.archive_orders("loja", [_order(1)])
+    archive_utils.mark_archive_complete("loja", ["2025-01-01"], archive_utils.archive_timestamp())
+    assert archive_utils.read_archived_orders("loja", "2025-01-01") == []
+    
+    archive_utils.archive_orders("loja", [_order(1, quantity=2)])
+    
+    assert archive_utils.read_archived_orders("loja", "2025-01-01") == [_order(1, quantity=2)]
+
+def test_failed_archive_write_only_affects_its_own_range(archive_dir, sqlite_db, monkeypatch):
+    db_utils.init_db()
+    db_utils.execute_query(
+        "INSERT INTO stores (id, name, shop_name, access_token, shop_timezone) VALUES ('loja', 'Loja', 'loja', 'token', 'UTC')"
+    )
+    # O dia 2 já está no banco: a busca tem dois períodos, dia 1 e dia 3
+    db_utils.mark_metric_days("loja", ["2025-01-02"])
+    
+    def fake_graphql(url, headers, query, variables=None, session=None, throttle=None):
+        if "getProducts" in query:
+            return {"data": {"products": {"edges": [], "pageInfo": {"hasNextPage": False, "endCursor": None}}}}
+        day = variables["search"].split("'")[1][:10]
+        order = {"node": {
+            "id": f"gid://shopify/Order/{day[-1]}", "createdAt": f"{day}T12:00:00Z", "updatedAt": f"{day}T12:00:00Z",
+            "lineItems": {"edges": [], "pageInfo": {"hasNextPage": False, "endCursor": None}},
+        }}
+        return {"data": {"orders": {"edges": [order], "pageInfo": {"hasNextPage": False, "endCursor": None}}}}
+    
+    archive_orders = archive_utils.archive_orders
+    
+    def failing_first_write(store_id, orders, timezone_name):
+        # Falha na gravação do arquivo do primeiro período
+        if orders[0]["node"]["createdAt"].startswith("2025-01-01"):
+            return False
+        return archive_orders(store_id, orders, timezone_name)
+    
+    monkeypatch.setattr(shopify_utils, "shopify_graphql", fake_graphql)
+    monkeypatch.setattr(shopify_utils, "archive_orders", failing_first_write)
+    
+    ranges = shopify_utils.stream_shopify_metrics("loja", "https://loja/graphql.json", {}, "2025-01-01", "2025-01-03")
+    
+    assert ranges == [("2025-01-01", "2025-01-01"), ("2025-01-03", "2025-01-03")]
+    assert archive_utils.archived_days("loja", "2025-01-01", "2025-01-03") == ["2025-01-03"]
@@ -0,0 +1,92 @@
+import pytest
+
+import archive_utils
+import db_utils
+import shopify_utils
+
+def _order(number, title):
+    return {"node": {
+        "id": f"gid://shopify/Order/{number}", "createdAt": "2025-01-01T12:00:00Z", "updatedAt": "2025-01-01T12:00:00Z",
+        "lineItems": {
+            "edges": [{"node": {"title": title, "quantity": 1, "originalTotalSet": {"shopMoney": {"amount": "10.00"}}}}],
+            "pageInfo": {"hasNextPage": False, "endCursor": None},
+        },
+    }}
+
+# Duas páginas de pedidos: a primeira aponta para a segunda pelo cursor "c1"
+ORDER_PAGES = {
+    None: {"edges": [_order(1, "Produto A")], "pageInfo": {"hasNextPage": True, "endCursor": "c1"}},
+    "c1": {"edges": [_order(2, "Produto B")], "pageInfo": {"hasNextPage": False, "endCursor": None}},
+}
+
+class _FakeShopify:
+    """shopify_graphql falso: pedidos em duas páginas, catálogo vazio e falhas injetadas por cursor."""
+    
+    def __init__(self):
+        self.cursors = []
+        self.fail_cursors = set()
+    
+    def __call__(self, url, headers, query, variables=None, session=None, throttle=None):
+        if "getProducts" in query:
+            return {"data": {"products": {"edges": [], "pageInfo": {"hasNextPage": False, "endCursor": None}}}}
+        cursor = (variables or {}).get("cursor")
+        self.cursors.append(cursor)
+        if cursor in self.fail_cursors:
+            self.fail_cursors.discard(cursor)
+            return None
+        return {"data": {"orders": ORDER_PAGES[cursor]}}
+
+@pytest.fixture
+def shopify(sqlite_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(archive_utils, "SHOPIFY_ARCHIVE_DIR", str(tmp_path / "archive"))
+    monkeypatch.setattr(archive_utils, "SHOPIFY_ARCHIVE_ENABLED", True)
+    fake = _FakeShopify()
+    monkeypatch.setattr(shopify_utils, "shopify_graphql", fake)
+    db_utils.init_db()
+    db_utils.execute_query(
+        "INSERT INTO stores (id, name, shop_name, access_token, shop_timezone) VALUES ('loja', 'Loja', 'loja', 'token', 'UTC')"
+    )
+    return fake
+
+def _count(table):
+    return db_utils.execute_query(f"SELECT COUNT(*) FROM {table}", fetch_type='one')[0]
+
+def test_crawl_resumes_from_saved_cursor_after_failure(shopify):
+    shopify.fail_cursors = {"c1"}
+    
+    with pytest.raises(shopify_utils.ShopifyCrawlError):
+        shopify_utils.stream_shopify_metrics("loja", "https://loja/graphql.json", {}, "2025-01-01", "2025-01-01", force=True)
+    
+    # A primeira página ficou preparada (fora do dashboard) com o cursor da segunda
+    checkpoint = db_utils.execute_query("SELECT end_cursor, pages FROM shopify_crawl_checkpoints", fetch_type='one')
+    assert tuple(checkpoint) == ("c1", 1)
+    assert _count("order_line_items_staging") == 1
+    assert _count("order_line_items") == 0
+    
+    shopify.cursors = []
+    ranges = shopify_utils.stream_shopify_metrics("loja", "https://loja/graphql.json", {}, "2025-01-01", "2025-01-01", force=True)
+    
+    # A retomada pede só a página que faltava e publica as duas
+    assert ranges == [("2025-01-01", "2025-01-01")]
+    assert shopify.cursors == ["c1"]
+    products = db_utils.execute_query("SELECT order_id, product FROM order_line_items ORDER BY order_id", fetch_type='all')
+    assert [tuple(row) for row in products] == [(1, "Produto A"), (2, "Produto B")]
+    assert _count("order_line_items_staging") == 0
+    assert _count("shopify_crawl_checkpoints") == 0
+
+def test_expired_and_orphaned_crawls_of_other_ranges_are_purged(shopify):
+    # Sobras de buscas de outros períodos: um ponto expirado com suas linhas e linhas sem ponto
+    db_utils.save_crawl_checkpoint("loja", "metrics:antigo", "c9", None, 3, 10, False)
+    db_utils.execute_query("UPDATE shopify_crawl_checkpoints SET updated_at = '2000-01-01 00:00:00'")
+    db_utils.save_crawl_checkpoint("loja", "metrics:recente", "c5", None, 1, 5, False)
+    _, rows = shopify_utils.orders_to_line_rows("loja", [_order(7, "Produto C")], "UTC")
+    for crawl_key in ("metrics:antigo", "metrics:recente", "bulk:abandonado"):
+        db_utils.stage_order_lines("loja", crawl_key, [7], rows)
+    
+    shopify_utils.stream_shopify_metrics("loja", "https://loja/graphql.json", {}, "2025-01-01", "2025-01-01", force=True)
+    
+    # Só a busca recente (ainda retomável) sobra
+    checkpoints = db_utils.execute_query("SELECT crawl_key FROM shopify_crawl_checkpoints", fetch_type='all')
+    assert [row[0] for row in checkpoints] == ["metrics:recente"]
+    staged = db_utils.execute_query("SELECT DISTINCT crawl_key FROM order_line_items_staging", fetch_type='all')
+    assert [row[0] for row in staged] == ["metrics:recente"]
@@ -0,0 +1,66 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+import http_utils
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Responde com os status da fila do servidor (200 quando a fila acaba)."""
+    
+    def do_GET(self):
+        self.server.requests += 1
+        status, headers = self.server.responses.pop(0) if self.server.responses else (200, {})
+        body = b"ok" if status == 200 else b"erro"
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub_server():
+    # Porta 0: o sistema escolhe uma porta livre
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    server.responses = []
+    server.requests = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Registra as esperas entre tentativas em vez de dormir."""
+    recorded = []
+    monkeypatch.setattr(http_utils, "time", SimpleNamespace(sleep=recorded.append))
+    return recorded
+
+def _url(server):
+    return f"http://127.0.0.1:{server.server_port}/"
+
+def test_429_waits_for_retry_after(stub_server, sleeps):
+    stub_server.responses = [(429, {"Retry-After": "7"})]
+    
+    response = http_utils.http_request("GET", _url(stub_server), session=http_utils.ManagedSession())
+    
+    assert response.status_code == 200
+    assert stub_server.requests == 2
+    assert sleeps == [7.0]
+
+def test_5xx_is_retried_a_bounded_number_of_times(stub_server, sleeps):
+    stub_server.responses = [(503, {})] * 10
+    
+    response = http_utils.http_request("GET", _url(stub_server), retries=2, session=http_utils.ManagedSession())
+    
+    # Tentativas esgotadas: a última resposta de erro é devolvida
+    assert response.status_code == 503
+    assert stub_server.requests == 3
+    assert len(sleeps) == 2
+    assert all(0 <= delay <= http_utils.HTTP_BACKOFF_BASE * 2 for delay in sleeps)
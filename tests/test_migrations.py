@@ -0,0 +1,109 @@
+import sqlite3
+
+import db_utils
+
+# Esquema SQLite criado pelo init_db original (antes das migrações versionadas)
+BASELINE_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS stores (
+        id TEXT PRIMARY KEY, name TEXT, shop_name TEXT, access_token TEXT,
+        dropi_url TEXT, dropi_username TEXT, dropi_password TEXT,
+        currency_from TEXT DEFAULT 'MXN', currency_to TEXT DEFAULT 'BRL', is_custom INTEGER DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS product_metrics (
+        store_id TEXT, date TEXT, product TEXT, total_orders INTEGER, processed_orders INTEGER,
+        delivered_orders INTEGER, total_value REAL DEFAULT 0, product_url TEXT,
+        PRIMARY KEY (store_id, date, product)
+    )""",
+    """CREATE TABLE IF NOT EXISTS dropi_metrics (
+        store_id TEXT, date TEXT, product TEXT, provider TEXT, stock INTEGER,
+        orders_count INTEGER, orders_value REAL, transit_count INTEGER, transit_value REAL,
+        delivered_count INTEGER, delivered_value REAL, profits REAL,
+        PRIMARY KEY (store_id, date, product)
+    )""",
+    """CREATE TABLE IF NOT EXISTS product_effectiveness (
+        store_id TEXT, product TEXT, general_effectiveness REAL, last_updated TEXT,
+        PRIMARY KEY (store_id, product)
+    )""",
+    """CREATE TABLE IF NOT EXISTS custom_product_data (
+        store_id TEXT, product TEXT, custom_id TEXT, custom_provider TEXT, last_updated TEXT,
+        PRIMARY KEY (store_id, product)
+    )""",
+]
+
+# update_dropi_metrics_schema original: recria dropi_metrics com date_start/date_end
+BASELINE_DATE_RANGE_UPDATE = [
+    """CREATE TABLE dropi_metrics_new (
+        store_id TEXT, date TEXT, date_start TEXT, date_end TEXT, product TEXT, provider TEXT,
+        stock INTEGER, orders_count INTEGER, orders_value REAL, transit_count INTEGER,
+        transit_value REAL, delivered_count INTEGER, delivered_value REAL, profits REAL,
+        PRIMARY KEY (store_id, date, product)
+    )""",
+    """INSERT INTO dropi_metrics_new
+        SELECT store_id, date, date, date, product, provider, stock, orders_count, orders_value,
+               transit_count, transit_value, delivered_count, delivered_value, profits
+        FROM dropi_metrics""",
+    "DROP TABLE dropi_metrics",
+    "ALTER TABLE dropi_metrics_new RENAME TO dropi_metrics",
+]
+
+# update_dropi_metrics_schema_for_duplicates original: o CREATE é gravado e o
+# INSERT falha (dropi_metrics não tem image_url), deixando dropi_metrics_new para trás
+BASELINE_DUPLICATES_UPDATE = [
+    """CREATE TABLE dropi_metrics_new (
+        store_id TEXT, date TEXT, date_start TEXT, date_end TEXT, product TEXT,
+        product_instance_id TEXT, provider TEXT, stock INTEGER, orders_count INTEGER,
+        orders_value REAL, transit_count INTEGER, transit_value REAL, delivered_count INTEGER,
+        delivered_value REAL, profits REAL, image_url TEXT,
+        PRIMARY KEY (store_id, date, product, product_instance_id)
+    )""",
+    """INSERT INTO dropi_metrics_new
+        SELECT store_id, date, COALESCE(date_start, date), COALESCE(date_end, date), product,
+               CAST(ROWID AS TEXT), provider, stock, orders_count, orders_value, transit_count,
+               transit_value, delivered_count, delivered_value, profits, COALESCE(image_url, '')
+        FROM dropi_metrics""",
+]
+
+def _build_baseline_db(path):
+    conn = sqlite3.connect(path)
+    for statement in BASELINE_SCHEMA + BASELINE_DATE_RANGE_UPDATE:
+        conn.execute(statement)
+    conn.execute(
+        "INSERT INTO dropi_metrics VALUES ('loja', '2025-01-01', '2025-01-01', '2025-01-01', 'Produto', "
+        "'Fornecedor', 5, 2, 20.0, 1, 10.0, 1, 10.0, 3.0)"
+    )
+    conn.execute("INSERT INTO product_metrics VALUES ('loja', '2025-01-01', 'Produto', 2, 2, 2, 20.0, 'https://x/p')")
+    conn.commit()
+    
+    create_new, copy_rows = BASELINE_DUPLICATES_UPDATE
+    conn.execute(create_new)
+    try:
+        conn.execute(copy_rows)
+    except sqlite3.OperationalError:
+        conn.rollback()
+    conn.close()
+
+def test_migrations_apply_to_baseline_database(sqlite_db):
+    _build_baseline_db(sqlite_db)
+    
+    db_utils.init_db()
+    
+    applied = db_utils.execute_query("SELECT version FROM schema_migrations ORDER BY version", fetch_type='all')
+    assert [row[0] for row in applied] == [version for version, _, _ in db_utils.MIGRATIONS]
+    
+    tables = {row[0] for row in db_utils.execute_query("SELECT name FROM sqlite_master WHERE type = 'table'", fetch_type='all')}
+    assert "order_line_items" in tables
+    assert "dropi_metrics_new" not in tables
+    
+    # A migração 006 cria o índice de product_metrics e a 014 o remove
+    indexes = {row[0] for row in db_utils.execute_query("SELECT name FROM sqlite_master WHERE type = 'index'", fetch_type='all')}
+    assert "idx_dropi_metrics_store_range" in indexes
+    assert "idx_product_metrics_store_date_url" not in indexes
+    
+    rows = db_utils.execute_query("SELECT product, orders_count, product_instance_id FROM dropi_metrics", fetch_type='all')
+    assert [tuple(row) for row in rows] == [("Produto", 2, "1")]
+
+def test_migrations_apply_to_empty_database(sqlite_db):
+    db_utils.init_db()
+    
+    applied = db_utils.execute_query("SELECT COUNT(*) FROM schema_migrations", fetch_type='one')
+    assert applied[0] == len(db_utils.MIGRATIONS)
@@ -0,0 +1,91 @@
+import archive_utils
+import db_utils
+import shopify_utils
+
+def _line(order_id, day, quantity):
+    return {
+        "store_id": "loja", "order_id": order_id, "line_index": 0,
+        "created_at": f"{day}T12:00:00Z", "created_day": day, "created_hour": 12,
+        "updated_at": f"{day}T12:00:00Z", "product": "Produto", "quantity": quantity, "amount": 10.0 * quantity,
+    }
+
+def _total_quantity(start_date, end_date):
+    rows = db_utils.execute_statement("order_line_items_totals_range", ("loja", start_date, end_date, "loja"), cached=False)
+    return sum(row[3] for row in rows)
+
+def test_staged_lines_are_published_in_one_swap(sqlite_db):
+    db_utils.init_db()
+    db_utils.replace_order_lines("loja", [1, 2], [_line(1, "2025-01-01", 3), _line(2, "2025-01-02", 4)])
+    db_utils.save_crawl_checkpoint("loja", "metrics:janela", "cursor", None, 1, 1, False)
+    
+    # Preparado, mas ainda não publicado: o dashboard continua com os itens antigos
+    db_utils.stage_order_lines("loja", "metrics:janela", [1], [_line(1, "2025-01-01", 5)])
+    assert _total_quantity("2025-01-01", "2025-01-02") == 7
+    
+    db_utils.publish_staged_order_lines("loja", ["metrics:janela"], ("2025-01-01", "2025-01-02"), ["2025-01-01", "2025-01-02"])
+    
+    # O pedido 2 não veio na nova busca (excluído na Shopify) e sai do período
+    assert _total_quantity("2025-01-01", "2025-01-02") == 5
+    assert db_utils.get_covered_metric_days("loja", "2025-01-01", "2025-01-31") == {"2025-01-01", "2025-01-02"}
+    assert db_utils.get_crawl_checkpoint("loja", "metrics:janela") is None
+    assert db_utils.execute_query("SELECT COUNT(*) FROM order_line_items_staging", fetch_type='one')[0] == 0
+
+def test_cleared_staging_leaves_published_lines(sqlite_db):
+    db_utils.init_db()
+    db_utils.replace_order_lines("loja", [1], [_line(1, "2025-01-01", 3)])
+    db_utils.stage_order_lines("loja", "bulk:periodo", [1], [_line(1, "2025-01-01", 9)])
+    
+    db_utils.clear_staged_order_lines("loja", ["bulk:periodo"])
+    
+    assert _total_quantity("2025-01-01", "2025-01-01") == 3
+    assert db_utils.execute_query("SELECT COUNT(*) FROM order_line_items_staging", fetch_type='one')[0] == 0
+
+def _line_item(title, quantity):
+    return {"node": {"title": title, "quantity": quantity, "originalTotalSet": {"shopMoney": {"amount": f"{quantity * 10}.00"}}}}
+
+# Itens do pedido grande além da primeira página, por cursor de itens
+LINE_ITEM_PAGES = {
+    "i1": {"edges": [_line_item("Produto 3", 3), _line_item("Produto 4", 4)], "pageInfo": {"hasNextPage": True, "endCursor": "i2"}},
+    "i2": {"edges": [_line_item("Produto 5", 5)], "pageInfo": {"hasNextPage": False, "endCursor": None}},
+}
+
+def test_every_line_of_a_large_order_is_stored(sqlite_db, tmp_path, monkeypatch):
+    large_order = {"node": {
+        "id": "gid://shopify/Order/1", "createdAt": "2025-01-01T12:00:00Z", "updatedAt": "2025-01-01T12:00:00Z",
+        "lineItems": {
+            "edges": [_line_item("Produto 1", 1), _line_item("Produto 2", 2)],
+            "pageInfo": {"hasNextPage": True, "endCursor": "i1"},
+        },
+    }}
+    small_order = {"node": {
+        "id": "gid://shopify/Order/2", "createdAt": "2025-01-01T13:00:00Z", "updatedAt": "2025-01-01T13:00:00Z",
+        "lineItems": {"edges": [_line_item("Produto 1", 6)], "pageInfo": {"hasNextPage": False, "endCursor": None}},
+    }}
+    line_item_requests = []
+    
+    def fake_graphql(url, headers, query, variables=None, session=None, throttle=None):
+        if "getProducts" in query:
+            return {"data": {"products": {"edges": [], "pageInfo": {"hasNextPage": False, "endCursor": None}}}}
+        if "getOrderLineItems" in query:
+            line_item_requests.append((variables["id"], variables["cursor"]))
+            return {"data": {"order": {"lineItems": LINE_ITEM_PAGES[variables["cursor"]]}}}
+        return {"data": {"orders": {"edges": [large_order, small_order], "pageInfo": {"hasNextPage": False, "endCursor": None}}}}
+    
+    monkeypatch.setattr(shopify_utils, "shopify_graphql", fake_graphql)
+    monkeypatch.setattr(archive_utils, "SHOPIFY_ARCHIVE_DIR", str(tmp_path / "archive"))
+    db_utils.init_db()
+    db_utils.execute_query(
+        "INSERT INTO stores (id, name, shop_name, access_token, shop_timezone) VALUES ('loja', 'Loja', 'loja', 'token', 'UTC')"
+    )
+    
+    shopify_utils.stream_shopify_metrics("loja", "https://loja/graphql.json", {}, "2025-01-01", "2025-01-01", force=True)
+    
+    # Só o pedido com mais itens que a primeira página recebe consultas de itens
+    assert line_item_requests == [("gid://shopify/Order/1", "i1"), ("gid://shopify/Order/1", "i2")]
+    lines = db_utils.execute_query(
+        "SELECT order_id, line_index, product, quantity FROM order_line_items ORDER BY order_id, line_index", fetch_type='all'
+    )
+    assert [tuple(row) for row in lines] == [
+        (1, 0, "Produto 1", 1), (1, 1, "Produto 2", 2), (1, 2, "Produto 3", 3), (1, 3, "Produto 4", 4), (1, 4, "Produto 5", 5),
+        (2, 0, "Produto 1", 6),
+    ]
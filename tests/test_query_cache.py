@@ -0,0 +1,51 @@
+import db_utils
+from db_utils import QueryCache
+
+def test_read_overtaken_by_invalidation_is_not_cached():
+    cache = QueryCache()
+    generation = cache.generation(["stores"], "a")
+    
+    # Escrita na mesma loja enquanto a leitura estava em andamento
+    cache.invalidate("stores", "a")
+    cache.set("chave", "antigo", ["stores"], "a", generation=generation)
+    
+    assert cache.get("chave") == (False, None)
+    assert cache.stats()["stale_skips"] == 1
+
+def test_invalidation_of_another_store_keeps_the_read():
+    cache = QueryCache()
+    generation = cache.generation(["stores"], "a")
+    
+    cache.invalidate("stores", "b")
+    cache.set("chave", "valor", ["stores"], "a", generation=generation)
+    
+    assert cache.get("chave") == (True, "valor")
+
+def test_read_without_store_is_skipped_after_any_write_to_its_table():
+    cache = QueryCache()
+    generation = cache.generation(["stores"], None)
+    
+    cache.invalidate("stores", "b")
+    cache.set("chave", "antigo", ["stores"], None, generation=generation)
+    
+    assert cache.get("chave") == (False, None)
+
+def test_cached_statement_does_not_keep_a_value_read_before_a_write(sqlite_db, monkeypatch):
+    db_utils.init_db()
+    db_utils.execute_query("INSERT INTO stores (id, name) VALUES ('loja', 'Antigo')")
+    execute_read = db_utils._execute_read
+    
+    def read_then_rename(*args):
+        result = execute_read(*args)
+        # Outra thread renomeia a loja depois da leitura e antes de ela entrar no cache
+        db_utils.execute_query("UPDATE stores SET name = 'Novo' WHERE id = ?", ("loja",))
+        return result
+    
+    monkeypatch.setattr(db_utils, "_execute_read", read_then_rename)
+    assert db_utils.execute_statement("store_currency", ("loja",), fetch_type='one') is not None
+    monkeypatch.setattr(db_utils, "_execute_read", execute_read)
+    
+    found, _ = db_utils._query_cache.get(
+        (db_utils._normalize_sql(db_utils.STATEMENTS["store_currency"]), ("loja",), 'one', False)
+    )
+    assert not found
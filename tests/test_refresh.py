@@ -0,0 +1,43 @@
+from datetime import date
+
+import pytest
+
+import db_utils
+
+# refresh_utils importa dropi_utils, que depende do selenium
+pytest.importorskip("selenium")
+import refresh_utils
+
+STORES = [("a", "Loja A"), ("b", "Loja B"), ("c", "Loja C")]
+
+def test_a_failing_store_does_not_stop_the_others(sqlite_db, monkeypatch):
+    db_utils.init_db()
+    for store_id, name in STORES:
+        db_utils.execute_query(
+            "INSERT INTO stores (id, name, shop_name, access_token) VALUES (?, ?, ?, 'token')",
+            (store_id, name, store_id)
+        )
+    refreshed = []
+    
+    def fake_refresh(store, start_date, end_date, mode):
+        if store["id"] == "b":
+            raise RuntimeError("API indisponível")
+        refreshed.append(store["id"])
+        return f"{store['name']} atualizada"
+    
+    monkeypatch.setitem(refresh_utils.REFRESHERS, "shopify", fake_refresh)
+    progress = []
+    
+    report = refresh_utils.refresh_stores(
+        date(2025, 1, 1), date(2025, 1, 31), sources=("shopify",),
+        progress=lambda done, total, result: progress.append((done, total))
+    )
+    
+    assert sorted(refreshed) == ["a", "c"]
+    assert [(result["store"], result["status"], result["detail"]) for result in report["results"]] == [
+        ("Loja A", "ok", "Loja A atualizada"),
+        ("Loja B", "erro", "API indisponível"),
+        ("Loja C", "ok", "Loja C atualizada"),
+    ]
+    assert (report["ok"], report["failed"], report["skipped"]) == (2, 1, 0)
+    assert sorted(progress) == [(1, 3), (2, 3), (3, 3)]
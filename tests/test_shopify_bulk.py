@@ -0,0 +1,125 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import archive_utils
+import db_utils
+import shopify_utils
+
+# Arquivo JSONL da operação bulk: cada pedido seguido dos seus itens (__parentId)
+BULK_LINES = [
+    {"id": "gid://shopify/Order/1", "createdAt": "2025-01-02T03:10:00Z", "updatedAt": "2025-01-02T03:10:00Z"},
+    {"title": "Produto A", "quantity": 2, "originalTotalSet": {"shopMoney": {"amount": "20.00"}}, "__parentId": "gid://shopify/Order/1"},
+    {"title": "Produto B", "quantity": 1, "originalTotalSet": {"shopMoney": {"amount": "5.50"}}, "__parentId": "gid://shopify/Order/1"},
+    {"id": "gid://shopify/Order/2", "createdAt": "2025-01-10T18:00:00Z", "updatedAt": "2025-01-10T18:00:00Z"},
+    {"title": "Produto A", "quantity": 1, "originalTotalSet": {"shopMoney": {"amount": "10.00"}}, "__parentId": "gid://shopify/Order/2"},
+]
+
+class _BulkHandler(BaseHTTPRequestHandler):
+    """API GraphQL falsa com operação bulk (RUNNING → COMPLETED) e o download do JSONL."""
+    
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        query = payload["query"]
+        server = self.server
+        
+        if "ianaTimezone" in query:
+            data = {"shop": {"ianaTimezone": "America/Mexico_City"}}
+        elif "getProducts" in query:
+            data = {"products": {
+                "edges": [{"node": {
+                    "id": "gid://shopify/Product/10", "title": "Produto A", "handle": "produto-a",
+                    "onlineStoreUrl": "https://loja/products/produto-a", "updatedAt": "2025-01-01T00:00:00Z",
+                    "images": {"edges": [{"node": {"originalSrc": "https://cdn/produto-a.jpg"}}]},
+                }}],
+                "pageInfo": {"hasNextPage": False, "endCursor": None},
+            }}
+        elif "bulkOperationRunQuery" in query:
+            server.bulk_queries.append(payload["variables"]["query"])
+            data = {"bulkOperationRunQuery": {
+                "bulkOperation": {"id": "gid://shopify/BulkOperation/1", "status": "CREATED"},
+                "userErrors": [],
+            }}
+        else:
+            server.polls += 1
+            status = server.statuses.pop(0)
+            data = {"node": {
+                "id": "gid://shopify/BulkOperation/1", "status": status, "errorCode": None, "objectCount": "5",
+                "url": f"http://127.0.0.1:{server.server_port}/bulk.jsonl" if status == "COMPLETED" else None,
+                "partialDataUrl": None,
+            }}
+        
+        self._send(json.dumps({"data": data}).encode(), "application/json")
+    
+    def do_GET(self):
+        self.server.downloads += 1
+        self._send("\n".join(json.dumps(line) for line in BULK_LINES).encode() + b"\n", "application/jsonl")
+    
+    def _send(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def bulk_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _BulkHandler)
+    server.statuses = ["RUNNING", "RUNNING", "COMPLETED"]
+    server.bulk_queries = []
+    server.polls = 0
+    server.downloads = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_bulk_result_is_staged_and_published(sqlite_db, bulk_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(shopify_utils, "SHOPIFY_BULK_POLL_SECONDS", 0)
+    monkeypatch.setattr(archive_utils, "SHOPIFY_ARCHIVE_DIR", str(tmp_path / "archive"))
+    monkeypatch.setattr(archive_utils, "SHOPIFY_ARCHIVE_ENABLED", True)
+    staged = []
+    
+    def stage_spy(store_id, crawl_key, order_ids, rows):
+        staged.extend((row["order_id"], row["product"], row["quantity"]) for row in rows)
+        return db_utils.stage_order_lines(store_id, crawl_key, order_ids, rows)
+    
+    monkeypatch.setattr(shopify_utils, "stage_order_lines", stage_spy)
+    db_utils.init_db()
+    db_utils.execute_query("INSERT INTO stores (id, name, shop_name, access_token) VALUES ('loja', 'Loja', 'loja', 'token')")
+    url = f"http://127.0.0.1:{bulk_server.server_port}/graphql.json"
+    
+    ranges = shopify_utils.fetch_shopify_bulk_metrics("loja", url, {}, "2025-01-01", "2025-01-31")
+    
+    assert ranges == [("2025-01-01", "2025-01-31")]
+    # Período no fuso da loja e uma consulta de status por estado da operação
+    assert "created_at:>='2025-01-01T06:00:00Z'" in bulk_server.bulk_queries[0]
+    assert (bulk_server.polls, bulk_server.downloads) == (3, 1)
+    
+    assert sorted(staged) == [(1, "Produto A", 2), (1, "Produto B", 1), (2, "Produto A", 1)]
+    published = db_utils.execute_query(
+        "SELECT order_id, line_index, created_day, product, quantity, amount FROM order_line_items ORDER BY order_id, line_index",
+        fetch_type='all'
+    )
+    assert [tuple(row) for row in published] == [
+        (1, 0, "2025-01-01", "Produto A", 2, 20.0),
+        (1, 1, "2025-01-01", "Produto B", 1, 5.5),
+        (2, 0, "2025-01-10", "Produto A", 1, 10.0),
+    ]
+    assert db_utils.execute_query("SELECT COUNT(*) FROM order_line_items_staging", fetch_type='one')[0] == 0
+    assert len(db_utils.get_covered_metric_days("loja", "2025-01-01", "2025-01-31")) == 31
+    
+    # O catálogo atualizado em paralelo completa URL e imagem dos totais
+    totals = db_utils.execute_statement(
+        "order_line_items_totals_range", ("loja", "2025-01-01", "2025-01-31", "loja"), cached=False
+    )
+    assert {row[0]: (row[1], row[3]) for row in totals} == {
+        "Produto A": ("https://loja/products/produto-a", 3),
+        "Produto B": (None, 1),
+    }
@@ -0,0 +1,88 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from shopify_utils import run_in_threads, shopify_graphql
+
+# Balde do servidor falso: 300 pontos recompostos a 2000 pontos/s, consultas de custo 50
+BUCKET_SIZE = 300.0
+RESTORE_RATE = 2000.0
+QUERY_COST = 50.0
+
+class _BucketHandler(BaseHTTPRequestHandler):
+    """API GraphQL falsa com o leaky bucket da Shopify: THROTTLED quando faltam pontos."""
+    
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        server = self.server
+        with server.lock:
+            now = time.monotonic()
+            server.available = min(BUCKET_SIZE, server.available + (now - server.updated_at) * RESTORE_RATE)
+            server.updated_at = now
+            throttled = server.available < QUERY_COST
+            if throttled:
+                server.throttled += 1
+            else:
+                server.available -= QUERY_COST
+                server.served += 1
+            cost = {
+                "requestedQueryCost": QUERY_COST,
+                "actualQueryCost": None if throttled else QUERY_COST,
+                "throttleStatus": {
+                    "maximumAvailable": BUCKET_SIZE,
+                    "currentlyAvailable": server.available,
+                    "restoreRate": RESTORE_RATE,
+                },
+            }
+        
+        if throttled:
+            payload = {"errors": [{"message": "Throttled", "extensions": {"code": "THROTTLED"}}], "extensions": {"cost": cost}}
+        else:
+            payload = {"data": {"shop": {"name": "loja"}}, "extensions": {"cost": cost}}
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def bucket_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _BucketHandler)
+    server.lock = threading.Lock()
+    server.available = BUCKET_SIZE
+    server.updated_at = time.monotonic()
+    server.served = 0
+    server.throttled = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_concurrent_queries_are_paced_under_the_restore_rate(bucket_server):
+    url = f"http://127.0.0.1:{bucket_server.server_port}/graphql.json"
+    requests_count, workers = 64, 8
+    
+    started = time.perf_counter()
+    results = run_in_threads(
+        [lambda: shopify_graphql(url, {}, "{ shop { name } }") for _ in range(requests_count)],
+        max_workers=workers
+    )
+    elapsed = time.perf_counter() - started
+    
+    # Nenhuma consulta perdida: as limitadas foram repetidas
+    assert all(result and result["data"]["shop"]["name"] == "loja" for result in results)
+    assert bucket_server.served == requests_count
+    # Só as requisições enviadas antes do primeiro throttleStatus podem ser limitadas
+    assert bucket_server.throttled <= workers
+    # Tempo mínimo: pontos além do balde inicial, recompostos a RESTORE_RATE
+    minimum = (requests_count * QUERY_COST - BUCKET_SIZE) / RESTORE_RATE
+    assert elapsed >= minimum * 0.9
+    assert elapsed < minimum * 3 + 1
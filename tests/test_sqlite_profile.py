@@ -0,0 +1,19 @@
+import db_utils
+
+def test_local_connections_use_the_tuned_profile(sqlite_db):
+    conn = db_utils.get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("PRAGMA journal_mode")
+    assert cursor.fetchone()[0].upper() == db_utils.SQLITE_JOURNAL_MODE
+    cursor.execute("PRAGMA synchronous")
+    assert cursor.fetchone()[0] == 1  # NORMAL
+    cursor.execute("PRAGMA busy_timeout")
+    assert cursor.fetchone()[0] == db_utils.SQLITE_BUSY_TIMEOUT
+
+def test_dashboard_queries_use_their_indexes(sqlite_db):
+    db_utils.init_db()
+    
+    results = db_utils.verify_indexes()
+    
+    assert results and all(result["used"] for result in results), results
@@ -0,0 +1,43 @@
+import db_utils
+from shopify_utils import created_between_filter, created_since_filter, orders_to_line_rows
+
+def test_filter_bounds_follow_shop_timezone():
+    # Cidade do México (UTC-6): o dia local começa às 06:00 UTC
+    assert created_between_filter("2025-01-01", "2025-01-02", "America/Mexico_City") == (
+        "created_at:>='2025-01-01T06:00:00Z' AND created_at:<'2025-01-03T06:00:00Z'"
+    )
+    assert created_since_filter("2025-01-01", "America/Mexico_City") == "created_at:>='2025-01-01T06:00:00Z'"
+    assert created_between_filter("2025-01-01", "2025-01-01") == (
+        "created_at:>='2025-01-01T00:00:00Z' AND created_at:<'2025-01-02T00:00:00Z'"
+    )
+
+def test_order_lines_use_local_day_and_hour():
+    order = {"id": "gid://shopify/Order/7", "createdAt": "2025-01-02T03:10:00Z", "lineItems": {"edges": [
+        {"node": {"title": "Produto", "quantity": 1, "originalTotalSet": {"shopMoney": {"amount": "10"}}}}
+    ]}}
+    
+    _, rows = orders_to_line_rows("loja", [{"node": order}], "America/Mexico_City")
+    
+    assert (rows[0]["created_day"], rows[0]["created_hour"]) == ("2025-01-01", 21)
+
+def test_saving_timezone_relocalizes_existing_lines(sqlite_db):
+    db_utils.init_db()
+    db_utils.execute_query("INSERT INTO stores (id, name, shop_name, access_token) VALUES ('loja', 'Loja', 'loja', 'token')")
+    db_utils.execute_query(
+        "INSERT INTO order_line_items (store_id, order_id, line_index, created_at, created_day, created_hour, product, quantity, amount) "
+        "VALUES ('loja', 7, 0, '2025-01-02T03:10:00Z', '2025-01-02', 3, 'Produto', 1, 10)"
+    )
+    db_utils.mark_metric_days("loja", ["2025-01-01", "2025-01-02", "2025-01-03"])
+    
+    assert db_utils.save_store_timezone("loja", "America/Mexico_City")
+    
+    assert db_utils.get_store_timezone("loja") == "America/Mexico_City"
+    assert db_utils.execute_query("SELECT created_day, created_hour FROM order_line_items", fetch_type='one') == ("2025-01-01", 21)
+    # As pontas da sequência tinham pedidos em dias UTC vizinhos não buscados
+    assert db_utils.get_covered_metric_days("loja", "2025-01-01", "2025-01-31") == {"2025-01-02"}
+
+def test_timezone_of_unknown_store_is_not_saved(sqlite_db):
+    db_utils.init_db()
+    
+    assert db_utils.save_store_timezone("outra", "America/Mexico_City") is False
+    assert db_utils.get_store_timezone("outra") is None
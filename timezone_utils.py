@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import logging
+
+# Configuração do logger
+logger = logging.getLogger("timezone_utils")
+
+# Fuso usado quando a loja ainda não tem fuso horário conhecido
+DEFAULT_TIMEZONE = "UTC"
+
+@lru_cache(maxsize=None)
+def get_zone(timezone_name):
+    """Fuso horário IANA (ex.: America/Mexico_City); nomes desconhecidos usam UTC."""
+    try:
+        return ZoneInfo(timezone_name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning(f"Fuso horário desconhecido {timezone_name}; usando UTC")
+        return timezone.utc
+
+def is_utc(timezone_name):
+    """Indica se o fuso é o próprio UTC (dias locais iguais aos dias UTC)."""
+    return (timezone_name or DEFAULT_TIMEZONE) in ("UTC", "Etc/UTC", "Etc/GMT", "GMT")
+
+def local_datetime(timestamp, timezone_name):
+    """Converte um horário da Shopify (ISO 8601, ex.: 2025-01-02T13:10:00Z) para o fuso da loja."""
+    if not timestamp:
+        return None
+    if isinstance(timestamp, str):
+        try:
+            timestamp = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(get_zone(timezone_name))
+
+def local_day(timestamp, timezone_name):
+    """Dia (YYYY-MM-DD) do horário no fuso da loja, ou None se o horário for inválido."""
+    moment = local_datetime(timestamp, timezone_name)
+    return moment.strftime("%Y-%m-%d") if moment else None
+
+def day_start_utc(day, timezone_name):
+    """Meia-noite do dia YYYY-MM-DD no fuso da loja, em UTC no formato das buscas da Shopify."""
+    start = datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=get_zone(timezone_name))
+    return start.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def local_today(timezone_name, days=0):
+    """Dia atual no fuso da loja, deslocado de days dias (YYYY-MM-DD)."""
+    return (datetime.now(get_zone(timezone_name)) + timedelta(days=days)).strftime("%Y-%m-%d")